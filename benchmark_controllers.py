@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+"""
+Controller Throughput Benchmarks
+================================
+Reproducible benchmarks for the three TraCI controllers on synthetic grid
+networks and pothole layouts of increasing size (100 -> 100k potholes,
+10 -> 2,000 vehicles). Nothing here depends on the live mymap.* files.
+
+Timed for each controller:
+- load_potholes   : parsing the obstacles file (and lane mapping)
+- hit_detection   : one step's worth of hit checks (one per vehicle)
+- lookahead       : one step's worth of "pothole ahead" searches
+- control_step    : one full control step through TraCI, against a headless
+                    `sumo` (--backend sumo) or the in-process mock_traci
+                    (--backend mock, no SUMO needed)
+- control_step_adaptive : the same with the wake-up scheduler
+                    (wakeup_scheduler.py, --adaptive in the controllers)
+- control_step_subscriptions : the same with lane/context subscriptions
+                    (zone_subscriptions.py, --subscriptions in the controllers)
+- control_step_batched : the same with set-commands batched into one TraCI
+                    message per step (traci_batch.py, --batch-commands)
+
+Results are written to JSON. Pass --compare with an older results file to
+flag regressions between versions.
+
+Usage:
+    python3 benchmark_controllers.py --output bench.json
+    python3 benchmark_controllers.py --potholes 100 1000 --vehicles 10 100 --compare old.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import platform
+import subprocess
+import contextlib
+
+from pothole_model import pothole_params_xml, PotholeGrid, DEFAULT_SPEED_MULT, DEFAULT_WIDTH
+from sim_clock import positive_seconds, step_length_options, DEFAULT_STEP_LENGTH
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DEFAULT_POTHOLES = [100, 1000, 10000, 100000]
+DEFAULT_VEHICLES = [10, 100, 500, 2000]
+DEFAULT_SEED = 42
+DEFAULT_BUDGET = 10.0        # Seconds; larger cases of a benchmark are skipped once exceeded
+MIN_TIMING = 0.2             # Repeat a measurement until at least this much time was spent
+
+GRID_SPACING = 200.0         # Metres between grid junctions
+LANES_PER_EDGE = 2
+LANE_WIDTH = 3.2
+LANE_SPEED = 13.89
+POTHOLES_PER_EDGE = 4        # Network grows with the pothole count...
+VEHICLES_PER_EDGE = 4        # ...and with the vehicle count
+ROUTE_EDGES = 12             # Edges per random-walk route
+WARMUP_STEPS = 20            # Simulation steps before control_step is timed
+TIMED_STEPS = 30
+
+REGRESSION_THRESHOLD = 0.20  # 20% slower than the baseline counts as a regression
+
+CONTROLLERS = ['pothole_controller', 'pothole_swerve_controller', 'simple_pothole_avoidance']
+POLICIES = {'pothole_controller': 'SpeedOnlyPolicy',               # controller_core.py policy of each
+            'pothole_swerve_controller': 'SwervePolicy',
+            'simple_pothole_avoidance': 'DodgePolicy'}
+
+
+# ============================================================================
+# SYNTHETIC SCENARIO GENERATION
+# ============================================================================
+
+def grid_size_for(num_potholes, num_vehicles):
+    """Number of junctions per grid side so both potholes and vehicles fit"""
+    edges_needed = max(num_potholes / POTHOLES_PER_EDGE, num_vehicles / VEHICLES_PER_EDGE, 4)
+    # An n x n grid with two-way links has 4 * n * (n - 1) edges
+    n = 2
+    while 4 * n * (n - 1) < edges_needed:
+        n += 1
+    return n
+
+
+def write_grid_network(net_file, n):
+    """
+    Write an n x n two-way grid as a SUMO .net.xml readable by sumolib.
+    Returns the list of lanes as (lane_id, edge_id, (x1, y1), (x2, y2)).
+    """
+    edges = []
+    for i in range(n):
+        for j in range(n):
+            for di, dj in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                a, b = i + di, j + dj
+                if 0 <= a < n and 0 <= b < n:
+                    edges.append(((i, j), (a, b)))
+
+    size = (n - 1) * GRID_SPACING
+    lanes = []
+    outgoing = {}
+    with open(net_file, "w") as f:
+        f.write('<net version="1.20">\n')
+        f.write(f'    <location netOffset="0.00,0.00" convBoundary="0.00,0.00,{size:.2f},{size:.2f}" '
+                f'origBoundary="0.00,0.00,{size:.2f},{size:.2f}" projParameter="!"/>\n')
+
+        for (i, j), (a, b) in edges:
+            edge_id = f"e{i}_{j}to{a}_{b}"
+            outgoing.setdefault((i, j), []).append((edge_id, (a, b)))
+            x1, y1, x2, y2 = i * GRID_SPACING, j * GRID_SPACING, a * GRID_SPACING, b * GRID_SPACING
+            dx, dy = (x2 - x1) / GRID_SPACING, (y2 - y1) / GRID_SPACING
+            f.write(f'    <edge id="{edge_id}" from="n{i}_{j}" to="n{a}_{b}" priority="1">\n')
+            for k in range(LANES_PER_EDGE):
+                # Lane 0 is rightmost; opposite directions sit either side of the node line
+                offset = (LANES_PER_EDGE - k - 0.5) * LANE_WIDTH
+                ox, oy = dy * offset, -dx * offset
+                start, end = (x1 + ox, y1 + oy), (x2 + ox, y2 + oy)
+                lanes.append((f"{edge_id}_{k}", edge_id, start, end))
+                f.write(f'        <lane id="{edge_id}_{k}" index="{k}" speed="{LANE_SPEED}" '
+                        f'length="{GRID_SPACING:.2f}" width="{LANE_WIDTH}" '
+                        f'shape="{start[0]:.2f},{start[1]:.2f} {end[0]:.2f},{end[1]:.2f}"/>\n')
+            f.write('    </edge>\n')
+
+        for i in range(n):
+            for j in range(n):
+                f.write(f'    <junction id="n{i}_{j}" type="priority" x="{i * GRID_SPACING:.2f}" '
+                        f'y="{j * GRID_SPACING:.2f}" incLanes="" intLanes="" shape=""/>\n')
+
+        for (i, j), (a, b) in edges:
+            from_edge = f"e{i}_{j}to{a}_{b}"
+            for to_edge, target in outgoing[(a, b)]:
+                if target == (i, j):
+                    continue  # no U-turns
+                for k in range(LANES_PER_EDGE):
+                    f.write(f'    <connection from="{from_edge}" to="{to_edge}" '
+                            f'fromLane="{k}" toLane="{k}" dir="s" state="M"/>\n')
+        f.write('</net>\n')
+
+    return lanes
+
+
+def write_pothole_layout(obstacles_file, lanes, num_potholes, rng):
+    """Write potholes in the same format as indian_road_simulator.py"""
+    with open(obstacles_file, "w") as f:
+        f.write('<additional xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                'xsi:noNamespaceSchemaLocation="http://sumo.dlr.de/xsd/additional_file.xsd">\n')
+        for pothole_id in range(num_potholes):
+            lane_id, edge_id, (x1, y1), (x2, y2) = rng.choice(lanes)
+            ratio = rng.uniform(0.2, 0.8)
+            x = x1 + (x2 - x1) * ratio
+            y = y1 + (y2 - y1) * ratio
+            size = rng.uniform(0.8, 1.5)
+            points = []
+            for angle_step in range(12):
+                rad = math.radians(angle_step * 360 / 12)
+                points.append(f"{x + size * math.cos(rad):.2f},{y + size * math.sin(rad):.2f}")
+            f.write(f'    <poly id="pothole_{pothole_id}" type="pothole_deep_purple" color="0.5,0,0.5" '
+                    f'fill="1" layer="10" shape="{" ".join(points)}">\n')
+            f.write(pothole_params_xml(size, DEFAULT_SPEED_MULT))
+            f.write('    </poly>\n')
+        f.write('</additional>\n')
+
+
+def sample_vehicle_positions(lanes, num_vehicles, rng):
+    """Random vehicle positions as (lane_id, lane_pos, x, y, sumo_angle)"""
+    positions = []
+    for _ in range(num_vehicles):
+        lane_id, edge_id, (x1, y1), (x2, y2) = rng.choice(lanes)
+        lane_pos = rng.uniform(0.0, GRID_SPACING)
+        ratio = lane_pos / GRID_SPACING
+        # SUMO angles: degrees clockwise from north
+        angle = math.degrees(math.atan2(x2 - x1, y2 - y1)) % 360
+        positions.append((lane_id, lane_pos, x1 + (x2 - x1) * ratio, y1 + (y2 - y1) * ratio, angle))
+    return positions
+
+
+def write_routes(rou_file, lanes, num_vehicles, rng):
+    """Random-walk routes, one vehicle each, all departing at t=0"""
+    outgoing = {}
+    for lane_id, edge_id, start, end in lanes:
+        src, dst = edge_id[1:].split('to')
+        outgoing.setdefault(src, set()).add((edge_id, dst))
+    edge_ids = sorted({edge_id for _, edge_id, _, _ in lanes})
+
+    with open(rou_file, "w") as f:
+        f.write('<routes>\n')
+        f.write('    <vType id="car" length="5.0" minGap="2.5" maxSpeed="13.89" vClass="passenger"/>\n')
+        for veh in range(num_vehicles):
+            edge_id = rng.choice(edge_ids)
+            route = [edge_id]
+            src, dst = edge_id[1:].split('to')
+            while len(route) < ROUTE_EDGES:
+                options = sorted(e for e, nxt in outgoing[dst] if nxt != src)
+                edge_id = rng.choice(options)
+                route.append(edge_id)
+                src, dst = dst, edge_id[1:].split('to')[1]
+            f.write(f'    <vehicle id="car_{veh}" type="car" depart="0" departLane="random" '
+                    f'departPos="random"><route edges="{" ".join(route)}"/></vehicle>\n')
+        f.write('</routes>\n')
+
+
+class Scenario:
+    """Synthetic network, pothole layout and routes written to disk"""
+
+    def __init__(self, work_dir, num_potholes, num_vehicles, seed):
+        self.num_potholes = num_potholes
+        self.num_vehicles = num_vehicles
+        rng = random.Random(f"{seed}-{num_potholes}-{num_vehicles}")
+        n = grid_size_for(num_potholes, num_vehicles)
+        self.net_file = os.path.join(work_dir, f"grid{n}.net.xml")
+        self.lanes = write_grid_network(self.net_file, n)
+        self.obstacles_file = os.path.join(work_dir, f"grid{n}_p{num_potholes}.obstacles.xml")
+        write_pothole_layout(self.obstacles_file, self.lanes, num_potholes, rng)
+        self.rou_file = os.path.join(work_dir, f"grid{n}_v{num_vehicles}.rou.xml")
+        write_routes(self.rou_file, self.lanes, num_vehicles, rng)
+        self.positions = sample_vehicle_positions(self.lanes, num_vehicles, rng)
+
+
+# ============================================================================
+# TIMING
+# ============================================================================
+
+@contextlib.contextmanager
+def quiet():
+    """Silence controller console output while timing"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def measure(func, max_repeat=50):
+    """Mean seconds per call, repeating until MIN_TIMING has been spent"""
+    repeats = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        repeats += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_TIMING or repeats >= max_repeat:
+            return elapsed / repeats, repeats
+
+
+def import_controller(name):
+    with quiet():
+        return __import__(name)
+
+
+def bench_load_potholes(name, module, scenario):
+    # The simple controller only needs pothole centres: it skips the network
+    net_file = None if name == 'simple_pothole_avoidance' else scenario.net_file
+
+    def run():
+        module.load_potholes(scenario.obstacles_file, net_file)
+    with quiet():
+        return measure(run, max_repeat=3)
+
+
+def prepare_potholes(name, module, scenario):
+    """Load potholes once: (potholes_by_lane, potholes_xy) for the detection functions and the policy"""
+    net_file = None if name == 'simple_pothole_avoidance' else scenario.net_file
+    with quiet():
+        return module.load_potholes(scenario.obstacles_file, net_file)
+
+
+def bench_hit_detection(name, module, loaded, scenario):
+    positions = scenario.positions
+    if name == 'pothole_controller':
+        def run():
+            for lane_id, lane_pos, x, y, angle in positions:
+                module.find_pothole_hit(loaded[0], lane_id, lane_pos, DEFAULT_WIDTH / 2, lambda: 0.0)
+    elif name == 'pothole_swerve_controller':
+        grid = PotholeGrid(loaded[1])
+
+        def run():
+            for lane_id, lane_pos, x, y, angle in positions:
+                module.find_pothole_hit(grid, x, y, DEFAULT_WIDTH / 2, lambda: angle)
+    else:
+        grid = PotholeGrid(loaded[1])
+
+        def run():
+            for lane_id, lane_pos, x, y, angle in positions:
+                module.check_pothole_hit(grid, x, y, angle, DEFAULT_WIDTH / 2)
+    return measure(run)
+
+
+def bench_lookahead(name, module, loaded, scenario):
+    positions = scenario.positions
+    if name == 'pothole_swerve_controller':
+        potholes_by_lane = loaded[0]
+
+        def run():
+            for lane_id, lane_pos, x, y, angle in positions:
+                module.find_pothole_ahead(potholes_by_lane, lane_id, lane_pos)
+    elif name == 'simple_pothole_avoidance':
+        grid = PotholeGrid(loaded[1])
+
+        def run():
+            for lane_id, lane_pos, x, y, angle in positions:
+                module.get_potholes_ahead(grid, x, y, angle, LANE_WIDTH)
+    else:
+        return None  # pothole_controller has no lookahead
+    return measure(run)
+
+
+def make_control_step(name, module, loaded, mode=None):
+    """Zero-argument callable running one control step of the controller (mode: adaptive/subscriptions/batched)"""
+    import traci                             # Imported late, after the traci backend is chosen
+    from traci_batch import CommandBuffer
+    from controller_core import control_step
+    commands = CommandBuffer() if mode == 'batched' else None
+    policy = getattr(module, POLICIES[name])(*loaded)
+    state = policy.new_state()
+    step_length = traci.simulation.getDeltaT()
+    scheduler = policy.new_scheduler(step_length) if mode == 'adaptive' else None
+    zones = policy.new_zone_subscriptions(step_length) if mode == 'subscriptions' else None
+    counter = [0]
+
+    def run():
+        counter[0] += 1
+        arrived = traci.simulation.getArrivedIDList()   # Fetched by run_controller every step, whatever the mode
+        control_step(policy, counter[0], state, scheduler=scheduler, zones=zones, commands=commands,
+                     arrived=arrived)
+    if commands is None:
+        return run
+
+    def run_batched():
+        run()
+        commands.flush()   # The engine flushes right before simulationStep()
+    return run_batched
+
+
+def bench_control_step(name, module, loaded, scenario, backend, mode=None, step_length=DEFAULT_STEP_LENGTH):
+    """Time control_step against a headless SUMO (or mock_traci) running the scenario"""
+    import traci
+    if backend == 'mock':
+        sumo_net = scenario.net_file
+    else:
+        sumo_net = scenario.net_file.replace('.net.xml', '.sumo.net.xml')
+        if not os.path.exists(sumo_net):
+            # Let netconvert build junction logic and internal lanes for SUMO
+            subprocess.run(["netconvert", "-s", scenario.net_file, "-o", sumo_net],
+                           check=True, capture_output=True)
+
+    traci.start(["sumo", "-n", sumo_net, "-r", scenario.rou_file,
+                 "--lateral-resolution", "0.8", "--no-step-log", "true", "--no-warnings", "true",
+                 "--time-to-teleport", "-1"] + step_length_options(step_length))
+    try:
+        for _ in range(WARMUP_STEPS):
+            traci.simulationStep()
+        with quiet():
+            run = make_control_step(name, module, loaded, mode)
+        total = 0.0
+        with quiet():
+            for _ in range(TIMED_STEPS):
+                traci.simulationStep()
+                start = time.perf_counter()
+                run()
+                total += time.perf_counter() - start
+        return total / TIMED_STEPS, TIMED_STEPS
+    finally:
+        traci.close()
+
+
+# ============================================================================
+# RESULTS
+# ============================================================================
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def result_key(result):
+    return (result['controller'], result['benchmark'], result['potholes'], result['vehicles'])
+
+
+def compare_results(results, baseline_file, threshold=REGRESSION_THRESHOLD, backend=None, step_length=None):
+    """Print cases that got slower than the baseline by more than threshold"""
+    with open(baseline_file) as f:
+        report = json.load(f)
+    baseline = {result_key(r): r for r in report['results'] if r.get('seconds')}
+    if backend and report.get('backend') not in (None, backend):
+        print(f"WARNING: baseline used the {report['backend']} backend, this run used {backend}; "
+              f"control_step timings are not comparable")
+    if step_length and report.get('step_length', DEFAULT_STEP_LENGTH) != step_length:
+        print(f"WARNING: baseline stepped {report.get('step_length', DEFAULT_STEP_LENGTH)}s, this run {step_length}s; "
+              f"control_step timings are not comparable")
+
+    regressions = 0
+    print(f"\n=== Comparison with {baseline_file} ===")
+    for result in results:
+        old = baseline.get(result_key(result))
+        if not old or not result.get('seconds'):
+            continue
+        ratio = result['seconds'] / old['seconds']
+        marker = ""
+        if ratio > 1.0 + threshold:
+            marker = "  <-- REGRESSION"
+            regressions += 1
+        print(f"{result['controller']:<28} {result['benchmark']:<26} P={result['potholes']:<7} "
+              f"V={result['vehicles']:<5} {old['seconds'] * 1e3:>10.3f}ms -> "
+              f"{result['seconds'] * 1e3:>10.3f}ms ({ratio:5.2f}x){marker}")
+    print(f"{regressions} regression(s) above {threshold * 100:.0f}%")
+    return regressions
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def run_benchmarks(args):
+    work_dir = args.work_dir
+    os.makedirs(work_dir, exist_ok=True)
+    have_sumo = shutil.which("sumo") is not None and shutil.which("netconvert") is not None
+    backend = args.backend
+    if backend == 'auto':
+        backend = 'sumo' if have_sumo else 'mock'
+    args.backend = backend
+    if backend == 'mock':
+        import mock_traci
+        mock_traci.install()  # Must happen before the controllers import traci
+    print(f"control_step backend: {backend}")
+
+    results = []
+    over_budget = set()   # (controller, benchmark) pairs that exceeded the budget
+
+    def record(controller, benchmark, scenario, timing, skipped=None):
+        result = {
+            'controller': controller,
+            'benchmark': benchmark,
+            'potholes': scenario.num_potholes,
+            'vehicles': scenario.num_vehicles,
+            'seconds': None,
+            'repeats': 0,
+        }
+        if timing is None:
+            result['skipped'] = skipped
+        else:
+            result['seconds'], result['repeats'] = timing
+            if result['seconds'] > args.budget:
+                over_budget.add((controller, benchmark))
+        results.append(result)
+        shown = f"{result['seconds'] * 1e3:10.3f} ms" if result['seconds'] is not None else f"skipped ({skipped})"
+        print(f"{controller:<28} {benchmark:<26} P={scenario.num_potholes:<7} V={scenario.num_vehicles:<5} {shown}")
+
+    modules = {name: import_controller(name) for name in args.controllers}
+
+    for num_potholes in sorted(args.potholes):
+        for num_vehicles in sorted(args.vehicles):
+            scenario = Scenario(work_dir, num_potholes, num_vehicles, args.seed)
+            for name in args.controllers:
+                module = modules[name]
+
+                benchmarks = []
+                if num_vehicles == min(args.vehicles):
+                    benchmarks.append('load_potholes')  # Independent of the vehicle count
+                benchmarks += ['hit_detection', 'lookahead', 'control_step', 'control_step_adaptive',
+                               'control_step_subscriptions', 'control_step_batched']
+
+                needed = [b for b in benchmarks if (name, b) not in over_budget]
+                loaded = None
+                if any(b != 'load_potholes' for b in needed):
+                    if (name, 'load_potholes') in over_budget:
+                        for b in needed:
+                            record(name, b, scenario, None, "load_potholes over budget")
+                        continue
+                    loaded = prepare_potholes(name, module, scenario)
+
+                for benchmark in benchmarks:
+                    if (name, benchmark) in over_budget:
+                        record(name, benchmark, scenario, None, "over budget at smaller size")
+                    elif benchmark == 'load_potholes':
+                        record(name, benchmark, scenario, bench_load_potholes(name, module, scenario))
+                    elif benchmark == 'hit_detection':
+                        record(name, benchmark, scenario, bench_hit_detection(name, module, loaded, scenario))
+                    elif benchmark == 'lookahead':
+                        timing = bench_lookahead(name, module, loaded, scenario)
+                        if timing is not None:
+                            record(name, benchmark, scenario, timing)
+                    elif args.skip_control_step:
+                        record(name, benchmark, scenario, None, "--skip-control-step")
+                    elif backend == 'sumo' and not have_sumo:
+                        record(name, benchmark, scenario, None, "sumo/netconvert not found")
+                    else:
+                        record(name, benchmark, scenario,
+                               bench_control_step(name, module, loaded, scenario, backend,
+                                                  mode=benchmark.partition('control_step_')[2] or None,
+                                                  step_length=args.step_length))
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pothole controller throughput")
+    parser.add_argument('--potholes', type=int, nargs='+', default=DEFAULT_POTHOLES)
+    parser.add_argument('--vehicles', type=int, nargs='+', default=DEFAULT_VEHICLES)
+    parser.add_argument('--controllers', nargs='+', default=CONTROLLERS, choices=CONTROLLERS)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        help='Skip larger sizes of a benchmark once one case takes longer (seconds)')
+    parser.add_argument('--skip-control-step', action='store_true', help='Only run the pure-Python benchmarks')
+    parser.add_argument('--backend', choices=['auto', 'sumo', 'mock'], default='auto',
+                        help='TraCI backend for control_step (auto = sumo if installed, else mock)')
+    parser.add_argument('--step-length', type=positive_seconds, default=DEFAULT_STEP_LENGTH,
+                        help='Simulated seconds per control_step (SUMO --step-length)')
+    parser.add_argument('--work-dir', default='bench_scenarios', help='Where synthetic scenarios are written')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help='Baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args)
+
+    report = {
+        'version': git_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'backend': args.backend,
+        'step_length': args.step_length,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results written to {args.output}")
+
+    if args.compare:
+        return 1 if compare_results(results, args.compare, args.threshold, args.backend, args.step_length) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
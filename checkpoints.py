@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Simulation Checkpoints
+======================
+Periodic checkpoints for long controller runs (mymap.sumocfg runs 7200s at
+0.1s steps). A checkpoint is two files sharing one prefix:
+
+    checkpoints/<controller>_<step>.state.xml.gz   SUMO state (traci.simulation.saveState)
+    checkpoints/<controller>_<step>.controller.pkl controller step counter + vehicle state dicts
+
+--resume loads both: SUMO jumps to the saved time with all vehicles in
+place, and the controller continues with its own tracking dicts (hit
+timers, swerves, ...). Resuming the same checkpoint several times branches
+experiments from one warmed-up state.
+
+SUMO does not save TraCI speed overrides (setSpeed) or lateral offsets, so
+each controller re-applies what its state says should be in effect.
+
+Usage inside a controller loop:
+    checkpoints = checkpointer_from_args(args, 'pothole_swerve_controller')
+    if args.resume:
+        step, state = load_checkpoint(resolve_checkpoint(args.resume, 'pothole_swerve_controller', args.checkpoint_dir))
+    ...
+    if commands:
+        commands.flush()
+    checkpoints.maybe_save(step, state)    # right before traci.simulationStep()
+    traci.simulationStep()
+"""
+
+import os
+import glob
+import pickle
+import traci
+
+CHECKPOINT_DIR = "checkpoints"
+STATE_SUFFIX = ".state.xml.gz"
+CONTROLLER_SUFFIX = ".controller.pkl"
+
+
+class Checkpointer:
+    """Saves a checkpoint every `every` simulated seconds"""
+
+    def __init__(self, name, every=0.0, directory=CHECKPOINT_DIR):
+        self.name = name
+        self.every = every
+        self.directory = directory
+        self.next_time = None
+        self.saved = []
+
+    def maybe_save(self, step, state):
+        """Save if `every` simulated seconds passed since the last checkpoint"""
+        if not self.every:
+            return
+        now = traci.simulation.getTime()
+        if self.next_time is None:
+            self.next_time = now + self.every   # First checkpoint one interval in
+        elif now >= self.next_time:
+            self.save(step, state)
+            self.next_time = now + self.every
+
+    def save(self, step, state):
+        """Write SUMO state and controller state (call between flush and simulationStep)"""
+        os.makedirs(self.directory, exist_ok=True)
+        prefix = os.path.join(self.directory, f"{self.name}_{step:08d}")
+        traci.simulation.saveState(prefix + STATE_SUFFIX)
+        with open(prefix + CONTROLLER_SUFFIX, 'wb') as f:
+            pickle.dump({'step': step, 'time': traci.simulation.getTime(), 'state': state}, f)
+        self.saved.append(prefix)
+        print(f"Step {step}: checkpoint saved to {prefix}")
+        return prefix
+
+
+def resolve_checkpoint(checkpoint, name, directory=CHECKPOINT_DIR):
+    """A checkpoint prefix, or 'latest' for the newest checkpoint of this controller"""
+    if checkpoint != 'latest':
+        for suffix in (STATE_SUFFIX, CONTROLLER_SUFFIX):
+            if checkpoint.endswith(suffix):
+                return checkpoint[:-len(suffix)]
+        return checkpoint
+    found = sorted(glob.glob(os.path.join(directory, f"{name}_*{CONTROLLER_SUFFIX}")))
+    if not found:
+        raise FileNotFoundError(f"No {name} checkpoints in {directory}/")
+    return found[-1][:-len(CONTROLLER_SUFFIX)]
+
+
+def load_checkpoint(prefix):
+    """Restore SUMO state into the running simulation; returns (step, controller state)"""
+    with open(prefix + CONTROLLER_SUFFIX, 'rb') as f:
+        saved = pickle.load(f)
+    traci.simulation.loadState(prefix + STATE_SUFFIX)
+    print(f"Resumed {prefix} at step {saved['step']} (t={saved['time']:.1f}s)")
+    return saved['step'], saved['state']
+
+
+def add_checkpoint_arguments(parser):
+    """Register the --checkpoint* / --resume command line options on an argparse parser"""
+    parser.add_argument('--checkpoint-every', type=float, default=0.0,
+                        help='Save a checkpoint every N simulated seconds (0 = off)')
+    parser.add_argument('--checkpoint-dir', default=CHECKPOINT_DIR, help='Checkpoint directory')
+    parser.add_argument('--resume', metavar='CHECKPOINT',
+                        help="Resume from a checkpoint prefix, or 'latest'")
+
+
+def checkpointer_from_args(args, name):
+    return Checkpointer(name, args.checkpoint_every, args.checkpoint_dir)
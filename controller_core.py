@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Controller Core
+===============
+One engine for the three TraCI controllers. Pothole loading, vehicle
+selection, state cleanup, event recording and the main loop with all of
+its options (wake-up scheduler, zone subscriptions, batched commands,
+checkpoints, profiler, rerouting, pothole events, step length) live here
+once; what a vehicle does about a pothole is a policy plug-in:
+
+    speed-only     SpeedOnlyPolicy   pothole_controller.py          hit -> hold the severity's speed
+    swerve         SwervePolicy      pothole_swerve_controller.py   slow at 100m, swerve 4m, return after 8s
+    simple dodge   DodgePolicy       simple_pothole_avoidance.py    slow at 60m, dodge 1.5m within the lane
+
+Loader: every polygon whose ID starts with "pothole_" becomes
+
+    potholes_xy       [(x, y, radius, type, speed_mult)]
+    potholes_by_lane  {lane_id: [(pos, speed_mult, type, x, y, radius, lateral)]}
+
+and every policy buckets potholes_xy in a PotholeGrid (policy.pothole_grid)
+for its XY scans.
+
+Lanes are matched through a grid of lane segments (LaneIndex) and the exact
+projection onto the lane shape, not the nearest shape point: that put
+potholes on long straight lanes at position 0, or on a crossing lane.
+
+Vehicle state is a dict of per-vehicle dicts. forget_vehicle() drops a
+vehicle from every one of them, from the wake-up scheduler and from the
+command buffer on every arrival, so vehicles that arrive asleep or outside
+the zones no longer leave their state behind for the rest of the run. A
+vehicle whose TraCI calls fail (e.g. while teleporting) is only skipped
+for that step and evaluated again on the next one.
+
+A policy subclasses Policy:
+    name                  checkpoint prefix
+    new_state()           {name: {veh_id: ...}}
+    resume(state)         re-apply TraCI overrides after loading a checkpoint
+    new_scheduler(dt), new_zone_subscriptions(dt)
+    busy(state)           vehicles evaluated every step in subscription mode
+    control_vehicle(...)  one vehicle, one step; returns the wake-up hint
+                          (x, y, max_speed) when idle, None to stay awake
+
+Events go through self.log.record() as "Step N: Vehicle vid <message>"
+lines (pothole_analytics.py) and are counted for the end-of-run summary.
+
+Usage:
+    policy = SwervePolicy(*load_potholes("mymap.obstacles.xml", "mymap.net.xml"))
+    run_controller(policy, ["sumo-gui", "-c", "mymap.sumocfg"], adaptive=True)
+"""
+
+import os
+import sys
+import math
+import xml.etree.ElementTree as ET
+from collections import Counter
+
+# Add SUMO tools to path
+if 'SUMO_HOME' in os.environ:
+    tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
+    sys.path.append(tools)
+
+import traci
+from step_profiler import NullProfiler, add_profiler_arguments, profiler_from_args
+from traci_batch import CommandBuffer
+from checkpoints import Checkpointer, load_checkpoint, resolve_checkpoint, add_checkpoint_arguments, checkpointer_from_args
+from snapshots import add_snapshot_arguments, snapshot_from_args
+from pothole_rerouting import add_rerouting_arguments, rerouting_from_args
+from dynamic_potholes import PotholeRegistry, add_event_arguments, events_from_args
+from sim_clock import add_step_length_arguments, step_length_options, steps_for
+from pothole_model import pothole_attributes, lane_projection, PotholeGrid, POTHOLE_PREFIX
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+LANE_MATCH_RANGE = 50.0         # Potholes further than this from every lane are XY-only (m)
+PROGRESS_INTERVAL = 10.0        # Simulated seconds between progress lines (policies that print one)
+SUMO_BINARY = "sumo-gui"
+
+# Event kinds counted by EventLog (the names pothole_analytics.py stores)
+HIT = 'hit'
+SWERVE = 'swerve'
+SLOW = 'slow'
+BLOCKED = 'blocked'
+SWERVE_FAILED = 'swerve_failed'
+PASSED = 'passed'
+RETURN = 'return'
+RECOVER = 'recover'
+
+
+# ============================================================================
+# POTHOLE LOADING
+# ============================================================================
+
+def read_potholes(obstacles_file):
+    """[(pothole_id, type, x, y, radius, speed_mult)] of every pothole polygon, in file order"""
+    root = ET.parse(obstacles_file).getroot()
+    potholes = []
+    for poly in root.findall('poly'):
+        poly_id = poly.get('id', '')
+        shape = poly.get('shape', '')
+        if not poly_id.startswith(POTHOLE_PREFIX) or not shape:
+            continue
+        try:
+            coords = [tuple(map(float, point.split(',')[:2])) for point in shape.split()]
+        except ValueError as e:
+            print(f"Error processing pothole {poly_id}: {e}")
+            continue
+        x = sum(px for px, py in coords) / len(coords)
+        y = sum(py for px, py in coords) / len(coords)
+        radius, speed_mult = pothole_attributes(poly, coords)   # Size and severity (pothole_model.py)
+        potholes.append((poly_id, poly.get('type', ''), x, y, radius, speed_mult))
+    return potholes
+
+
+class LaneIndex:
+    """Lane shapes bucketed by segment on a LANE_MATCH_RANGE grid: nearest lane without scanning the network"""
+
+    def __init__(self, lanes, cell=LANE_MATCH_RANGE):
+        self.cell = cell
+        self.lanes = []    # (lane_id, shape, length) in network order
+        self.cells = {}    # (cx, cy) -> indexes into self.lanes
+        for lane in lanes:
+            index = len(self.lanes)
+            shape = lane.getShape()
+            self.lanes.append((lane.getID(), shape, lane.getLength()))
+            for (x1, y1), (x2, y2) in zip(shape, shape[1:] or shape):
+                for cx in range(int(math.floor(min(x1, x2) / cell)), int(math.floor(max(x1, x2) / cell)) + 1):
+                    for cy in range(int(math.floor(min(y1, y2) / cell)), int(math.floor(max(y1, y2) / cell)) + 1):
+                        self.cells.setdefault((cx, cy), set()).add(index)
+
+    def nearest(self, x, y):
+        """(lane_id, lane position, lateral offset) of the closest lane within one cell, or None"""
+        cx, cy = int(math.floor(x / self.cell)), int(math.floor(y / self.cell))
+        candidates = set()
+        for i in (-1, 0, 1):
+            for j in (-1, 0, 1):
+                candidates.update(self.cells.get((cx + i, cy + j), ()))
+
+        best = None
+        for index in sorted(candidates):   # Network order: ties go to the first lane
+            lane_id, shape, length = self.lanes[index]
+            along, dist, lateral, shape_length = lane_projection(shape, x, y)
+            if dist < self.cell and (best is None or dist < best[0]):
+                pos = along * length / shape_length if shape_length > 0 else length / 2
+                best = (dist, lane_id, pos, lateral)
+        return best[1:] if best else None
+
+
+def load_potholes(obstacles_file, net_file=None):
+    """(potholes_by_lane, potholes_xy) for the controllers; without net_file, potholes_by_lane stays empty"""
+    potholes_by_lane = {}
+    potholes_xy = []
+    try:
+        potholes = read_potholes(obstacles_file)
+    except (OSError, ET.ParseError) as e:
+        print(f"Error loading obstacles file: {e}")
+        return potholes_by_lane, potholes_xy
+
+    lanes = None
+    if net_file:
+        try:
+            import sumolib
+            lanes = LaneIndex(lane for edge in sumolib.net.readNet(net_file).getEdges() for lane in edge.getLanes())
+        except Exception as e:
+            print(f"Error loading network file: {e}")
+
+    skipped = 0
+    for pothole_id, ptype, x, y, radius, speed_mult in potholes:
+        potholes_xy.append((x, y, radius, ptype, speed_mult))
+        match = lanes.nearest(x, y) if lanes else None
+        if match:
+            lane_id, pos, lateral = match
+            potholes_by_lane.setdefault(lane_id, []).append((pos, speed_mult, ptype, x, y, radius, lateral))
+        elif lanes:
+            skipped += 1
+
+    print(f"Loaded {len(potholes_xy)} potholes from {obstacles_file}" +
+          (f", {len(potholes_xy) - skipped} on {len(potholes_by_lane)} lanes" if lanes else ""))
+    if skipped:
+        print(f"Skipped {skipped} potholes for lane lookahead (further than {LANE_MATCH_RANGE:.0f}m from any lane)")
+    return potholes_by_lane, potholes_xy
+
+
+# ============================================================================
+# EVENTS AND VEHICLE STATE
+# ============================================================================
+
+class EventLog:
+    """Console event lines in the one format pothole_analytics.py reads, counted per kind"""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def record(self, step, veh_id, event, message):
+        self.counts[event] += 1
+        print(f"Step {step}: Vehicle {veh_id} {message}")
+
+    def summary(self):
+        if not self.counts:
+            return "Events: none"
+        return "Events: " + ", ".join(f"{count} {event}" for event, count in self.counts.most_common())
+
+
+def forget_vehicle(state, veh_id, scheduler=None, commands=None):
+    """Drop a vehicle from every per-vehicle dict of the state, the scheduler and the command buffer"""
+    for tracked in state.values():
+        tracked.pop(veh_id, None)
+    if scheduler:
+        scheduler.forget(veh_id)
+    if commands:
+        commands.forget(veh_id)
+
+
+class Policy:
+    """Avoidance behaviour run by the engine; subclasses implement control_vehicle"""
+
+    name = 'controller'        # Checkpoint prefix
+    uses_lanes = True          # Needs potholes_by_lane, i.e. the network at load time
+    sumo_options = []          # Extra options when the engine starts SUMO itself
+
+    def __init__(self, potholes_by_lane, potholes_xy):
+        self.potholes_by_lane = potholes_by_lane
+        self.potholes_xy = potholes_xy
+        self.pothole_grid = PotholeGrid(potholes_xy)
+        self.log = EventLog()
+
+    def new_state(self):
+        """Per-vehicle tracking dictionaries, {name: {veh_id: value}}"""
+        return {}
+
+    def resume(self, state):
+        """Re-apply TraCI overrides of a loaded checkpoint (SUMO state files don't keep them)"""
+
+    def new_scheduler(self, step_length):
+        raise NotImplementedError
+
+    def new_zone_subscriptions(self, step_length):
+        raise NotImplementedError
+
+    def busy(self, state):
+        """Vehicles to evaluate every step in subscription mode, wherever they are"""
+        return ()
+
+    def control_vehicle(self, veh_id, step, now, state, cmd, vehicle, profiler):
+        """
+        One vehicle, one step. cmd takes the set-commands (batch buffer or
+        traci.vehicle), vehicle the getters (subscribed values or
+        traci.vehicle). Returns (x, y, max_speed[, road_id, lane_pos]) - any
+        may be None, known values save the scheduler TraCI calls - for the
+        wake-up scheduler when the vehicle is idle, None to keep it awake.
+        """
+        raise NotImplementedError
+
+    def command_failed(self, step, veh_id, var, error, state, cmd):
+        """A batched set-command (traci.constants var) was rejected by SUMO when flushed"""
+
+    def progress(self, step, state):
+        """Called every PROGRESS_INTERVAL simulated seconds"""
+
+    def summary(self, step, state):
+        """Called once after the run"""
+
+
+# ============================================================================
+# ENGINE
+# ============================================================================
+
+def flush_commands(policy, step, state, commands):
+    """Send the step's batched commands; the policy's fallbacks for rejected ones go out in the same step"""
+    failed = commands.flush()
+    for veh_id, var, error in failed:
+        policy.command_failed(step, veh_id, var, error, state, commands)
+    if failed:
+        commands.flush()
+
+
+def control_step(policy, step, state, profiler=NullProfiler(), scheduler=None, zones=None, commands=None,
+                 view=None, arrived=None):
+    """
+    Run the policy for every vehicle (or only the due / nearby ones) for one simulation step.
+    arrived: this step's getArrivedIDList() if the caller already has it (saves the scheduler a call)
+    """
+    now = traci.simulation.getTime()   # Timers are simulated seconds (sim_clock.py)
+    cmd = commands or traci.vehicle    # Set-commands go to the batch buffer when given
+    vehicle = view or traci.vehicle    # Getters read subscribed values when given
+
+    if zones:
+        vehicle_ids = zones.vehicles(busy=policy.busy(state))
+    elif scheduler:
+        vehicle_ids = scheduler.due(arrived)
+    else:
+        vehicle_ids = traci.vehicle.getIDList()
+    profiler.lap('getters')
+
+    for veh_id in vehicle_ids:
+        try:
+            if scheduler:
+                scheduler.keep_awake(veh_id)
+            idle = policy.control_vehicle(veh_id, step, now, state, cmd, vehicle, profiler)
+            if scheduler and idle is not None:
+                scheduler.schedule(veh_id, *idle)
+        except traci.exceptions.TraCIException:
+            # Skip the vehicle this step (teleporting, ...); arrivals are forgotten by run_controller
+            if scheduler:
+                scheduler.keep_awake(veh_id)
+            profiler.lap('state_update')
+
+
+def run_controller(policy, sumo_cmd, profiler=None, adaptive=False, subscriptions=False, batch=False,
+                   checkpoints=None, resume=None, obstacles_file=None, rerouting=None, events=None,
+                   step_length=None):
+    """TraCI main loop around a policy; returns the last simulation step"""
+    if profiler is None:
+        profiler = NullProfiler()
+
+    traci.start(sumo_cmd + step_length_options(step_length))
+
+    state = policy.new_state()
+    step = 0
+    if resume:
+        step, saved = load_checkpoint(resume)
+        if saved:  # Snapshots carry no controller state
+            for key, tracked in state.items():
+                saved.setdefault(key, tracked)   # Older checkpoints lack newer dicts
+            state = saved
+            policy.resume(state)
+    checkpoints = checkpoints or Checkpointer(policy.name)
+    step_length = traci.simulation.getDeltaT()
+    scheduler = policy.new_scheduler(step_length) if adaptive else None
+    zones = policy.new_zone_subscriptions(step_length) if subscriptions else None
+    commands = CommandBuffer() if batch else None
+    progress_steps = steps_for(PROGRESS_INTERVAL, step_length)
+    if rerouting:
+        rerouting.start(policy.potholes_by_lane)
+    if events:
+        events.start(PotholeRegistry(policy.potholes_by_lane, policy.potholes_xy, obstacles_file,
+                                     scheduler, zones, rerouting, policy.pothole_grid))
+
+    try:
+        while traci.simulation.getMinExpectedNumber() > 0:
+            profiler.begin_step(step + 1)
+            if commands:
+                flush_commands(policy, step, state, commands)
+                profiler.lap('flush_commands')
+            checkpoints.maybe_save(step, state)
+            traci.simulationStep()
+            step += 1
+            profiler.lap('simulation_step')
+            arrived = traci.simulation.getArrivedIDList()
+            for veh_id in arrived:
+                forget_vehicle(state, veh_id, scheduler, commands)
+            profiler.lap('state_update')
+            if rerouting:
+                rerouting.step()
+                profiler.lap('rerouting')
+            if events:
+                events.step()
+                profiler.lap('pothole_events')
+
+            control_step(policy, step, state, profiler, scheduler, zones, commands, arrived=arrived)
+            if step % progress_steps == 0:
+                policy.progress(step, state)
+
+            profiler.end_step()
+
+    except KeyboardInterrupt:
+        print("\nSimulation interrupted by user")
+    finally:
+        traci.close()
+        profiler.finish()
+        print(policy.log.summary())
+        if scheduler:
+            print(f"Adaptive control skipped {scheduler.skipped} vehicle evaluations")
+        if commands:
+            print(commands.summary())
+        if rerouting:
+            print(rerouting.summary())
+        if events:
+            print(events.summary())
+        policy.summary(step, state)
+    return step
+
+
+def run_simulation(policy_class, sumo_config, obstacles_file=None, net_file=None, profiler=None, adaptive=False,
+                   subscriptions=False, batch=False, checkpoints=None, resume=None, potholes=None, sumo_cmd=None,
+                   rerouting=None, events=None, step_length=None):
+    """Load the potholes (unless the caller already did, e.g. twin_run.py) and run a policy on a SUMO config"""
+    obstacles_file = obstacles_file or sumo_config.replace('.sumocfg', '.obstacles.xml')
+    if potholes is None:
+        # Rerouting penalises pothole lanes, so it needs them even for XY-only policies
+        lanes = policy_class.uses_lanes or rerouting is not None
+        net_file = net_file or sumo_config.replace('.sumocfg', '.net.xml')
+        potholes = load_potholes(obstacles_file, net_file if lanes else None)
+    if not potholes[1]:
+        print("ERROR: No potholes loaded!")
+        return 0
+    policy = policy_class(*potholes)
+    sumo_cmd = sumo_cmd or [SUMO_BINARY, "-c", sumo_config] + policy_class.sumo_options
+    return run_controller(policy, sumo_cmd, profiler, adaptive, subscriptions, batch, checkpoints, resume,
+                          obstacles_file, rerouting, events, step_length)
+
+
+# ============================================================================
+# COMMAND LINE
+# ============================================================================
+
+def add_controller_arguments(parser):
+    """Register the engine's options on a controller's parser; returns the mode group (--adaptive/--subscriptions)"""
+    parser.add_argument('--config', default='mymap.sumocfg', help='SUMO config file')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--adaptive', action='store_true',
+                      help='Only evaluate vehicles that could reach a pothole (wake-up buckets)')
+    mode.add_argument('--subscriptions', action='store_true',
+                      help='Only evaluate vehicles SUMO reports near potholes (lane/context subscriptions)')
+    parser.add_argument('--batch-commands', action='store_true',
+                        help='Send each step\'s set-commands in one TraCI message, dropping redundant repeats')
+    add_profiler_arguments(parser)
+    add_checkpoint_arguments(parser)
+    add_snapshot_arguments(parser)
+    add_rerouting_arguments(parser)
+    add_event_arguments(parser)
+    add_step_length_arguments(parser)
+    return mode
+
+
+def run_from_args(policy_class, args, default_obstacles=None):
+    """run_simulation() with the options of add_controller_arguments()"""
+    snapshot, obstacles_file = snapshot_from_args(args, default_obstacles)
+    resume = resolve_checkpoint(args.resume, policy_class.name, args.checkpoint_dir) if args.resume else snapshot
+    return run_simulation(policy_class, args.config, obstacles_file, profiler=profiler_from_args(args),
+                          adaptive=args.adaptive, subscriptions=args.subscriptions, batch=args.batch_commands,
+                          checkpoints=checkpointer_from_args(args, policy_class.name), resume=resume,
+                          rerouting=rerouting_from_args(args), events=events_from_args(args),
+                          step_length=args.step_length)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Dynamic Potholes
+================
+Roads degrade and get repaired while the simulation runs. PotholeRegistry
+adds and removes potholes mid-run: the GUI polygon goes through
+traci.polygon and every lookup structure the controller uses is updated in
+place, never rebuilt:
+
+    potholes_by_lane    append / remove on the one lane list
+    potholes_xy         append / swap-with-last removal, O(1)
+    PotholeGrid         append / remove in one grid cell
+    WakeupScheduler     grid cell + sorted edge positions (bisect);
+                        sleeping vehicles are re-evaluated once next step
+    ZoneSubscriptions   one lane subscription, one POI context subscription
+    PotholeRerouting    one edge penalty (pushed with the next effort update)
+
+so thousands of changes per simulated hour cost a handful of TraCI calls
+each. The new pothole's lane and lane position come from one
+traci.simulation.convertRoad call, its offset from the lane centre from
+the lane shape (controller_core.py lane entries).
+
+Pothole events are replayed from a CSV file (time in simulated seconds;
+radius and speed_mult are optional, see pothole_model.py):
+
+    time,action,id,x,y,radius,speed_mult
+    600,add,crack_1,512.4,-4.8,1.2,0.05
+    1800,remove,pothole_3,,,,
+
+Usage:
+    python3 pothole_swerve_controller.py --pothole-events events.csv
+    registry = PotholeRegistry(potholes_by_lane, potholes_xy, obstacles_file)
+    registry.add('crack_1', 512.4, -4.8); registry.remove('pothole_3')
+"""
+
+import csv
+import math
+import xml.etree.ElementTree as ET
+import traci
+from pothole_model import DEFAULT_RADIUS, DEFAULT_SPEED_MULT, MAX_RADIUS, POTHOLE_PREFIX, lane_projection
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+POLYGON_POINTS = 12
+POLYGON_TYPE = "pothole_dynamic"
+POLYGON_COLOR = (128, 0, 128, 255)
+POLYGON_LAYER = 10
+
+
+def circle_shape(x, y, radius=DEFAULT_RADIUS, points=POLYGON_POINTS):
+    """Polygon outline of a round pothole, as indian_road_simulator.py draws them"""
+    return [(x + radius * math.cos(2 * math.pi * i / points), y + radius * math.sin(2 * math.pi * i / points))
+            for i in range(points)]
+
+
+def obstacle_ids(obstacles_file):
+    """IDs of the potholes load_potholes() read, in its order"""
+    try:
+        root = ET.parse(obstacles_file).getroot()
+    except (OSError, ET.ParseError):
+        return []
+    return [poly.get('id') for poly in root.findall('poly')
+            if poly.get('id', '').startswith(POTHOLE_PREFIX) and poly.get('shape')]
+
+
+class PotholeRegistry:
+    """Runtime add/remove of potholes on the controller's own lookup structures"""
+
+    def __init__(self, potholes_by_lane, potholes_xy, obstacles_file=None,
+                 scheduler=None, zones=None, rerouting=None, grid=None):
+        self.potholes_by_lane = potholes_by_lane
+        self.potholes_xy = potholes_xy
+        self.grid = grid
+        self.scheduler = scheduler
+        self.zones = zones
+        self.rerouting = rerouting
+        self.potholes = {}     # pothole_id -> {'xy': entry, 'lane': lane_id, 'entry': lane entry, 'zone': key}
+        self.xy_index = {}     # pothole_id -> index in potholes_xy
+        self.xy_ids = []       # potholes_xy index -> pothole_id
+        self.added = 0
+        self.removed = 0
+
+        # Loaded potholes: IDs from the obstacle file, lanes matched by centre
+        ids = obstacle_ids(obstacles_file) if obstacles_file else []
+        if len(ids) != len(potholes_xy):
+            ids = [f"pothole_{i}" for i in range(len(potholes_xy))]
+        lanes_by_centre = {(entry[3], entry[4]): (lane_id, entry)
+                           for lane_id, entries in potholes_by_lane.items() for entry in entries}
+        for i, (pothole_id, xy) in enumerate(zip(ids, potholes_xy)):
+            lane_id, entry = lanes_by_centre.get((xy[0], xy[1]), (None, None))
+            self.potholes[pothole_id] = {'xy': xy, 'lane': lane_id, 'entry': entry, 'zone': i, 'polygon': True}
+            self.xy_index[pothole_id] = i
+            self.xy_ids.append(pothole_id)
+
+    def add(self, pothole_id, x, y, radius=DEFAULT_RADIUS, speed_mult=DEFAULT_SPEED_MULT, ptype=POLYGON_TYPE,
+            polygon=True):
+        """Add a pothole at (x, y); returns False if the ID exists"""
+        if pothole_id in self.potholes:
+            return False
+        radius = min(radius, MAX_RADIUS)
+        xy = (x, y, radius, ptype, speed_mult)
+        self.xy_index[pothole_id] = len(self.potholes_xy)
+        self.potholes_xy.append(xy)
+        self.xy_ids.append(pothole_id)
+        if self.grid is not None:
+            self.grid.add(xy)
+
+        lane_id = entry = None
+        try:
+            edge_id, pos, lane_index = traci.simulation.convertRoad(x, y)
+            if not edge_id.startswith(':'):
+                lane_id = f"{edge_id}_{lane_index}"
+                lateral = lane_projection(traci.lane.getShape(lane_id), x, y)[2]
+                entry = (pos, speed_mult, ptype, x, y, radius, lateral)
+                self.potholes_by_lane.setdefault(lane_id, []).append(entry)
+        except traci.exceptions.TraCIException:
+            pass    # Off the road network: XY hits only
+
+        self.potholes[pothole_id] = {'xy': xy, 'lane': lane_id, 'entry': entry, 'zone': pothole_id,
+                                     'polygon': polygon}
+        if polygon:
+            traci.polygon.add(pothole_id, circle_shape(x, y, radius), POLYGON_COLOR, fill=True,
+                              polygonType=ptype, layer=POLYGON_LAYER)
+        if self.scheduler:
+            self.scheduler.add_pothole(x, y, lane_id.rsplit('_', 1)[0] if lane_id else None,
+                                       entry[0] if entry else None)
+        if self.zones:
+            if lane_id:
+                self.zones.add_lane(lane_id)
+            self.zones.add_point(pothole_id, x, y)
+        if self.rerouting and lane_id:
+            self.rerouting.pothole_changed(lane_id, speed_mult, added=True)
+        self.added += 1
+        return True
+
+    def remove(self, pothole_id):
+        """Remove a pothole (loaded or added); returns False if unknown"""
+        pothole = self.potholes.pop(pothole_id, None)
+        if pothole is None:
+            return False
+
+        # Swap the last XY entry into the hole
+        index = self.xy_index.pop(pothole_id)
+        last, moved = self.potholes_xy.pop(), self.xy_ids.pop()
+        if index < len(self.potholes_xy):
+            self.potholes_xy[index] = last
+            self.xy_ids[index] = moved
+            self.xy_index[moved] = index
+        if self.grid is not None:
+            self.grid.remove(pothole['xy'])
+
+        lane_id, entry = pothole['lane'], pothole['entry']
+        if lane_id:
+            entries = self.potholes_by_lane.get(lane_id, [])
+            if entry in entries:
+                entries.remove(entry)
+            if not entries:
+                self.potholes_by_lane.pop(lane_id, None)
+                if self.zones:
+                    self.zones.remove_lane(lane_id)
+
+        x, y = pothole['xy'][0], pothole['xy'][1]
+        if pothole['polygon']:
+            try:
+                traci.polygon.remove(pothole_id, POLYGON_LAYER)
+            except traci.exceptions.TraCIException:
+                pass    # Obstacle file not loaded into this SUMO
+        if self.scheduler:
+            self.scheduler.remove_pothole(x, y, lane_id.rsplit('_', 1)[0] if entry else None,
+                                          entry[0] if entry else None)
+        if self.zones:
+            self.zones.remove_point(pothole['zone'])
+        if self.rerouting and lane_id:
+            self.rerouting.pothole_changed(lane_id, entry[1], added=False)
+        self.removed += 1
+        return True
+
+    def summary(self):
+        return f"Dynamic potholes: {self.added} added, {self.removed} removed, {len(self.potholes)} active"
+
+
+# ============================================================================
+# EVENT SCHEDULE
+# ============================================================================
+
+def read_events(path):
+    """[(time, action, id, x, y, radius, speed_mult)] sorted by time; only IDs matter for removals"""
+    events = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            action = row['action'].strip()
+            if action not in ('add', 'remove'):
+                print(f"Warning: skipping pothole event with unknown action {action!r}")
+                continue
+            if action == 'add':
+                x, y = float(row['x']), float(row['y'])
+                radius = float(row.get('radius') or DEFAULT_RADIUS)
+                speed_mult = float(row.get('speed_mult') or DEFAULT_SPEED_MULT)
+            else:
+                x = y = radius = speed_mult = None
+            events.append((float(row['time']), action, row['id'].strip(), x, y, radius, speed_mult))
+    events.sort(key=lambda event: event[0])   # Stable: same-time events keep file order
+    return events
+
+
+class PotholeEvents:
+    """Replays an event file against a PotholeRegistry as simulated time passes"""
+
+    def __init__(self, path):
+        self.path = path
+        self.events = read_events(path)
+        self.next = 0
+        self.registry = None
+
+    def start(self, registry):
+        """Attach the registry; events up to the current time (e.g. after a resume) apply at once"""
+        self.registry = registry
+        print(f"Pothole events: {len(self.events)} from {self.path}")
+        self.step()
+
+    def step(self):
+        """Call once per simulation step, after traci.simulationStep()"""
+        now = traci.simulation.getTime()
+        while self.next < len(self.events) and self.events[self.next][0] <= now:
+            _, action, pothole_id, x, y, radius, speed_mult = self.events[self.next]
+            self.next += 1
+            if action == 'add':
+                self.registry.add(pothole_id, x, y, radius, speed_mult)
+            else:
+                self.registry.remove(pothole_id)
+
+    def summary(self):
+        return self.registry.summary() if self.registry else "Dynamic potholes: not started"
+
+
+def add_event_arguments(parser):
+    """Register --pothole-events on a controller's argparse parser"""
+    parser.add_argument('--pothole-events', default=None, metavar='CSV',
+                        help='Add/remove potholes during the run (time,action,id,x,y; dynamic_potholes.py)')
+
+
+def events_from_args(args):
+    """PotholeEvents for run_simulation(..., events=...), or None"""
+    return PotholeEvents(args.pothole_events) if args.pothole_events else None
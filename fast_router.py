@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+In-Process Trip Router
+======================
+Optional replacement for duarouter in the scenario generators. The edge
+graph is built ONCE from the network (sumolib), trips are routed in Python
+and mymap.rou.xml is written directly: no duarouter processes, no XML
+round trip per block.
+
+Routing:
+- cost of an edge = length / min(edge speed, vehicle maxSpeed), plus the
+  junction (via lane) it is entered through - what duarouter minimizes
+  with its default travel time weights on an empty network
+- one Dijkstra shortest-path tree per (origin edge, vehicle maxSpeed),
+  kept in an LRU cache; trips are routed grouped by origin, so a tree
+  serves every trip that starts on its edge. For the thousands of trips
+  per origin of city-scale demand this beats any per-trip search (A*,
+  contraction hierarchies): each trip costs one walk up the tree.
+- flows are expanded into vehicles with seeded random departures (what
+  duarouter --randomize-flows does), all sharing the flow's route
+
+Unlike duarouter --weights.random-factor the routes are the exact fastest
+routes. `compare` routes a trips file both ways and reports how many routes
+match and how many are within a travel time tolerance of duarouter's.
+
+Usage:
+    python3 fast_router.py --net mymap.net.xml --trips mymap.trips.xml -o mymap.rou.xml
+    python3 fast_router.py compare --net mymap.net.xml --trips mymap.trips.xml
+"""
+
+import os
+import sys
+import time
+import heapq
+import subprocess
+from collections import OrderedDict
+
+# Add SUMO tools to path
+if 'SUMO_HOME' in os.environ:
+    tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
+    sys.path.append(tools)
+
+import sumolib
+from scenario_seed import scenario_seed, seeded_rng
+from parallel_routing import DEFINITIONS, ROUTES_HEADER, depart_time, to_xml, top_level_elements
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+VCLASS = "passenger"            # Every generated vType routes as passenger
+TREE_CACHE = 2000               # Shortest-path trees kept (each is two lists over all edges)
+DEFAULT_MAX_SPEED = 55.55       # SUMO's default vType maxSpeed (m/s)
+
+
+class FastRouter:
+    """Edge graph of one network with cached shortest-path trees"""
+
+    def __init__(self, net_file, vclass=VCLASS, cache_size=TREE_CACHE):
+        net = sumolib.net.readNet(net_file, withInternal=True)
+        edges = [edge for edge in net.getEdges()
+                 if edge.getFunction() != 'internal' and edge.allows(vclass)]
+        self.ids = [edge.getID() for edge in edges]
+        self.index = {edge_id: i for i, edge_id in enumerate(self.ids)}
+        self.length = [edge.getLength() for edge in edges]
+        self.speed = [edge.getSpeed() for edge in edges]
+        # successors[i] = [(j, via lane length, via lane speed)], cheapest allowed connection per successor
+        self.successors = []
+        for edge in edges:
+            succ = {}
+            for to_edge, connections in edge.getOutgoing().items():
+                j = self.index.get(to_edge.getID())
+                if j is None:
+                    continue
+                for c in connections:
+                    if not (c.getFromLane().allows(vclass) and c.getToLane().allows(vclass)):
+                        continue
+                    via = c.getViaLaneID()
+                    via_lane = net.getLane(via) if via else None
+                    via_cost = (via_lane.getLength(), via_lane.getSpeed()) if via_lane else (0.0, 1.0)
+                    if j not in succ or via_cost[0] / via_cost[1] < succ[j][0] / succ[j][1]:
+                        succ[j] = via_cost
+            self.successors.append([(j, length, speed) for j, (length, speed) in succ.items()])
+
+        self.cache_size = cache_size
+        self.weighted = {}              # max_speed -> successors with precomputed costs
+        self.trees = OrderedDict()      # (origin, max_speed) -> predecessor list
+        self.trees_built = 0
+        self.tree_hits = 0
+
+    def weighted_successors(self, max_speed):
+        """[[(successor, cost of the junction + successor edge)]] for one vehicle max speed"""
+        adjacency = self.weighted.get(max_speed)
+        if adjacency is None:
+            edge_time = [length / min(speed, max_speed) for length, speed in zip(self.length, self.speed)]
+            adjacency = self.weighted[max_speed] = [
+                [(v, via_length / min(via_speed, max_speed) + edge_time[v]) for v, via_length, via_speed in succ]
+                for succ in self.successors]
+        return adjacency
+
+    def shortest_path_tree(self, origin, max_speed=DEFAULT_MAX_SPEED):
+        """Predecessor list of the fastest routes from origin (edge index) to every edge"""
+        key = (origin, max_speed)
+        tree = self.trees.get(key)
+        if tree is not None:
+            self.trees.move_to_end(key)
+            self.tree_hits += 1
+            return tree
+
+        n = len(self.ids)
+        dist = [float('inf')] * n
+        pred = [-1] * n
+        adjacency = self.weighted_successors(max_speed)
+        heappush, heappop = heapq.heappush, heapq.heappop
+        dist[origin] = 0.0
+        heap = [(0.0, origin)]
+        while heap:
+            d, u = heappop(heap)
+            if d > dist[u]:
+                continue        # Stale entry
+            for v, w in adjacency[u]:
+                cost = d + w
+                if cost < dist[v]:
+                    dist[v] = cost
+                    pred[v] = u
+                    heappush(heap, (cost, v))
+
+        self.trees[key] = pred
+        self.trees_built += 1
+        if len(self.trees) > self.cache_size:
+            self.trees.popitem(last=False)
+        return pred
+
+    def route(self, from_edge, to_edge, max_speed=DEFAULT_MAX_SPEED):
+        """Fastest route as a list of edge IDs, or None if to_edge cannot be reached"""
+        origin = self.index.get(from_edge)
+        target = self.index.get(to_edge)
+        if origin is None or target is None:
+            return None
+        if origin == target:
+            return [from_edge]
+        pred = self.shortest_path_tree(origin, max_speed)
+        if pred[target] < 0:
+            return None
+        path = [target]
+        while path[-1] != origin:
+            path.append(pred[path[-1]])
+        return [self.ids[i] for i in reversed(path)]
+
+    def travel_time(self, edges, max_speed=DEFAULT_MAX_SPEED):
+        """Free-flow travel time of a route (edges only)"""
+        return sum(self.length[self.index[e]] / min(self.speed[self.index[e]], max_speed)
+                   for e in edges if e in self.index)
+
+
+# ============================================================================
+# TRIPS -> ROUTES
+# ============================================================================
+
+def read_demand(trips_file, seed):
+    """(definitions, vehicle max speeds, [(depart, veh_id, attributes, from, to)]) with flows expanded"""
+    definitions = []
+    max_speeds = {}
+    demand = []
+    rng = seeded_rng(seed, 'flows')
+    for elem in top_level_elements(trips_file):
+        if elem.tag in DEFINITIONS:
+            definitions.append(to_xml(elem))
+            if elem.tag == 'vType':
+                max_speeds[elem.get('id')] = float(elem.get('maxSpeed', DEFAULT_MAX_SPEED))
+            continue
+        attributes = {k: v for k, v in elem.attrib.items()
+                      if k not in ('id', 'from', 'to', 'depart', 'begin', 'end', 'period', 'number',
+                                   'vehsPerHour', 'probability')}
+        if elem.tag == 'flow':
+            begin = float(elem.get('begin', '0'))
+            end = float(elem.get('end', '3600'))
+            if elem.get('number'):
+                count = int(elem.get('number'))
+            else:
+                count = int((end - begin) / float(elem.get('period', '1')))
+            departs = sorted(rng.uniform(begin, end) for _ in range(count))
+            for i, depart in enumerate(departs):
+                demand.append((depart, f"{elem.get('id')}.{i}", attributes, elem.get('from'), elem.get('to')))
+        else:
+            demand.append((depart_time(elem), elem.get('id'), attributes, elem.get('from'), elem.get('to')))
+    return definitions, max_speeds, demand
+
+
+def route_trips_in_process(net_file, trips_file, rou_file, seed=None, router=None):
+    """Route a trips file in Python and write the route file; returns (routes written, unroutable)"""
+    seed = scenario_seed() if seed is None else seed
+    started = time.time()
+    router = router or FastRouter(net_file)
+    definitions, max_speeds, demand = read_demand(trips_file, seed)
+
+    # Group by origin so each shortest-path tree is used while it is cached
+    routes = [None] * len(demand)
+    order = sorted(range(len(demand)), key=lambda i: (demand[i][3] or '', demand[i][2].get('type', '')))
+    flow_routes = {}
+    for i in order:
+        depart, veh_id, attributes, from_edge, to_edge = demand[i]
+        max_speed = max_speeds.get(attributes.get('type'), DEFAULT_MAX_SPEED)
+        key = (from_edge, to_edge, max_speed)
+        if key not in flow_routes:
+            flow_routes[key] = router.route(from_edge, to_edge, max_speed)
+        routes[i] = flow_routes[key]
+
+    written = 0
+    with open(rou_file, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n\n')
+        f.write(f"<!-- routed by fast_router.py, seed {seed} -->\n\n")
+        f.write(ROUTES_HEADER)
+        f.writelines(definitions)
+        for (depart, veh_id, attributes, _, _), edges in sorted(zip(demand, routes), key=lambda item: item[0][0]):
+            if not edges:
+                continue
+            extra = "".join(f' {k}="{v}"' for k, v in attributes.items())
+            f.write(f'    <vehicle id="{veh_id}" depart="{depart:.2f}"{extra}>\n'
+                    f'        <route edges="{" ".join(edges)}"/>\n'
+                    f'    </vehicle>\n')
+            written += 1
+        f.write('</routes>\n')
+
+    unroutable = len(demand) - written
+    print(f"Routed {written} vehicles in-process in {time.time() - started:.1f}s "
+          f"({router.trees_built} shortest-path trees, {router.tree_hits} reused, {unroutable} unroutable)")
+    return written, unroutable
+
+
+# ============================================================================
+# COMPARISON WITH DUAROUTER
+# ============================================================================
+
+def read_routes(rou_file):
+    """{veh_id: (type, [edges])} of a route file"""
+    routes = {}
+    for elem in top_level_elements(rou_file):
+        if elem.tag == 'vehicle':
+            route = elem.find('route')
+            if route is None:
+                route = elem.find('routeDistribution/route')
+            if route is not None:
+                routes[elem.get('id')] = (elem.get('type'), route.get('edges').split())
+    return routes
+
+
+def compare_with_duarouter(net_file, trips_file, seed=None, tolerance=0.05):
+    """Route both ways (duarouter without random weights); report agreement"""
+    seed = scenario_seed() if seed is None else seed
+    router = FastRouter(net_file)
+    ours_file = trips_file.replace('.xml', '.fast.rou.xml')
+    theirs_file = trips_file.replace('.xml', '.duarouter.rou.xml')
+
+    start = time.time()
+    route_trips_in_process(net_file, trips_file, ours_file, seed, router)
+    ours_time = time.time() - start
+    start = time.time()
+    subprocess.run(["duarouter", "-n", net_file, "-t", trips_file, "-o", theirs_file, "--ignore-errors",
+                    "--no-warnings", "--seed", str(seed)], capture_output=True)
+    duarouter_time = time.time() - start
+
+    _, max_speeds, _ = read_demand(trips_file, seed)
+    ours = read_routes(ours_file)
+    theirs = read_routes(theirs_file)
+    same = within = both = 0
+    for veh_id, (vtype, edges) in theirs.items():
+        if veh_id not in ours:
+            continue
+        both += 1
+        max_speed = max_speeds.get(vtype, DEFAULT_MAX_SPEED)
+        if ours[veh_id][1] == edges:
+            same += 1
+        theirs_time = router.travel_time(edges, max_speed)
+        if abs(router.travel_time(ours[veh_id][1], max_speed) - theirs_time) <= tolerance * theirs_time:
+            within += 1
+
+    print(f"duarouter: {len(theirs)} routes in {duarouter_time:.1f}s, in-process: {len(ours)} routes in {ours_time:.1f}s")
+    if both:
+        print(f"{same}/{both} identical routes ({same / both:.1%}), "
+              f"{within}/{both} ({within / both:.1%}) within {tolerance:.0%} of duarouter's travel time")
+    return same, within, both
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Route trips in-process with cached shortest-path trees")
+    parser.add_argument('command', nargs='?', default='route', choices=['route', 'compare'])
+    parser.add_argument('--net', default='mymap.net.xml', help='SUMO network')
+    parser.add_argument('--trips', default='mymap.trips.xml', help='Trips / flows to route')
+    parser.add_argument('-o', '--output', default='mymap.rou.xml', help='Route file to write')
+    parser.add_argument('--seed', type=int, default=None, help='Scenario seed (default $SCENARIO_SEED or 42)')
+    parser.add_argument('--tolerance', type=float, default=0.05, help='compare: allowed travel time difference')
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        compare_with_duarouter(args.net, args.trips, args.seed, args.tolerance)
+    else:
+        route_trips_in_process(args.net, args.trips, args.output, args.seed)
@@ -1,8 +1,12 @@
 import os
 import subprocess
 import xml.etree.ElementTree as ET
-import random
 import math
+from scenario_seed import scenario_seed, seeded_rng, strip_generation_date
+from parallel_routing import route_trips, DUAROUTER_OPTIONS
+from road_graph import connected_edges
+from fast_router import route_trips_in_process
+from pothole_model import pothole_params_xml
 # --- SETTINGS ---
 osm_file = "mymap.osm"
 net_file = "mymap.net.xml"
@@ -13,15 +17,26 @@ sumocfg_file = "mymap.sumocfg"
 vtypes_file = "mymap.vtypes.xml"
 obstacles_file = "mymap.obstacles.xml"
 gui_settings_file = "mymap.gui.xml"
+tripinfo_file = "mymap.tripinfo.xml.gz"  # Per-trip travel time / delay / stops (trip_analytics.py)
+fcd_file = "mymap.fcd.xml.gz"            # Per-vehicle trajectories, gzipped by SUMO (FCD_OUTPUT only)
 
 SUMO_HOME = os.environ.get("SUMO_HOME", "/usr/share/sumo")
 
 # Simulation parameters
+SCENARIO_SEED = scenario_seed()  # $SCENARIO_SEED (default 42): same seed -> byte-identical scenario files
 SIMULATION_TIME = 7200  # 2 hours for longer simulation
+STEP_LENGTH = 0.1  # seconds per step; controller timers are in seconds, so 0.5 runs ~5x faster with the same behaviour
 NUM_VEHICLES_PER_TYPE = 100  # Increased from 25 to 100
 POTHOLES_PER_ROAD = 6  # Increased from 4
 POTHOLE_ZONE_LENGTH = 8  # meters (increased from 5)
+IN_PROCESS_ROUTING = False  # True: fastest routes computed in Python (fast_router.py) instead of duarouter
+ROUTING_WORKERS = os.cpu_count()  # duarouter processes (parallel_routing.py); routes do not depend on it
 DEPARTURE_INTERVAL = 5  # seconds between vehicle spawns (reduced from 10)
+FCD_OUTPUT = False  # True: also write per-vehicle trajectories (fcd_file, GBs on a 2-hour run); tripinfo is always written
+FCD_PERIOD = 1.0  # seconds between FCD samples (every step would be 1/STEP_LENGTH x larger)
+NATIVE_POTHOLE_EFFECTS = False  # True: SUMO applies pothole slowdowns itself (native_potholes.py), no TraCI control
+TWIN_BASELINE = False  # True: also run a pothole-free baseline alongside the controller (twin_run.py)
+MESOSCOPIC = False  # True: city-wide mode, potholes as per-edge speed/capacity cuts under --mesosim (meso_potholes.py)
 
 # --- 1. Convert OSM to SUMO network ---
 print("Converting OSM to SUMO network...")
@@ -38,6 +53,7 @@ subprocess.run([
     "--osm.oneway", "false",  # Treat all roads as bidirectional
     "-v"
 ])
+strip_generation_date(net_file)
 
 # --- 2. Generate polygons (optional) ---
 print("Generating polygons...")
@@ -48,31 +64,32 @@ subprocess.run([
     "--type-file", os.path.join(SUMO_HOME, "data/typemap/osmPolyconvert.typ.xml"),
     "-o", poly_file
 ])
+strip_generation_date(poly_file)
 
 # --- 2.5. Generate vehicle types with improved Indian road characteristics ---
 print("Generating vehicle types...")
 with open(vtypes_file, "w") as f:
     f.write(f"""<routes xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:noNamespaceSchemaLocation="http://sumo.dlr.de/xsd/routes_file.xsd">
     <!-- Auto-rickshaw: overtakes, medium distance, medium speed -->
-    <vType id="auto" accel="1.8" decel="4.5" sigma="0.7" length="3.0" minGap="1.2" 
+    <vType id="auto" accel="1.8" decel="4.5" sigma="0.7" length="3.0" width="1.4" minGap="1.2" 
            maxSpeed="13.89" color="1,1,0" vClass="passenger" guiShape="delivery" 
            speedFactor="0.95" speedDev="0.25" lcStrategic="2.0" lcCooperative="0.4"
            lcSpeedGain="2.5" lcKeepRight="0.2" lcAssertive="1.5"/>
     
     <!-- Motorbike: erratic speed, frequent lane changes, short distance, fast -->
-    <vType id="motorbike" accel="4.0" decel="7.0" sigma="0.8" length="2.0" minGap="0.5" 
+    <vType id="motorbike" accel="4.0" decel="7.0" sigma="0.8" length="2.0" width="0.8" minGap="0.5" 
            maxSpeed="27.78" color="1,0,0" vClass="passenger" guiShape="motorcycle"
            speedFactor="1.3" speedDev="0.4" lcStrategic="3.0" lcCooperative="0.2"
            lcSpeedGain="4.0" lcKeepRight="0.1" lcAssertive="2.0" impatience="1.0"/>
     
     <!-- Car: average behavior, long distance -->
-    <vType id="car" accel="2.6" decel="4.5" sigma="0.5" length="5.0" minGap="2.5" 
+    <vType id="car" accel="2.6" decel="4.5" sigma="0.5" length="5.0" width="1.8" minGap="2.5" 
            maxSpeed="33.33" color="0.9,0.9,0.9" vClass="passenger" guiShape="passenger"
            speedFactor="1.05" speedDev="0.2" lcStrategic="1.0" lcCooperative="1.0"
            lcSpeedGain="1.0" lcKeepRight="0.5" lcAssertive="1.0"/>
     
     <!-- Bus: slow, long distance, less maneuverable -->
-    <vType id="bus" accel="1.2" decel="3.5" sigma="0.3" length="12.0" minGap="3.5" 
+    <vType id="bus" accel="1.2" decel="3.5" sigma="0.3" length="12.0" width="2.5" minGap="3.5" 
            maxSpeed="22.22" color="0,0,1" vClass="passenger" guiShape="bus"
            speedFactor="0.9" speedDev="0.1" lcStrategic="0.5" lcCooperative="1.5"
            lcSpeedGain="0.5" lcKeepRight="0.8" lcAssertive="0.5"/>
@@ -111,6 +128,7 @@ with open(obstacles_file, "w") as f:
     
     pothole_id = 0
     edge_positions = {}
+    pothole_rng = seeded_rng(SCENARIO_SEED, 'potholes')
     
     for edge in main_roads:
         edge_id = edge.get('id')
@@ -138,7 +156,7 @@ with open(obstacles_file, "w") as f:
             pos_ratio = None
             
             while attempts < 50:
-                test_ratio = random.uniform(0.2, 0.8)
+                test_ratio = pothole_rng.uniform(0.2, 0.8)
                 test_pos = length * test_ratio
                 
                 # Check minimum 60m spacing between potholes
@@ -170,7 +188,7 @@ with open(obstacles_file, "w") as f:
             ptype_name, ptype_color, speed_multiplier = pothole_types[0]  # Always use the first (and only) type - red
             
             # Create circular pothole polygon for visualization
-            size = random.uniform(0.8, 1.5)  # Small circular potholes (0.8-1.5m diameter)
+            size = pothole_rng.uniform(0.8, 1.5)  # Small circular potholes (0.8-1.5m radius)
             points = []
             for angle_step in range(12):  # 12 points for smoother circle
                 angle = (angle_step * 360 / 12)
@@ -181,7 +199,9 @@ with open(obstacles_file, "w") as f:
                 points.append(f"{px:.2f},{py:.2f}")
             
             poly_shape = " ".join(points)
-            f.write(f"    <poly id=\"pothole_{pothole_id}\" type=\"pothole_{ptype_name}\" color=\"{ptype_color}\" fill=\"1\" layer=\"10\" shape=\"{poly_shape}\"/>\n")
+            f.write(f"    <poly id=\"pothole_{pothole_id}\" type=\"pothole_{ptype_name}\" color=\"{ptype_color}\" fill=\"1\" layer=\"10\" shape=\"{poly_shape}\">\n")
+            f.write(pothole_params_xml(size, speed_multiplier))  # Size and severity for the controllers
+            f.write("    </poly>\n")
             
             # Store pothole metadata as comment for TraCI controller to read
             pos = length * pos_ratio
@@ -232,6 +252,15 @@ if len(suitable_trip_edges) < 50:
                         suitable_trip_edges.append(edge_id)
                         break
 
+# Keep endpoints inside the largest strongly connected component: every trip is routable
+connected_edges_set = connected_edges(net_file)
+connected_trip_edges = [edge_id for edge_id in suitable_trip_edges if edge_id in connected_edges_set]
+if len(connected_trip_edges) < 2:
+    print(f"Warning: only {len(connected_trip_edges)} suitable edges are connected, using the whole component")
+    connected_trip_edges = sorted(connected_edges_set)
+print(f"Dropped {len(suitable_trip_edges) - len(connected_trip_edges)} edges outside the largest connected component")
+suitable_trip_edges = connected_trip_edges
+
 print(f"Found {len(suitable_trip_edges)} suitable edges for trips")
 
 # Create trips with embedded vehicle type definitions
@@ -242,25 +271,25 @@ with open(trips_file, "w") as f:
     # Add vehicle type definitions directly in route file
     f.write("""
     <!-- Auto-rickshaw: overtakes, medium distance -->
-    <vType id="auto" accel="1.8" decel="4.5" sigma="0.7" length="3.0" minGap="1.2" 
+    <vType id="auto" accel="1.8" decel="4.5" sigma="0.7" length="3.0" width="1.4" minGap="1.2" 
            maxSpeed="13.89" color="1,1,0" vClass="passenger" guiShape="delivery" 
            speedFactor="0.9" speedDev="0.2" lcStrategic="1.5" lcCooperative="0.5"
            lcSpeedGain="2.0" lcKeepRight="0.3"/>
     
     <!-- Motorbike: erratic, lane changes, short distance -->
-    <vType id="motorbike" accel="3.5" decel="6.0" sigma="0.6" length="2.0" minGap="0.5" 
+    <vType id="motorbike" accel="3.5" decel="6.0" sigma="0.6" length="2.0" width="0.8" minGap="0.5" 
            maxSpeed="27.78" color="1,0,0" vClass="passenger" guiShape="motorcycle"
            speedFactor="1.2" speedDev="0.3" lcStrategic="2.0" lcCooperative="0.3"
            lcSpeedGain="3.0" lcKeepRight="0.1"/>
     
     <!-- Car: average, long distance -->
-    <vType id="car" accel="2.6" decel="4.5" sigma="0.5" length="5.0" minGap="2.5" 
+    <vType id="car" accel="2.6" decel="4.5" sigma="0.5" length="5.0" width="1.8" minGap="2.5" 
            maxSpeed="33.33" color="0,0.9,0.9" vClass="passenger" guiShape="passenger"
            speedFactor="1.0" speedDev="0.15" lcStrategic="1.0" lcCooperative="1.0"
            lcSpeedGain="1.0" lcKeepRight="0.5"/>
     
     <!-- Bus: slow, long distance (using passenger vClass for routing) -->
-    <vType id="bus" accel="1.2" decel="3.5" sigma="0.3" length="12.0" minGap="3.5" 
+    <vType id="bus" accel="1.2" decel="3.5" sigma="0.3" length="12.0" width="2.5" minGap="3.5" 
            maxSpeed="22.22" color="0,0,1" vClass="passenger" guiShape="bus"
            speedFactor="0.85" speedDev="0.1" lcStrategic="0.5" lcCooperative="1.5"
            lcSpeedGain="0.5" lcKeepRight="0.8"/>
@@ -268,6 +297,7 @@ with open(trips_file, "w") as f:
 """)
     
     vehicle_id = 0
+    trip_rng = seeded_rng(SCENARIO_SEED, 'trips')
     
     # Generate FLOWS for continuous traffic throughout the 2-hour simulation
     # Flows will continuously spawn vehicles until end time (7200 seconds)
@@ -285,13 +315,13 @@ with open(trips_file, "w") as f:
         
         # Create multiple flows from different start points for variety
         for flow_num in range(5):  # 5 flows per vehicle type
-            from_edge = random.choice(suitable_trip_edges)
-            to_edge = random.choice(suitable_trip_edges)
+            from_edge = trip_rng.choice(suitable_trip_edges)
+            to_edge = trip_rng.choice(suitable_trip_edges)
             
             # Ensure different start and end
             attempts = 0
             while to_edge == from_edge and attempts < 10:
-                to_edge = random.choice(suitable_trip_edges)
+                to_edge = trip_rng.choice(suitable_trip_edges)
                 attempts += 1
             
             # Stagger flow start times to avoid all spawning at once
@@ -306,33 +336,19 @@ print(f"Created {flow_id} continuous vehicle flows (total ~90 vehicles/hour for
 
 # --- 4. Convert trips to routes with robust settings ---
 print("Converting trips to routes...")
-result = subprocess.run([
-    "duarouter",
-    "-n", net_file,
-    "-t", trips_file,
-    "-o", rou_file,
-    "--ignore-errors",
-    "--repair",
-    "--remove-loops",
-    "--routing-algorithm", "astar",
-    "--weights.random-factor", "1.5",
-    "--max-alternatives", "3",
-    "--randomize-flows",
-    "--no-warnings"
-], capture_output=True, text=True)
+if IN_PROCESS_ROUTING:
+    routes_written, unroutable = route_trips_in_process(net_file, trips_file, rou_file, SCENARIO_SEED)
+    routing_errors = [f"{unroutable} trips could not be routed"] if unroutable else []
+else:
+    routes_written, routing_errors = route_trips(net_file, trips_file, rou_file, DUAROUTER_OPTIONS,
+                                                 SCENARIO_SEED, ROUTING_WORKERS)
 
-if result.returncode != 0:
-    print(f"Warning: duarouter had issues: {result.stderr}")
+if routing_errors:
+    for stderr in routing_errors:
+        print(f"Warning: duarouter had issues: {stderr}")
 else:
     print("Routes generated successfully")
-    # Check how many routes were created
-    try:
-        route_tree = ET.parse(rou_file)
-        route_root = route_tree.getroot()
-        routes = route_root.findall('.//vehicle')
-        print(f"Successfully created {len(routes)} valid routes")
-    except Exception as e:
-        print(f"Could not count routes: {e}")
+    print(f"Successfully created {routes_written} valid routes")
 
 # --- 5. Create enhanced GUI settings for better visualization ---
 print("Creating GUI settings for better visualization...")
@@ -362,6 +378,9 @@ with open(gui_settings_file, "w") as f:
 
 # --- 6. Write comprehensive SUMO configuration ---
 print("Writing SUMO configuration...")
+fcd_output = f"""
+        <fcd-output value="{fcd_file}"/>
+        <device.fcd.period value="{FCD_PERIOD}"/>""" if FCD_OUTPUT else ""
 with open(sumocfg_file, "w") as f:
     f.write(f"""<configuration>
     <input>
@@ -372,7 +391,7 @@ with open(sumocfg_file, "w") as f:
     <time>
         <begin value="0"/>
         <end value="{SIMULATION_TIME}"/>
-        <step-length value="0.1"/>
+        <step-length value="{STEP_LENGTH}"/>
     </time>
     <processing>
         <collision.action value="warn"/>
@@ -386,12 +405,19 @@ with open(sumocfg_file, "w") as f:
         <default.speeddev value="0.2"/>
         <default.emergencydecel value="9"/>
     </processing>
+    <random_number>
+        <seed value="{SCENARIO_SEED}"/>
+    </random_number>
     <routing>
         <device.rerouting.probability value="0.4"/>
         <device.rerouting.period value="300"/>
         <device.rerouting.adaptation-steps value="180"/>
         <device.rerouting.adaptation-interval value="10"/>
     </routing>
+    <output>
+        <tripinfo-output value="{tripinfo_file}"/>
+        <tripinfo-output.write-unfinished value="true"/>{fcd_output}
+    </output>
     <report>
         <verbose value="true"/>
         <duration-log.statistics value="true"/>
@@ -411,7 +437,8 @@ with open(sumocfg_file, "w") as f:
     print("SIMULATION SETUP COMPLETE")
     print("="*60)
     print(f"Total vehicles: 120 (30 of each type)")
-    print(f"Simulation time: {SIMULATION_TIME} seconds ({SIMULATION_TIME/60:.1f} minutes)")
+    print(f"Simulation time: {SIMULATION_TIME} seconds ({SIMULATION_TIME/60:.1f} minutes), {STEP_LENGTH}s steps")
+    print(f"Scenario seed: {SCENARIO_SEED} (SCENARIO_SEED=<n> for another workload)")
     print(f"Vehicle types: auto, motorbike, car, bus (30 each)")
     print(f"Potholes: On main roads (pink=50%, orange=75%, red=90% INSTANT speed reduction)")
     print("="*60)
@@ -420,4 +447,16 @@ with open(sumocfg_file, "w") as f:
     print("="*60)
 
     # --- 7. Run SUMO with TraCI pothole swerve controller ---
-    subprocess.run(["python3", "pothole_swerve_controller.py", "--config", "mymap.sumocfg"])
\ No newline at end of file
+    if NATIVE_POTHOLE_EFFECTS:
+        # Potholes as micro-edges with a lane speed limit, Python only collects statistics
+        subprocess.run(["python3", "native_potholes.py", "build", "--config", sumocfg_file, "--obstacles", obstacles_file])
+        subprocess.run(["python3", "native_potholes.py", "run", "--config", sumocfg_file.replace(".sumocfg", ".native.sumocfg")])
+    elif MESOSCOPIC:
+        # No lateral swerving: per-class pothole delay from a mesoscopic twin run, outputs in twin_meso/
+        subprocess.run(["python3", "meso_potholes.py", "build", "--config", sumocfg_file, "--obstacles", obstacles_file])
+        subprocess.run(["python3", "meso_potholes.py", "run", "--config", sumocfg_file])
+    elif TWIN_BASELINE:
+        # Same routes and seed with and without pothole control, per-vehicle pothole delay in twin/delay.csv
+        subprocess.run(["python3", "twin_run.py", "--config", sumocfg_file])
+    else:
+        subprocess.run(["python3", "pothole_swerve_controller.py", "--config", "mymap.sumocfg"])
\ No newline at end of file
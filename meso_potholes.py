@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Mesoscopic Pothole Impact
+=========================
+City-wide studies need the delay potholes add per vehicle class, not the
+lateral swerves around each of them. SUMO's mesoscopic model (--mesosim)
+moves vehicles as queues along edge segments, orders of magnitude faster
+than the sublane model on networks much larger than mymap, but there are
+no lateral positions to swerve on and no per-vehicle TraCI control. The
+pothole layout is therefore aggregated into per-edge reductions, with the
+cost model of pothole_rerouting.py:
+
+    delay(edge)      = sum over its potholes of severity * EXPECTED_HIT_DELAY / lanes
+    speed(edge)      = length / (length / speed + delay)      free-flow time + expected pothole delay
+    capacity factor  = speed(edge) / speed                     crawling vehicles hold up the queue
+
+The reduced speed is patched into a copy of the network; the capacity
+factor becomes the edge's meso type, whose headways (tauff, taufj, taujf,
+taujj) are SUMO's defaults divided by the factor. Factors are rounded to
+CAPACITY_STEP, so a handful of types cover every pothole edge.
+
+The cost model assumes every pothole is hit by its lane's share of the
+traffic; the micro controllers swerve around some and miss others
+laterally. --delay-scale scales every edge delay: calibrate it once with
+twin_run.py and this run on a district, then study the whole city.
+
+build:
+1. Map each pothole polygon to its lane (native_potholes.py), severity from its params
+2. Per-edge delay, reduced speed and capacity factor
+3. netconvert: speed + meso type of every pothole edge -> mymap.meso.net.xml
+4. Meso types -> mymap.meso.add.xml; mymap.meso.sumocfg uses both, with mesosim on
+
+run:
+    Mesoscopic twin run: the pothole network and the original one, same
+    routes and seed, side by side as plain SUMO processes (no TraCI) until
+    every vehicle has arrived, then the per-class comparison and
+    attributable delay of twin_run.py. SUMO measures timeLoss against the
+    reduced edge speeds, so the pothole delay is the attributable column.
+
+Usage:
+    python3 meso_potholes.py build --config mymap.sumocfg --obstacles mymap.obstacles.xml
+    python3 meso_potholes.py run --config mymap.sumocfg
+    python3 meso_potholes.py build --delay-scale 0.55   # after calibrating against twin_run.py
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+import xml.etree.ElementTree as ET
+
+# Add SUMO tools to path
+if 'SUMO_HOME' in os.environ:
+    tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
+    sys.path.append(tools)
+
+from native_potholes import load_pothole_positions
+from pothole_rerouting import edge_penalties
+from sim_clock import add_step_length_arguments
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+MESO_HEADWAYS = {'tauff': 1.13, 'taufj': 1.13, 'taujf': 1.73, 'taujj': 1.4}   # SUMO defaults (s)
+DELAY_SCALE = 1.0              # Calibration: micro twin delay / meso twin delay on a district of the city
+CAPACITY_STEP = 0.05           # Capacity factors rounded to 5%: one meso type per step
+MIN_CAPACITY_FACTOR = 0.2      # Even a pothole-riddled edge keeps 20% of its capacity
+TYPE_PREFIX = "pothole_capacity_"
+MESO_OPTIONS = ["--mesosim", "true", "--lateral-resolution", "-1"]   # Meso has no sublane model
+UNTIL_ARRIVED = ["--end", "-1"]   # Past <end> until every vehicle arrived, like the TraCI twins
+TWIN_DIR = "twin_meso"
+SUMO_BINARY = "sumo"           # Headless: meso runs are batch runs
+WORST_EDGES_SHOWN = 10
+
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+def edge_reductions(potholes, net, delay_scale=DELAY_SCALE):
+    """{edge_id: (delay s, reduced speed m/s, capacity factor)} for every edge with potholes"""
+    potholes_by_lane = {}
+    for pothole_id, ptype, x, y, lane_id, lane_pos, radius, speed_mult in potholes:
+        potholes_by_lane.setdefault(lane_id, []).append((lane_pos, speed_mult))
+    lanes_per_edge = {net.getLane(lane_id).getEdge().getID(): net.getLane(lane_id).getEdge().getLaneNumber()
+                      for lane_id in potholes_by_lane}
+
+    reductions = {}
+    for edge_id, (count, severity, delay) in edge_penalties(potholes_by_lane, lanes_per_edge).items():
+        edge = net.getEdge(edge_id)
+        delay *= delay_scale
+        free_time = edge.getLength() / edge.getSpeed()
+        factor = free_time / (free_time + delay)
+        reductions[edge_id] = (delay, edge.getSpeed() * factor, max(factor, MIN_CAPACITY_FACTOR))
+    return reductions
+
+
+def capacity_type(factor):
+    """Meso type ID of a capacity factor, rounded to CAPACITY_STEP"""
+    steps = max(1, int(round(factor / CAPACITY_STEP)))
+    return f"{TYPE_PREFIX}{int(round(steps * CAPACITY_STEP * 100))}"
+
+
+def type_factor(type_id):
+    return int(type_id[len(TYPE_PREFIX):]) / 100
+
+
+def write_patch_files(reductions, edges_file, types_file, meso_types_file):
+    """netconvert edge + type patches, and the meso headways of every capacity type"""
+    types = sorted({capacity_type(factor) for delay, speed, factor in reductions.values()}, key=type_factor)
+    with open(edges_file, "w") as f:
+        f.write('<edges>\n')
+        for edge_id, (delay, speed, factor) in sorted(reductions.items()):
+            f.write(f'    <edge id="{edge_id}" speed="{speed:.2f}" type="{capacity_type(factor)}"/>\n')
+        f.write('</edges>\n')
+
+    with open(types_file, "w") as f:
+        f.write('<types>\n')
+        for type_id in types:
+            f.write(f'    <type id="{type_id}"/>\n')
+        f.write('</types>\n')
+
+    with open(meso_types_file, "w") as f:
+        f.write('<additional>\n')
+        for type_id in types:
+            headways = " ".join(f'{name}="{tau / type_factor(type_id):.2f}"' for name, tau in MESO_HEADWAYS.items())
+            f.write(f'    <type id="{type_id}">\n        <meso {headways}/>\n    </type>\n')
+        f.write('</additional>\n')
+    return types
+
+
+def build_meso_network(net_file, edges_file, types_file, meso_net_file):
+    """One netconvert pass: reduced speeds and capacity types on the pothole edges"""
+    result = subprocess.run(["netconvert", "-s", net_file, "-e", edges_file, "-t", types_file,
+                             "-o", meso_net_file, "--no-warnings"], capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"netconvert failed: {result.stderr}")
+    print(f"Meso pothole network written to {meso_net_file}")
+
+
+def write_meso_config(sumocfg_file, meso_cfg_file, meso_net_file, meso_types_file):
+    """Copy of the sumocfg on the meso network, with the meso types loaded, mesosim on and sublanes off"""
+    base = os.path.dirname(os.path.abspath(meso_cfg_file))
+    tree = ET.parse(sumocfg_file)
+    root = tree.getroot()
+    additional = None
+    for element in root.iter():
+        if element.tag == 'net-file':
+            element.set('value', os.path.relpath(meso_net_file, base))
+        elif element.tag == 'additional-files':
+            additional = element
+        elif element.tag == 'lateral-resolution':
+            element.set('value', "-1")
+    if additional is None:
+        inputs = root.find('input')
+        if inputs is None:
+            inputs = ET.SubElement(root, 'input')
+        additional = ET.SubElement(inputs, 'additional-files', value="")
+    files = [f for f in additional.get('value', '').split(',') if f]
+    additional.set('value', ",".join(files + [os.path.relpath(meso_types_file, base)]))
+
+    meso = root.find('mesoscopic')
+    if meso is None:
+        meso = ET.SubElement(root, 'mesoscopic')
+    ET.SubElement(meso, 'mesosim', value="true")
+    tree.write(meso_cfg_file)
+    print(f"Meso config written to {meso_cfg_file}")
+
+
+def build(args):
+    import sumolib
+
+    base = os.path.dirname(os.path.abspath(args.config))
+    values = {e.tag: e.get('value') for e in ET.parse(args.config).getroot().iter() if e.get('value')}
+    net_file = os.path.join(base, values['net-file'])
+    prefix = args.config[:-len('.sumocfg')] if args.config.endswith('.sumocfg') else args.config
+
+    net = sumolib.net.readNet(net_file)
+    reductions = edge_reductions(load_pothole_positions(args.obstacles, net), net, args.delay_scale)
+    if not reductions:
+        sys.exit("No potholes near any lane: nothing to reduce")
+
+    edges_file = f"{prefix}.meso.edg.xml"
+    types_file = f"{prefix}.meso.typ.xml"
+    meso_types_file = f"{prefix}.meso.add.xml"
+    meso_net_file = f"{prefix}.meso.net.xml"
+    types = write_patch_files(reductions, edges_file, types_file, meso_types_file)
+    print(f"{len(reductions)} pothole edges reduced, {len(types)} capacity types")
+    for edge_id, (delay, speed, factor) in sorted(reductions.items(), key=lambda item: -item[1][0])[:WORST_EDGES_SHOWN]:
+        print(f"  {edge_id}: +{delay:.1f}s, speed {net.getEdge(edge_id).getSpeed():.1f} -> {speed:.1f} m/s, "
+              f"capacity {factor:.0%}")
+
+    build_meso_network(net_file, edges_file, types_file, meso_net_file)
+    write_meso_config(args.config, f"{prefix}.meso.sumocfg", meso_net_file, meso_types_file)
+
+
+# ============================================================================
+# RUN (meso twin)
+# ============================================================================
+
+def run(args):
+    import twin_run
+
+    prefix = args.config[:-len('.sumocfg')] if args.config.endswith('.sumocfg') else args.config
+    meso_cfg_file = f"{prefix}.meso.sumocfg"
+    if not os.path.exists(meso_cfg_file):
+        sys.exit(f"{meso_cfg_file} not found: run 'python3 meso_potholes.py build' first")
+
+    os.makedirs(args.dir, exist_ok=True)
+    commands = {
+        'potholes': twin_run.sumo_command(args.sumo, meso_cfg_file, args.seed, args.dir, 'potholes',
+                                          args.step_length) + MESO_OPTIONS + UNTIL_ARRIVED,
+        'baseline': twin_run.sumo_command(args.sumo, args.config, args.seed, args.dir, 'baseline',
+                                          args.step_length) + MESO_OPTIONS + UNTIL_ARRIVED,
+    }
+    print(f"Meso twin run (seed {args.seed}): pothole network and baseline in two SUMO processes")
+    started = time.time()
+    processes = {run: subprocess.Popen(command) for run, command in commands.items()}
+    try:
+        failed = [run for run, process in processes.items() if process.wait() != 0]
+    except KeyboardInterrupt:
+        print("\nMeso twin run interrupted by user")
+        for process in processes.values():
+            process.terminate()
+        raise
+    if failed:
+        sys.exit(f"SUMO failed for the {' and '.join(failed)} run")
+    print(f"Meso twin run finished in {time.time() - started:.1f}s")
+    twin_run.report(args.dir)
+
+
+def main():
+    from scenario_seed import scenario_seed
+
+    parser = argparse.ArgumentParser(description="Mesoscopic pothole impact (per-edge speed and capacity)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('build', help='Reduce pothole edges and write a meso config')
+    p.add_argument('--config', default='mymap.sumocfg', help='Source SUMO config')
+    p.add_argument('--obstacles', default='mymap.obstacles.xml', help='Pothole polygons')
+    p.add_argument('--delay-scale', type=float, default=DELAY_SCALE,
+                   help='Scale the expected pothole delay per edge (calibrated against twin_run.py)')
+
+    p = sub.add_parser('run', help='Meso twin run (potholes vs baseline) and per-class delay report')
+    p.add_argument('--config', default='mymap.sumocfg', help='Source SUMO config (the baseline)')
+    p.add_argument('--seed', type=int, default=scenario_seed(), help='Random seed used by both runs')
+    p.add_argument('--dir', default=TWIN_DIR, help='Output directory of the meso twin run')
+    p.add_argument('--sumo', default=SUMO_BINARY, help='sumo or sumo-gui (both runs)')
+    add_step_length_arguments(p)
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        build(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,774 @@
+#!/usr/bin/env python3
+"""
+In-Process Mock TraCI
+=====================
+A fake `traci` module implementing the subset of traci.vehicle, traci.lane,
+traci.edge, traci.polygon, traci.poi and traci.simulation that the pothole
+controllers use (including lane variable and polygon/POI context
+subscriptions), with
+simple kinematic vehicles driving their routes on the lane graph of a
+.net.xml file. No SUMO process, no sockets - so controller CPU cost can be
+profiled, benchmarked and tested in isolation at high vehicle counts.
+
+Vehicles:
+- accelerate/decelerate towards min(lane speed, max speed, setSpeed target)
+- follow their route edge by edge, keeping their lane index when possible
+- ignore each other (no car following, no lane changing)
+
+Usage (before the controllers are imported):
+    import mock_traci
+    mock_traci.install()            # `import traci` now returns this module
+    import pothole_swerve_controller
+    traci.start(["sumo", "-n", "grid.net.xml", "-r", "grid.rou.xml"])
+"""
+
+import os
+import sys
+import math
+import types
+import random
+from collections import deque
+import xml.etree.ElementTree as ET
+
+DEFAULT_STEP_LENGTH = 0.1
+DEFAULT_ACCEL = 2.6
+DEFAULT_DECEL = 4.5
+DEFAULT_MAX_SPEED = 13.89
+DEFAULT_LENGTH = 5.0
+DEFAULT_WIDTH = 1.8
+DEFAULT_SEED = 42
+
+
+# ============================================================================
+# EXCEPTIONS (mirrors traci.exceptions)
+# ============================================================================
+
+class TraCIException(Exception):
+    """Raised for invalid commands, e.g. an unknown vehicle ID"""
+
+
+class FatalTraCIError(Exception):
+    """Raised when no simulation is running"""
+
+
+class _Exceptions:
+    TraCIException = TraCIException
+    FatalTraCIError = FatalTraCIError
+
+
+exceptions = _Exceptions()
+
+
+# ============================================================================
+# CONSTANTS (the subset of traci.constants used by the controllers)
+# ============================================================================
+
+constants = types.ModuleType('traci.constants')
+constants.CMD_GET_VEHICLE_VARIABLE = 0xa4
+constants.CMD_SET_VEHICLE_VARIABLE = 0xc4
+constants.CMD_SLOWDOWN = 0x14
+constants.LAST_STEP_VEHICLE_ID_LIST = 0x12
+constants.VAR_SPEED = 0x40
+constants.VAR_MAXSPEED = 0x41
+constants.VAR_POSITION = 0x42
+constants.VAR_ANGLE = 0x43
+constants.VAR_ROAD_ID = 0x50
+constants.VAR_LANE_ID = 0x51
+constants.VAR_LANE_INDEX = 0x52
+constants.VAR_LANEPOSITION = 0x56
+constants.VAR_LANEPOSITION_LAT = 0xb8
+constants.VAR_PARAMETER = 0x7e
+
+
+# ============================================================================
+# NETWORK
+# ============================================================================
+
+class MockLane:
+    __slots__ = ('id', 'edge_id', 'index', 'shape', 'length', 'width', 'speed', 'cumulative')
+
+    def __init__(self, lane_id, edge_id, index, shape, length, width, speed):
+        self.id = lane_id
+        self.edge_id = edge_id
+        self.index = index
+        self.shape = shape
+        self.width = width
+        self.speed = speed
+        # Cumulative distance at each shape point, for position lookups
+        self.cumulative = [0.0]
+        for (x1, y1), (x2, y2) in zip(shape, shape[1:]):
+            self.cumulative.append(self.cumulative[-1] + math.hypot(x2 - x1, y2 - y1))
+        self.length = length if length > 0 else self.cumulative[-1]
+
+    def geometry_at(self, pos, lateral=0.0):
+        """(x, y, sumo_angle) at a lane position, shifted `lateral` metres to the left"""
+        shape = self.shape
+        if len(shape) < 2:
+            x, y = shape[0]
+            return x, y, 0.0
+        # Map lane length onto drawn shape length (they differ slightly in SUMO nets)
+        geo_pos = pos * self.cumulative[-1] / self.length if self.length > 0 else 0.0
+        i = 1
+        while i < len(shape) - 1 and self.cumulative[i] < geo_pos:
+            i += 1
+        (x1, y1), (x2, y2) = shape[i - 1], shape[i]
+        seg = self.cumulative[i] - self.cumulative[i - 1]
+        t = (geo_pos - self.cumulative[i - 1]) / seg if seg > 0 else 0.0
+        t = min(max(t, 0.0), 1.0)
+        dx, dy = (x2 - x1) / seg if seg > 0 else 0.0, (y2 - y1) / seg if seg > 0 else 0.0
+        x = x1 + (x2 - x1) * t - dy * lateral
+        y = y1 + (y2 - y1) * t + dx * lateral
+        angle = math.degrees(math.atan2(dx, dy)) % 360
+        return x, y, angle
+
+    def project(self, x, y):
+        """(lane position, distance) of the closest point on the lane to (x, y)"""
+        shape = self.shape
+        if len(shape) < 2:
+            return 0.0, math.hypot(x - shape[0][0], y - shape[0][1])
+        best_pos, best_dist = 0.0, float('inf')
+        for i, ((x1, y1), (x2, y2)) in enumerate(zip(shape, shape[1:])):
+            seg = self.cumulative[i + 1] - self.cumulative[i]
+            t = ((x - x1) * (x2 - x1) + (y - y1) * (y2 - y1)) / (seg * seg) if seg > 0 else 0.0
+            t = min(max(t, 0.0), 1.0)
+            dist = math.hypot(x - (x1 + (x2 - x1) * t), y - (y1 + (y2 - y1) * t))
+            if dist < best_dist:
+                best_pos, best_dist = self.cumulative[i] + seg * t, dist
+        # Back from drawn shape length to lane length
+        scale = self.length / self.cumulative[-1] if self.cumulative[-1] > 0 else 1.0
+        return best_pos * scale, best_dist
+
+
+class MockNetwork:
+    """Edges and lanes of a .net.xml file (internal edges included)"""
+
+    def __init__(self, net_file):
+        self.lanes = {}
+        self.edges = {}   # edge_id -> [MockLane by index]
+        root = ET.parse(net_file).getroot()
+        for edge in root.findall('edge'):
+            edge_id = edge.get('id')
+            lanes = []
+            for lane in edge.findall('lane'):
+                shape = [tuple(map(float, p.split(','))) for p in lane.get('shape', '0,0').split()]
+                mock_lane = MockLane(lane.get('id'), edge_id, int(lane.get('index', len(lanes))), shape,
+                                     float(lane.get('length', '0')), float(lane.get('width', '3.2')),
+                                     float(lane.get('speed', DEFAULT_MAX_SPEED)))
+                self.lanes[mock_lane.id] = mock_lane
+                lanes.append(mock_lane)
+            lanes.sort(key=lambda l: l.index)
+            self.edges[edge_id] = lanes
+
+
+def _parse_polygons(additional_file):
+    """{poly_id: (type, shape)} of the <poly> elements in an additional file"""
+    polygons = {}
+    for poly in ET.parse(additional_file).getroot().iter('poly'):
+        shape = [tuple(map(float, p.split(','))) for p in poly.get('shape', '').split()]
+        if shape:
+            polygons[poly.get('id')] = (poly.get('type', ''), shape)
+    return polygons
+
+
+def _parse_sumocfg(cfg_file):
+    """net file, route files, additional files and step length from a .sumocfg"""
+    base = os.path.dirname(os.path.abspath(cfg_file))
+    root = ET.parse(cfg_file).getroot()
+    values = {}
+    for element in root.iter():
+        if element.get('value') is not None:
+            values[element.tag] = element.get('value')
+    net_file = os.path.join(base, values['net-file']) if 'net-file' in values else None
+    route_files = [os.path.join(base, r) for r in values.get('route-files', '').split(',') if r]
+    additional_files = [os.path.join(base, a) for a in values.get('additional-files', '').split(',') if a]
+    return net_file, route_files, additional_files, float(values.get('step-length', DEFAULT_STEP_LENGTH))
+
+
+# ============================================================================
+# VEHICLES
+# ============================================================================
+
+class MockVehicle:
+    __slots__ = ('id', 'type_id', 'route', 'route_index', 'lane', 'pos', 'lateral', 'speed',
+                 'max_speed', 'accel', 'decel', 'length', 'width', 'target_speed',
+                 'slow_target', 'slow_rate', 'slow_until', 'depart', 'depart_lane',
+                 'depart_pos', 'depart_speed')
+
+    def __init__(self, veh_id, type_id, route, depart, vtype, depart_lane, depart_pos, depart_speed):
+        self.id = veh_id
+        self.type_id = type_id
+        self.route = route
+        self.route_index = 0
+        self.lane = None
+        self.pos = 0.0
+        self.lateral = 0.0
+        self.speed = 0.0
+        self.max_speed = vtype.get('maxSpeed', DEFAULT_MAX_SPEED)
+        self.accel = vtype.get('accel', DEFAULT_ACCEL)
+        self.decel = vtype.get('decel', DEFAULT_DECEL)
+        self.length = vtype.get('length', DEFAULT_LENGTH)
+        self.width = vtype.get('width', DEFAULT_WIDTH)
+        self.target_speed = -1.0     # setSpeed override (-1 = none)
+        self.slow_target = None      # slowDown target speed
+        self.slow_rate = 0.0
+        self.slow_until = 0.0
+        self.depart = depart
+        self.depart_lane = depart_lane
+        self.depart_pos = depart_pos
+        self.depart_speed = depart_speed
+
+
+class MockSimulation:
+    """State of one fake simulation run"""
+
+    def __init__(self, net_file, route_files, step_length=DEFAULT_STEP_LENGTH, seed=DEFAULT_SEED,
+                 end_time=None, additional_files=()):
+        self.net = MockNetwork(net_file)
+        self.polygons = {}
+        for additional_file in additional_files:
+            if os.path.exists(additional_file):
+                self.polygons.update(_parse_polygons(additional_file))
+        self.pois = {}                    # poi_id -> (type, x, y)
+        self.lane_subscriptions = {}      # lane_id -> [var]
+        self.contexts = {}                # ('polygon' | 'poi', id) -> (range, [var])
+        self.step_length = step_length
+        self.time = 0.0
+        self.end_time = end_time
+        self.rng = random.Random(seed)
+        self.vtypes = {}
+        self.pending = []        # Not yet departed, sorted by depart time
+        self.active = {}         # veh_id -> MockVehicle (insertion order)
+        self.arrived = 0
+        self.departed_ids = []   # Vehicles inserted / removed during the last step
+        self.arrived_ids = []
+        for route_file in route_files:
+            self._load_routes(route_file)
+        self.pending = deque(sorted(self.pending, key=lambda v: v.depart))
+
+    # ------------------------------------------------------------------
+    # Demand
+    # ------------------------------------------------------------------
+
+    def _load_routes(self, route_file):
+        root = ET.parse(route_file).getroot()
+        routes = {}
+        for element in root.iter():
+            if element.tag == 'vType':
+                vtype = {}
+                for key in ('maxSpeed', 'accel', 'decel', 'length', 'width'):
+                    if element.get(key) is not None:
+                        vtype[key] = float(element.get(key))
+                self.vtypes[element.get('id')] = vtype
+            elif element.tag == 'route' and element.get('id'):
+                routes[element.get('id')] = element.get('edges', '').split()
+
+        for element in root:
+            if element.tag not in ('vehicle', 'flow'):
+                continue
+            route_child = element.find('route')
+            if route_child is not None:
+                edges = route_child.get('edges', '').split()
+            else:
+                edges = routes.get(element.get('route'), [])
+            edges = [e for e in edges if e in self.net.edges]
+            if not edges:
+                continue  # trips without routes are not supported
+            type_id = element.get('type', 'DEFAULT_VEHTYPE')
+            vtype = self.vtypes.get(type_id, {})
+            attrs = (element.get('departLane', 'first'), element.get('departPos', 'base'),
+                     element.get('departSpeed', '0'))
+
+            if element.tag == 'vehicle':
+                self.pending.append(MockVehicle(element.get('id'), type_id, edges,
+                                                float(element.get('depart', '0')), vtype, *attrs))
+            else:
+                begin = float(element.get('begin', '0'))
+                end = float(element.get('end', '3600'))
+                if element.get('period'):
+                    period = float(element.get('period'))
+                elif element.get('vehsPerHour'):
+                    period = 3600.0 / float(element.get('vehsPerHour'))
+                else:
+                    period = (end - begin) / max(int(element.get('number', '1')), 1)
+                number = int(element.get('number', '0')) or int((end - begin) / period)
+                for n in range(number):
+                    self.pending.append(MockVehicle(f"{element.get('id')}.{n}", type_id, edges,
+                                                    begin + n * period, vtype, *attrs))
+
+    def _insert(self, veh):
+        lanes = self.net.edges[veh.route[0]]
+        if veh.depart_lane == 'random':
+            lane = self.rng.choice(lanes)
+        elif veh.depart_lane.isdigit():
+            lane = lanes[min(int(veh.depart_lane), len(lanes) - 1)]
+        else:
+            lane = lanes[0]
+        veh.lane = lane
+        if veh.depart_pos == 'random':
+            veh.pos = self.rng.uniform(0.0, lane.length)
+        else:
+            try:
+                veh.pos = min(float(veh.depart_pos), lane.length)
+            except ValueError:
+                veh.pos = 0.0
+        limit = min(lane.speed, veh.max_speed)
+        if veh.depart_speed == 'max':
+            veh.speed = limit
+        else:
+            try:
+                veh.speed = min(float(veh.depart_speed), limit)
+            except ValueError:
+                veh.speed = 0.0
+        self.active[veh.id] = veh
+
+    # ------------------------------------------------------------------
+    # Stepping
+    # ------------------------------------------------------------------
+
+    def step(self):
+        dt = self.step_length
+
+        # Move vehicles
+        finished = []
+        for veh in self.active.values():
+            limit = min(veh.lane.speed, veh.max_speed)
+            if veh.target_speed >= 0:
+                desired = veh.target_speed
+            elif veh.slow_target is not None:
+                if self.time >= veh.slow_until:
+                    veh.slow_target = None
+                    desired = limit
+                else:
+                    desired = max(veh.slow_target, veh.speed - veh.slow_rate * dt)
+            else:
+                desired = limit
+            if desired > veh.speed:
+                veh.speed = min(desired, veh.speed + veh.accel * dt)
+            else:
+                veh.speed = max(desired, veh.speed - veh.decel * dt, 0.0)
+
+            veh.pos += veh.speed * dt
+            while veh.pos >= veh.lane.length:
+                veh.pos -= veh.lane.length
+                veh.route_index += 1
+                if veh.route_index >= len(veh.route):
+                    finished.append(veh.id)
+                    break
+                lanes = self.net.edges[veh.route[veh.route_index]]
+                veh.lane = lanes[min(veh.lane.index, len(lanes) - 1)]
+
+        for veh_id in finished:
+            del self.active[veh_id]
+            self.arrived += 1
+        self.arrived_ids = finished
+
+        # Insert departing vehicles
+        self.departed_ids = []
+        while self.pending and self.pending[0].depart <= self.time + 1e-9:
+            veh = self.pending.popleft()
+            self._insert(veh)
+            self.departed_ids.append(veh.id)
+        self.time += dt
+
+    def vehicle(self, veh_id):
+        try:
+            return self.active[veh_id]
+        except KeyError:
+            raise TraCIException(f"Vehicle '{veh_id}' is not known.")
+
+    def lane(self, lane_id):
+        try:
+            return self.net.lanes[lane_id]
+        except KeyError:
+            raise TraCIException(f"Lane '{lane_id}' is not known.")
+
+    def polygon(self, poly_id):
+        try:
+            return self.polygons[poly_id]
+        except KeyError:
+            raise TraCIException(f"Polygon '{poly_id}' is not known.")
+
+    # ------------------------------------------------------------------
+    # Subscriptions
+    # ------------------------------------------------------------------
+
+    def vehicle_variable(self, veh, var):
+        if var == constants.VAR_POSITION:
+            return veh.lane.geometry_at(veh.pos, veh.lateral)[:2]
+        if var == constants.VAR_SPEED:
+            return veh.speed
+        if var == constants.VAR_ANGLE:
+            return veh.lane.geometry_at(veh.pos)[2]
+        if var == constants.VAR_ROAD_ID:
+            return veh.lane.edge_id
+        if var == constants.VAR_LANE_ID:
+            return veh.lane.id
+        if var == constants.VAR_LANE_INDEX:
+            return veh.lane.index
+        if var == constants.VAR_LANEPOSITION:
+            return veh.pos
+        raise TraCIException(f"Vehicle variable 0x{var:02x} is not supported by mock_traci.")
+
+    def lane_subscription_results(self):
+        on_lane = {}
+        for veh in self.active.values():
+            on_lane.setdefault(veh.lane.id, []).append(veh.id)
+        results = {}
+        for lane_id, variables in self.lane_subscriptions.items():
+            values = {}
+            for var in variables:
+                if var == constants.LAST_STEP_VEHICLE_ID_LIST:
+                    values[var] = tuple(on_lane.get(lane_id, ()))
+                else:
+                    raise TraCIException(f"Lane variable 0x{var:02x} is not supported by mock_traci.")
+            results[lane_id] = values
+        return results
+
+    def context_anchor(self, kind, obj_id):
+        """(x, y, extent) of a polygon (bounding circle) or POI"""
+        if kind == 'poi':
+            ptype, x, y = self.pois[obj_id]
+            return x, y, 0.0
+        ptype, shape = self.polygons[obj_id]
+        cx = sum(x for x, y in shape) / len(shape)
+        cy = sum(y for x, y in shape) / len(shape)
+        return cx, cy, max(math.hypot(x - cx, y - cy) for x, y in shape)
+
+    def context_results(self, kind):
+        """Vehicles within range of each subscribed polygon/POI of one domain"""
+        contexts = {obj_id: sub for (k, obj_id), sub in self.contexts.items() if k == kind}
+        if not contexts:
+            return {}
+        cell = max(max(dist for dist, variables in contexts.values()), 10.0)
+        grid = {}
+        for veh in self.active.values():
+            x, y, angle = veh.lane.geometry_at(veh.pos, veh.lateral)
+            grid.setdefault((int(x // cell), int(y // cell)), []).append((x, y, veh))
+
+        results = {}
+        for obj_id, (dist, variables) in contexts.items():
+            cx, cy, extent = self.context_anchor(kind, obj_id)
+            reach = dist + extent
+            span = int(reach // cell) + 1
+            gx, gy = int(cx // cell), int(cy // cell)
+            found = {}
+            for i in range(gx - span, gx + span + 1):
+                for j in range(gy - span, gy + span + 1):
+                    for x, y, veh in grid.get((i, j), ()):
+                        if math.hypot(x - cx, y - cy) <= reach:
+                            found[veh.id] = {var: self.vehicle_variable(veh, var) for var in variables}
+            if found:
+                results[obj_id] = found
+        return results
+
+
+_sim = None
+
+
+def _current():
+    if _sim is None:
+        raise FatalTraCIError("Not connected.")
+    return _sim
+
+
+# ============================================================================
+# TRACI DOMAINS
+# ============================================================================
+
+class _VehicleDomain:
+    def getIDList(self):
+        return tuple(_current().active)
+
+    def getIDCount(self):
+        return len(_current().active)
+
+    def getSpeed(self, veh_id):
+        return _current().vehicle(veh_id).speed
+
+    def getMaxSpeed(self, veh_id):
+        return _current().vehicle(veh_id).max_speed
+
+    def setMaxSpeed(self, veh_id, speed):
+        _current().vehicle(veh_id).max_speed = speed
+
+    def setSpeed(self, veh_id, speed):
+        _current().vehicle(veh_id).target_speed = speed
+
+    def slowDown(self, veh_id, speed, duration):
+        sim = _current()
+        veh = sim.vehicle(veh_id)
+        veh.slow_target = speed
+        veh.slow_rate = max(veh.speed - speed, 0.0) / duration if duration > 0 else float('inf')
+        veh.slow_until = sim.time + duration
+
+    def getRoadID(self, veh_id):
+        return _current().vehicle(veh_id).lane.edge_id
+
+    def getLaneID(self, veh_id):
+        return _current().vehicle(veh_id).lane.id
+
+    def getLaneIndex(self, veh_id):
+        return _current().vehicle(veh_id).lane.index
+
+    def getLanePosition(self, veh_id):
+        return _current().vehicle(veh_id).pos
+
+    def getPosition(self, veh_id):
+        veh = _current().vehicle(veh_id)
+        x, y, angle = veh.lane.geometry_at(veh.pos, veh.lateral)
+        return x, y
+
+    def getAngle(self, veh_id):
+        veh = _current().vehicle(veh_id)
+        return veh.lane.geometry_at(veh.pos)[2]
+
+    def getLateralLanePosition(self, veh_id):
+        return _current().vehicle(veh_id).lateral
+
+    def setLateralLanePosition(self, veh_id, pos_lat):
+        _current().vehicle(veh_id).lateral = pos_lat
+
+    def getTypeID(self, veh_id):
+        return _current().vehicle(veh_id).type_id
+
+    def getWidth(self, veh_id):
+        return _current().vehicle(veh_id).width
+
+    def getLength(self, veh_id):
+        return _current().vehicle(veh_id).length
+
+    def getRoute(self, veh_id):
+        return tuple(_current().vehicle(veh_id).route)
+
+    def getRouteIndex(self, veh_id):
+        return _current().vehicle(veh_id).route_index
+
+
+class _LaneDomain:
+    def getIDList(self):
+        return tuple(_current().net.lanes)
+
+    def getShape(self, lane_id):
+        return tuple(_current().lane(lane_id).shape)
+
+    def getLength(self, lane_id):
+        return _current().lane(lane_id).length
+
+    def getWidth(self, lane_id):
+        return _current().lane(lane_id).width
+
+    def getMaxSpeed(self, lane_id):
+        return _current().lane(lane_id).speed
+
+    def getEdgeID(self, lane_id):
+        return _current().lane(lane_id).edge_id
+
+    def getLastStepVehicleIDs(self, lane_id):
+        sim = _current()
+        sim.lane(lane_id)
+        return tuple(veh.id for veh in sim.active.values() if veh.lane.id == lane_id)
+
+    def subscribe(self, lane_id, varIDs=(constants.LAST_STEP_VEHICLE_ID_LIST,), begin=None, end=None):
+        sim = _current()
+        sim.lane(lane_id)
+        sim.lane_subscriptions[lane_id] = list(varIDs)
+
+    def unsubscribe(self, lane_id):
+        _current().lane_subscriptions.pop(lane_id, None)
+
+    def getAllSubscriptionResults(self):
+        return _current().lane_subscription_results()
+
+
+class _PolygonDomain:
+    def getIDList(self):
+        return tuple(_current().polygons)
+
+    def getType(self, poly_id):
+        return _current().polygon(poly_id)[0]
+
+    def getShape(self, poly_id):
+        return tuple(_current().polygon(poly_id)[1])
+
+    def add(self, poly_id, shape, color, fill=False, polygonType="", layer=0, *args, **kwargs):
+        sim = _current()
+        if poly_id in sim.polygons:
+            raise TraCIException(f"Could not add polygon '{poly_id}'")
+        sim.polygons[poly_id] = (polygonType, [tuple(p) for p in shape])
+
+    def remove(self, poly_id, layer=0):
+        sim = _current()
+        if sim.polygons.pop(poly_id, None) is None:
+            raise TraCIException(f"Could not remove polygon '{poly_id}'")
+        sim.contexts.pop(('polygon', poly_id), None)
+
+    def subscribeContext(self, poly_id, domain, dist, varIDs=(), begin=None, end=None):
+        sim = _current()
+        sim.polygon(poly_id)
+        if domain != constants.CMD_GET_VEHICLE_VARIABLE:
+            raise TraCIException("mock_traci only supports vehicle context subscriptions")
+        sim.contexts[('polygon', poly_id)] = (dist, list(varIDs))
+
+    def unsubscribeContext(self, poly_id, domain, dist):
+        _current().contexts.pop(('polygon', poly_id), None)
+
+    def getAllContextSubscriptionResults(self):
+        return _current().context_results('polygon')
+
+
+class _PoiDomain:
+    def getIDList(self):
+        return tuple(_current().pois)
+
+    def getPosition(self, poi_id):
+        sim = _current()
+        if poi_id not in sim.pois:
+            raise TraCIException(f"POI '{poi_id}' is not known.")
+        return sim.pois[poi_id][1:]
+
+    def add(self, poi_id, x, y, color=None, poiType="", layer=0, *args, **kwargs):
+        sim = _current()
+        if poi_id in sim.pois:
+            raise TraCIException(f"Could not add PoI '{poi_id}'")
+        sim.pois[poi_id] = (poiType, x, y)
+
+    def remove(self, poi_id, layer=0):
+        sim = _current()
+        if sim.pois.pop(poi_id, None) is None:
+            raise TraCIException(f"Could not remove PoI '{poi_id}'")
+        sim.contexts.pop(('poi', poi_id), None)
+
+    def subscribeContext(self, poi_id, domain, dist, varIDs=(), begin=None, end=None):
+        sim = _current()
+        if poi_id not in sim.pois:
+            raise TraCIException(f"POI '{poi_id}' is not known.")
+        if domain != constants.CMD_GET_VEHICLE_VARIABLE:
+            raise TraCIException("mock_traci only supports vehicle context subscriptions")
+        sim.contexts[('poi', poi_id)] = (dist, list(varIDs))
+
+    def unsubscribeContext(self, poi_id, domain, dist):
+        _current().contexts.pop(('poi', poi_id), None)
+
+    def getAllContextSubscriptionResults(self):
+        return _current().context_results('poi')
+
+
+class _EdgeDomain:
+    def getIDList(self):
+        return tuple(_current().net.edges)
+
+    def getLaneNumber(self, edge_id):
+        try:
+            return len(_current().net.edges[edge_id])
+        except KeyError:
+            raise TraCIException(f"Edge '{edge_id}' is not known.")
+
+
+class _SimulationDomain:
+    def getMinExpectedNumber(self):
+        sim = _current()
+        if sim.end_time is not None and sim.time >= sim.end_time - 1e-9:
+            return 0
+        return len(sim.active) + len(sim.pending)
+
+    def getTime(self):
+        return _current().time
+
+    def getDeltaT(self):
+        return _current().step_length
+
+    def getArrivedNumber(self):
+        return _current().arrived
+
+    def getDepartedIDList(self):
+        return tuple(_current().departed_ids)
+
+    def getArrivedIDList(self):
+        return tuple(_current().arrived_ids)
+
+    def getEndingTeleportIDList(self):
+        return ()   # Mock vehicles never teleport
+
+    def convertRoad(self, x, y, isGeo=False, vClass="ignoring"):
+        """(edge_id, lane position, lane index) of the closest normal lane to (x, y)"""
+        best = None
+        for mock_lane in _current().net.lanes.values():
+            if mock_lane.edge_id.startswith(':'):
+                continue
+            pos, dist = mock_lane.project(x, y)
+            if best is None or dist < best[0]:
+                best = (dist, mock_lane, pos)
+        if best is None:
+            raise TraCIException(f"Position {x},{y} is not near any lane")
+        _, mock_lane, pos = best
+        return mock_lane.edge_id, pos, mock_lane.index
+
+
+vehicle = _VehicleDomain()
+lane = _LaneDomain()
+edge = _EdgeDomain()
+polygon = _PolygonDomain()
+poi = _PoiDomain()
+simulation = _SimulationDomain()
+
+
+# ============================================================================
+# CONNECTION API
+# ============================================================================
+
+def start(cmd, **kwargs):
+    """
+    Start a mock simulation from a SUMO command line. Understands
+    -c/--configuration-file, -n/--net-file, -r/--route-files,
+    -a/--additional-files, --step-length, --seed and -e/--end.
+    """
+    global _sim
+    net_file, route_files, additional_files, step_length = None, [], [], DEFAULT_STEP_LENGTH
+    seed, end_time = DEFAULT_SEED, None
+    args = list(cmd[1:])
+    i = 0
+    while i < len(args):
+        opt = args[i]
+        value = args[i + 1] if i + 1 < len(args) else None
+        if opt in ('-c', '--configuration-file'):
+            net_file, route_files, additional_files, step_length = _parse_sumocfg(value)
+        elif opt in ('-n', '--net-file'):
+            net_file = value
+        elif opt in ('-r', '--route-files'):
+            route_files = value.split(',')
+        elif opt in ('-a', '--additional-files'):
+            additional_files = value.split(',')
+        elif opt == '--step-length':
+            step_length = float(value)
+        elif opt == '--seed':
+            seed = int(value)
+        elif opt in ('-e', '--end'):
+            end_time = float(value)
+        elif not opt.startswith('-') or value is None or value.startswith('-'):
+            i += 1
+            continue
+        i += 2
+    if net_file is None:
+        raise FatalTraCIError("mock_traci.start needs a net file (-n or -c)")
+    _sim = MockSimulation(net_file, route_files, step_length, seed, end_time, additional_files)
+    return (21, "mock_traci")
+
+
+def simulationStep(step=0.0):
+    _current().step()
+
+
+def close(wait=True):
+    global _sim
+    _sim = None
+
+
+def isLoaded():
+    return _sim is not None
+
+
+def install():
+    """Make `import traci` return this module (call before importing controllers)"""
+    sys.modules['traci'] = sys.modules[__name__]
+    sys.modules['traci.constants'] = constants
+    return sys.modules[__name__]
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Native SUMO Pothole Effects
+===========================
+Alternative to the TraCI speed controllers: every pothole becomes a short
+micro-edge, as long as the pothole is wide, whose speed limit on the
+pothole's lane is the lane speed times the pothole's speed_mult (at least
+MIN_HIT_SPEED, like hit_speed() in the controllers), so SUMO applies
+the slowdown itself at full simulation speed. Python only collects
+statistics (who drove over which pothole, and for how long).
+
+build:
+1. Map each pothole polygon to its nearest lane and lane position
+2. Split the edge around it (netconvert <split>): E -> E, E~pothole_N, E~1, ...
+3. Restrict the low speed to the pothole's lane (second netconvert pass)
+4. Expand existing routes onto the split edges so vehicles drive the same paths
+5. Write mymap.native.sumocfg pointing at the native network and routes
+
+run:
+    Starts SUMO on the native config, subscribes to the pothole lanes and
+    logs a hit whenever a vehicle drives onto one (same log format as
+    pothole_controller.py, so pothole_analytics.py can ingest it).
+
+Note: SUMO drivers brake for the micro-edge like for any speed limit, i.e.
+within braking distance of the pothole - not for the whole lane like the
+old variable speed signs, but also not an instant drop at the pothole.
+
+Usage:
+    python3 native_potholes.py build --config mymap.sumocfg --obstacles mymap.obstacles.xml
+    python3 native_potholes.py run --config mymap.native.sumocfg
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+import xml.etree.ElementTree as ET
+from pothole_model import pothole_attributes, hit_speed, MIN_HIT_SPEED, POTHOLE_PREFIX
+
+# Add SUMO tools to path
+if 'SUMO_HOME' in os.environ:
+    tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
+    sys.path.append(tools)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+MIN_SEGMENT_LENGTH = 1.0       # Shortest pothole segment (m); otherwise the pothole's diameter
+MIN_PIECE_LENGTH = 1.0         # Keep at least 1m of edge before/after every segment
+SNAP_DISTANCE = 50.0           # Ignore potholes further than 50m from any lane
+SEGMENT_MARKER = '~pothole_'   # Micro-edge IDs: <edge>~pothole_<N>
+POTHOLE_PARAM = 'pothole'      # Lane parameter naming the pothole on a segment's slow lane
+
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+def load_pothole_positions(obstacles_file, net):
+    """[(pothole_id, type, x, y, lane_id, lane_pos, radius, speed_mult)] for every pothole polygon near a lane"""
+    root = ET.parse(obstacles_file).getroot()
+    potholes = []
+    skipped = 0
+    for poly in root.findall('poly'):
+        poly_id = poly.get('id', '')
+        shape = poly.get('shape', '')
+        if not poly_id.startswith(POTHOLE_PREFIX) or not shape:
+            continue
+        points = [tuple(map(float, p.split(','))) for p in shape.split()]
+        radius, speed_mult = pothole_attributes(poly, points)
+        x = sum(p[0] for p in points) / len(points)
+        y = sum(p[1] for p in points) / len(points)
+
+        best = None
+        for lane, dist in net.getNeighboringLanes(x, y, SNAP_DISTANCE):
+            if lane.getEdge().getFunction() == 'internal':
+                continue
+            if best is None or dist < best[1]:
+                best = (lane, dist)
+        if best is None:
+            skipped += 1
+            continue
+        lane = best[0]
+        lane_pos, _ = lane.getClosestLanePosAndDist((x, y))
+        potholes.append((poly_id, poly.get('type', ''), x, y, lane.getID(), lane_pos, radius, speed_mult))
+
+    print(f"Mapped {len(potholes)} potholes to lanes ({skipped} further than {SNAP_DISTANCE:.0f}m from any lane)")
+    return potholes
+
+
+def plan_segments(potholes, net):
+    """
+    {edge_id: [(start, end, pothole_id, lane_index, speed)]} - non-overlapping
+    segments sorted by position, each the pothole's diameter long with the
+    lane speed cut by the pothole's severity. Potholes that would overlap
+    an earlier segment on the same edge share it (at the lower speed).
+    """
+    by_edge = {}
+    for pothole_id, ptype, x, y, lane_id, lane_pos, radius, speed_mult in potholes:
+        lane = net.getLane(lane_id)
+        by_edge.setdefault(lane.getEdge().getID(), []).append(
+            (lane_pos, pothole_id, lane.getIndex(), max(2 * radius, MIN_SEGMENT_LENGTH),
+             hit_speed(lane.getSpeed(), speed_mult)))
+
+    segments = {}
+    merged = 0
+    for edge_id, entries in by_edge.items():
+        length = net.getEdge(edge_id).getLength()
+        planned = []
+        for lane_pos, pothole_id, lane_index, segment_length, speed in sorted(entries):
+            start = lane_pos - segment_length / 2
+            start = min(max(start, MIN_PIECE_LENGTH), length - MIN_PIECE_LENGTH - segment_length)
+            if start < MIN_PIECE_LENGTH:
+                continue  # Edge too short to split
+            if planned and start < planned[-1][1] + MIN_PIECE_LENGTH:
+                merged += 1
+                if speed < planned[-1][4]:
+                    planned[-1] = planned[-1][:4] + (speed,)
+                continue
+            planned.append((start, start + segment_length, pothole_id, lane_index, speed))
+        if planned:
+            segments[edge_id] = planned
+    if merged:
+        print(f"{merged} potholes share a segment with a nearby pothole")
+    return segments
+
+
+def segment_edge_id(edge_id, pothole_id):
+    return f"{edge_id}{SEGMENT_MARKER}{pothole_id.split('_')[-1]}"
+
+
+def edge_pieces(edge_id, planned):
+    """Edge IDs of an edge after splitting, in driving order"""
+    pieces = [edge_id]
+    for i, (start, end, pothole_id, lane_index, speed) in enumerate(planned):
+        pieces.append(segment_edge_id(edge_id, pothole_id))
+        pieces.append(f"{edge_id}~{i + 1}")
+    return pieces
+
+
+def write_split_files(segments, net, split_file, lanes_file):
+    """netconvert edge patches: splits around potholes, then per-lane speeds on the segments"""
+    with open(split_file, "w") as f:
+        f.write('<edges>\n')
+        for edge_id, planned in segments.items():
+            speed = net.getEdge(edge_id).getSpeed()
+            pieces = edge_pieces(edge_id, planned)
+            f.write(f'    <edge id="{edge_id}">\n')
+            for i, (start, end, pothole_id, lane_index, pothole_speed) in enumerate(planned):
+                before, segment, after = pieces[2 * i], pieces[2 * i + 1], pieces[2 * i + 2]
+                f.write(f'        <split pos="{start:.2f}" speed="{pothole_speed:.2f}" '
+                        f'idBefore="{before}" idAfter="{segment}"/>\n')
+                f.write(f'        <split pos="{end:.2f}" speed="{speed:.2f}" '
+                        f'idBefore="{segment}" idAfter="{after}"/>\n')
+            f.write('    </edge>\n')
+        f.write('</edges>\n')
+
+    # Only the pothole's own lane is slow - other lanes keep the edge speed.
+    # The pothole lane is tagged so run() finds it whatever its speed.
+    with open(lanes_file, "w") as f:
+        f.write('<edges>\n')
+        for edge_id, planned in segments.items():
+            edge = net.getEdge(edge_id)
+            for start, end, pothole_id, lane_index, pothole_speed in planned:
+                f.write(f'    <edge id="{segment_edge_id(edge_id, pothole_id)}">\n')
+                for lane in edge.getLanes():
+                    if lane.getIndex() != lane_index:
+                        f.write(f'        <lane index="{lane.getIndex()}" speed="{lane.getSpeed():.2f}"/>\n')
+                    else:
+                        f.write(f'        <lane index="{lane_index}">\n'
+                                f'            <param key="{POTHOLE_PARAM}" value="{pothole_id}"/>\n'
+                                f'        </lane>\n')
+                f.write('    </edge>\n')
+        f.write('</edges>\n')
+
+
+def build_native_network(net_file, split_file, lanes_file, native_net_file):
+    """Two netconvert passes: split edges, then per-lane segment speeds"""
+    split_net = native_net_file.replace('.net.xml', '.split.net.xml')
+    for src, patch, out in ((net_file, split_file, split_net), (split_net, lanes_file, native_net_file)):
+        result = subprocess.run(["netconvert", "-s", src, "-e", patch, "-o", out, "--no-warnings"],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            sys.exit(f"netconvert failed: {result.stderr}")
+    os.remove(split_net)
+    print(f"Native pothole network written to {native_net_file}")
+
+
+def expand_routes(rou_file, native_rou_file, segments):
+    """Rewrite routes onto the split edges (E -> E E~pothole_N E~1 ...)"""
+    pieces = {edge_id: edge_pieces(edge_id, planned) for edge_id, planned in segments.items()}
+
+    def expand(edges):
+        return " ".join(p for e in edges.split() for p in pieces.get(e, (e,)))
+
+    tree = ET.parse(rou_file)
+    for element in tree.getroot().iter():
+        if element.get('edges'):
+            element.set('edges', expand(element.get('edges')))
+        if element.get('via'):
+            element.set('via', expand(element.get('via')))
+        if element.get('to') in pieces:
+            element.set('to', pieces[element.get('to')][-1])  # Arrive at the end of the original edge
+    tree.write(native_rou_file, encoding='UTF-8', xml_declaration=True)
+    print(f"Routes expanded onto split edges: {native_rou_file}")
+
+
+def write_native_config(sumocfg_file, native_cfg_file, native_net_file, native_rou_files):
+    """Copy of the sumocfg using the native network and expanded routes"""
+    base = os.path.dirname(os.path.abspath(native_cfg_file))
+    tree = ET.parse(sumocfg_file)
+    root = tree.getroot()
+    for element in root.iter():
+        if element.tag == 'net-file':
+            element.set('value', os.path.relpath(native_net_file, base))
+        elif element.tag == 'route-files':
+            element.set('value', ",".join(os.path.relpath(r, base) for r in native_rou_files))
+    tree.write(native_cfg_file)
+    print(f"Native config written to {native_cfg_file}")
+
+
+def build(args):
+    import sumolib
+
+    base = os.path.dirname(os.path.abspath(args.config))
+    values = {e.tag: e.get('value') for e in ET.parse(args.config).getroot().iter() if e.get('value')}
+    net_file = os.path.join(base, values['net-file'])
+    rou_files = [os.path.join(base, r) for r in values.get('route-files', '').split(',') if r]
+    prefix = args.config[:-len('.sumocfg')] if args.config.endswith('.sumocfg') else args.config
+
+    net = sumolib.net.readNet(net_file)
+    potholes = load_pothole_positions(args.obstacles, net)
+    segments = plan_segments(potholes, net)
+    print(f"Splitting {len(segments)} edges into {sum(len(s) for s in segments.values())} pothole segments")
+
+    split_file = f"{prefix}.potholes.edg.xml"
+    lanes_file = f"{prefix}.potholes.lanes.edg.xml"
+    native_net_file = f"{prefix}.native.net.xml"
+    write_split_files(segments, net, split_file, lanes_file)
+    build_native_network(net_file, split_file, lanes_file, native_net_file)
+
+    native_rou_files = []
+    for rou_file in rou_files:
+        native_rou_file = rou_file.replace('.rou.xml', '.native.rou.xml')
+        expand_routes(rou_file, native_rou_file, segments)
+        native_rou_files.append(native_rou_file)
+
+    write_native_config(args.config, f"{prefix}.native.sumocfg", native_net_file, native_rou_files)
+
+
+# ============================================================================
+# RUN (statistics only)
+# ============================================================================
+
+def run(args):
+    import traci
+    import traci.constants as tc
+
+    traci.start([args.sumo, "-c", args.config])
+
+    # Pothole lanes: the tagged lane of every segment edge (untagged networks: the 0.5 m/s lanes)
+    pothole_lanes = [lane_id for lane_id in traci.lane.getIDList()
+                     if SEGMENT_MARKER in lane_id and (traci.lane.getParameter(lane_id, POTHOLE_PARAM) or
+                                                      traci.lane.getMaxSpeed(lane_id) <= MIN_HIT_SPEED)]
+    for lane_id in pothole_lanes:
+        traci.lane.subscribe(lane_id, [tc.LAST_STEP_VEHICLE_ID_LIST])
+    print(f"Collecting statistics on {len(pothole_lanes)} native pothole segments")
+
+    step_length = traci.simulation.getDeltaT()
+    on_pothole = {}      # veh_id -> (lane_id, entry step)
+    hits_by_type = {}
+    hold_steps = []
+    step = 0
+    try:
+        while traci.simulation.getMinExpectedNumber() > 0:
+            traci.simulationStep()
+            step += 1
+
+            current = {}
+            for lane_id, results in traci.lane.getAllSubscriptionResults().items():
+                for veh_id in results[tc.LAST_STEP_VEHICLE_ID_LIST]:
+                    current[veh_id] = lane_id
+
+            for veh_id, lane_id in current.items():
+                if on_pothole.get(veh_id, (None,))[0] != lane_id:
+                    on_pothole[veh_id] = (lane_id, step)
+                    vtype = traci.vehicle.getTypeID(veh_id)
+                    hits_by_type[vtype] = hits_by_type.get(vtype, 0) + 1
+                    x, y = traci.vehicle.getPosition(veh_id)
+                    print(f"Step {step}: Vehicle {veh_id} hit native pothole on {lane_id} at pos "
+                          f"{traci.vehicle.getLanePosition(veh_id):.1f} ({x:.1f}, {y:.1f})")
+
+            for veh_id in [v for v in on_pothole if v not in current]:
+                lane_id, entry = on_pothole.pop(veh_id)
+                hold_steps.append(step - entry)
+
+    except KeyboardInterrupt:
+        print("\nSimulation interrupted by user")
+    finally:
+        traci.close()
+
+    print("\n=== Native pothole statistics ===")
+    print(f"Steps: {step}")
+    for vtype, hits in sorted(hits_by_type.items()):
+        print(f"{vtype:<12} {hits:>6} hits")
+    if hold_steps:
+        print(f"Mean time on a pothole segment: {sum(hold_steps) / len(hold_steps) * step_length:.1f}s "
+              f"({len(hold_steps)} passes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Native SUMO pothole effects (no TraCI speed control)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('build', help='Split pothole edges and write a native config')
+    p.add_argument('--config', default='mymap.sumocfg', help='Source SUMO config')
+    p.add_argument('--obstacles', default='mymap.obstacles.xml', help='Pothole polygons')
+
+    p = sub.add_parser('run', help='Run the native config and collect hit statistics')
+    p.add_argument('--config', default='mymap.native.sumocfg')
+    p.add_argument('--sumo', default='sumo-gui', help='sumo or sumo-gui')
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        build(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Parallel Trip Routing
+=====================
+Routes a trips file with several duarouter processes instead of one:
+
+    1. split    mymap.trips.xml -> blocks of ROUTE_BLOCK trips/flows, each
+                with the vType definitions
+    2. route    one duarouter process per block, `workers` at a time
+    3. merge    the block route files (each sorted by its worker) in depart
+                order into mymap.rou.xml, holding one route per block in memory
+
+duarouter draws --randomize-flows departures and --weights.random-factor
+disturbances from ONE random stream in routing order, so cutting the trips
+differently would change every route after the cut. Blocks therefore have
+a fixed size and each block gets its own seed derived from the scenario
+seed: the merged routes depend on the seed and the block size only, and
+are byte-identical whether 1 or 32 workers route them.
+
+The duarouter processes are driven from a thread pool: the routing runs in
+the child processes, and the generator scripts (which have no __main__
+guard) are never re-imported by multiprocessing workers.
+
+Usage:
+    python3 parallel_routing.py --net mymap.net.xml --trips mymap.trips.xml -o mymap.rou.xml --workers 8
+    route_trips(net_file, trips_file, rou_file, DUAROUTER_OPTIONS, seed=42, workers=8)
+"""
+
+import os
+import sys
+import time
+import heapq
+import shutil
+import tempfile
+import subprocess
+from multiprocessing.pool import ThreadPool
+import xml.etree.ElementTree as ET
+
+from scenario_seed import scenario_seed, seeded_rng
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+ROUTE_BLOCK = 500               # Trips/flows per duarouter run (part of the result: keep it fixed)
+DEFINITIONS = ('vType', 'vTypeDistribution', 'route', 'routeDistribution')   # Written once, ahead of the demand
+ROUTES_HEADER = ('<routes xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                 'xsi:noNamespaceSchemaLocation="http://sumo.dlr.de/xsd/routes_file.xsd">\n')
+
+# What indian_road_simulator.py / streamlit_app.py route with
+DUAROUTER_OPTIONS = ["--ignore-errors", "--repair", "--remove-loops", "--routing-algorithm", "astar",
+                     "--weights.random-factor", "1.5", "--max-alternatives", "3", "--randomize-flows",
+                     "--no-warnings"]
+
+
+def depart_time(elem):
+    """Depart (vehicles, trips) or begin (flows) of a demand element; non-numeric departs sort first"""
+    try:
+        return float(elem.get('depart', elem.get('begin', '0')))
+    except ValueError:
+        return 0.0
+
+
+def to_xml(elem):
+    elem.tail = None
+    return "    " + ET.tostring(elem, encoding='unicode') + "\n"
+
+
+def top_level_elements(path):
+    """Yield every child of the root element, freeing it afterwards"""
+    context = ET.iterparse(path, events=('start', 'end'))
+    _, root = next(context)
+    depth = 0
+    for event, elem in context:
+        if event == 'start':
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 0:
+            yield elem
+            root.clear()
+
+
+# ============================================================================
+# SPLIT / ROUTE / MERGE
+# ============================================================================
+
+def split_trips(trips_file, directory, block_size=ROUTE_BLOCK):
+    """Write blocks of block_size demand elements; returns the block files"""
+    definitions = []
+    blocks = []
+    out = None
+    count = 0
+    for elem in top_level_elements(trips_file):
+        if elem.tag in DEFINITIONS:
+            definitions.append(to_xml(elem))
+            continue
+        if count % block_size == 0:
+            if out:
+                out.write('</routes>\n')
+                out.close()
+            blocks.append(os.path.join(directory, f"block{len(blocks):05d}.trips.xml"))
+            out = open(blocks[-1], 'w', encoding='utf-8')
+            out.write(ROUTES_HEADER)
+            out.writelines(definitions)
+        out.write(to_xml(elem))
+        count += 1
+    if out:
+        out.write('</routes>\n')
+        out.close()
+    return blocks
+
+
+def route_block(job):
+    """Pool thread: duarouter on one block"""
+    net_file, block_file, options, seed = job
+    rou_file = block_file.replace('.trips.xml', '.rou.xml')
+    result = subprocess.run(["duarouter", "-n", net_file, "-t", block_file, "-o", rou_file,
+                             "--seed", str(seed)] + list(options),
+                            capture_output=True, text=True)
+    if result.returncode == 0 and os.path.exists(rou_file):
+        sort_block(rou_file)
+    return rou_file, result.returncode, result.stderr
+
+
+def sort_block(rou_file):
+    """Put one block's routes in depart order (duarouter keeps the order of unsorted trips)"""
+    definitions = []
+    demand = []
+    for seq, elem in enumerate(top_level_elements(rou_file)):
+        if elem.tag in DEFINITIONS:
+            definitions.append(to_xml(elem))
+        else:
+            demand.append((depart_time(elem), seq, to_xml(elem)))
+    demand.sort()
+    with open(rou_file, 'w', encoding='utf-8') as f:
+        f.write(ROUTES_HEADER)
+        f.writelines(definitions)
+        f.writelines(xml for _, _, xml in demand)
+        f.write('</routes>\n')
+
+
+def merge_routes(rou_files, rou_file, header_comment=""):
+    """Merge per-block route files (each in depart order, see sort_block) into one, in depart order"""
+    definitions = {}
+    for path in rou_files:      # Pass 1: duarouter writes vTypes just before their first vehicle
+        for elem in top_level_elements(path):
+            if elem.tag in DEFINITIONS:
+                definitions.setdefault((elem.tag, elem.get('id')), to_xml(elem))
+
+    def demand(index, path):
+        for seq, elem in enumerate(top_level_elements(path)):
+            if elem.tag not in DEFINITIONS:
+                yield depart_time(elem), index, seq, to_xml(elem)
+
+    written = 0
+    with open(rou_file, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n\n')
+        if header_comment:
+            f.write(f"<!-- {header_comment} -->\n\n")
+        f.write(ROUTES_HEADER)
+        f.writelines(definitions.values())
+        # Ties keep block order, then file order: the same result for any worker count
+        for _, _, _, xml in heapq.merge(*(demand(i, path) for i, path in enumerate(rou_files))):
+            f.write(xml)
+            written += 1
+        f.write('</routes>\n')
+    return written
+
+
+def route_trips(net_file, trips_file, rou_file, options=DUAROUTER_OPTIONS, seed=None,
+                workers=None, block_size=ROUTE_BLOCK):
+    """Split, route on `workers` processes and merge; returns (routes written, list of duarouter errors)"""
+    seed = scenario_seed() if seed is None else seed
+    workers = workers or os.cpu_count()
+    directory = tempfile.mkdtemp(prefix='routing_', dir=os.path.dirname(os.path.abspath(rou_file)))
+    try:
+        started = time.time()
+        blocks = split_trips(trips_file, directory, block_size)
+        jobs = [(net_file, block, options, seeded_rng(seed, f'route-block-{i}').randrange(2 ** 31))
+                for i, block in enumerate(blocks)]
+        with ThreadPool(min(workers, max(1, len(jobs)))) as pool:
+            results = pool.map(route_block, jobs, chunksize=1)
+
+        errors = [stderr for _, returncode, stderr in results if returncode != 0]
+        routed = [path for path, returncode, _ in results if returncode == 0 and os.path.exists(path)]
+        written = merge_routes(routed, rou_file,
+                               f"routed by parallel_routing.py: {len(blocks)} blocks of {block_size}, seed {seed}")
+        print(f"Routed {len(blocks)} blocks on {min(workers, max(1, len(jobs)))} processes: "
+              f"{written} routes in {time.time() - started:.1f}s")
+        return written, errors
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Route a trips file with parallel duarouter processes")
+    parser.add_argument('--net', default='mymap.net.xml', help='SUMO network')
+    parser.add_argument('--trips', default='mymap.trips.xml', help='Trips / flows to route')
+    parser.add_argument('-o', '--output', default='mymap.rou.xml', help='Merged route file')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='duarouter processes')
+    parser.add_argument('--block-size', type=int, default=ROUTE_BLOCK, help='Trips per duarouter run')
+    parser.add_argument('--seed', type=int, default=None, help='Scenario seed (default $SCENARIO_SEED or 42)')
+    args = parser.parse_args()
+
+    written, errors = route_trips(args.net, args.trips, args.output, DUAROUTER_OPTIONS, args.seed,
+                                  args.workers, args.block_size)
+    for stderr in errors:
+        print(f"Warning: duarouter had issues: {stderr}")
+    sys.exit(1 if errors else 0)
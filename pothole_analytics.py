@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Pothole Event Analytics
+=======================
+Ingests controller console logs ONCE into an indexed SQLite store and answers
+questions about them in milliseconds, instead of re-grepping the raw log for
+every metric (what analyze_avoidance.sh used to do).
+
+Understands the output of all three controllers:
+- simple_pothole_avoidance.py   ("Step N: Vehicle vid ✗ HIT POTHOLE", "↔ DODGING", ...;
+                                 older logs: "[vid] ✗ HIT POTHOLE")
+- pothole_swerve_controller.py  ("Step N: Vehicle vid SWERVED/HIT/...")
+- pothole_controller.py         ("Step N: Vehicle vid hit ... pothole")
+
+Re-ingesting a log that has grown only reads the new bytes. A log that was
+truncated or replaced is detected and re-read from the start.
+
+Usage:
+    python3 pothole_analytics.py ingest simulation_simple.log
+    python3 pothole_analytics.py report
+    python3 pothole_analytics.py potholes --top 20
+    python3 pothole_analytics.py timeseries --bucket 60
+"""
+
+import os
+import re
+import sys
+import time
+import hashlib
+import sqlite3
+import argparse
+import xml.etree.ElementTree as ET
+from pothole_model import POTHOLE_PREFIX
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DEFAULT_DB = 'avoidance_events.db'
+DEFAULT_STEP_LENGTH = 0.1   # Seconds per step (mymap.sumocfg)
+SNAP_RADIUS = 5.0           # Snap hit XY to a pothole centre within 5m
+SWERVE_HORIZON = 10.0       # A hit within 10s of a swerve (and before the next one) means it failed
+HEAD_FINGERPRINT_BYTES = 1024
+
+# Event names stored in the database
+HIT = 'hit'
+SWERVE = 'swerve'
+SLOW = 'slow'
+BLOCKED = 'blocked'
+SWERVE_FAILED = 'swerve_failed'
+PASSED = 'passed'
+RETURN = 'return'
+RECOVER = 'recover'
+
+# ============================================================================
+# LOG LINE PATTERNS
+# ============================================================================
+
+# "Step 1234: Vehicle car_flow_1.0 <message>" (every controller, controller_core.EventLog)
+STEP_VEHICLE_RE = re.compile(r'^Step (\d+): Vehicle (\S+) (.*)$')
+
+# "Step 100: 3 vehicles active, ..." (simple controller progress line)
+STEP_PROGRESS_RE = re.compile(r'^Step (\d+): \d+ vehicles active')
+
+# "  [car_flow_1.0] <message>" (simple controller logs written before controller_core.py)
+BRACKET_VEHICLE_RE = re.compile(r'^\s*\[([^\]]+)\] (.*)$')
+
+XY_RE = re.compile(r'\((-?[\d.]+), (-?[\d.]+)\)')
+LANE_RE = re.compile(r' on (\S+) at pos (-?[\d.]+)')
+
+# (message prefix, event) - checked in order, first match wins
+MESSAGE_EVENTS = [
+    ('SWERVED', SWERVE),
+    ('SLOWING DOWN', SLOW),
+    ('BLOCKED', BLOCKED),
+    ('lateral swerve failed', SWERVE_FAILED),
+    ('HIT', HIT),
+    ('RETURNED', RETURN),
+    ('hit ', HIT),
+    ('recovered from pothole', RECOVER),
+    ('✗ HIT POTHOLE', HIT),
+    ('↔ DODGING', SWERVE),
+    ('↓ SLOWING', SLOW),
+    ('← Passed pothole', PASSED),
+    ('→ Returned to center', RETURN),
+    ('✓ RECOVERED', RECOVER),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    inode INTEGER,
+    offset INTEGER NOT NULL DEFAULT 0,
+    line_no INTEGER NOT NULL DEFAULT 0,
+    last_step INTEGER NOT NULL DEFAULT 0,
+    head_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    log_id INTEGER NOT NULL,
+    line_no INTEGER NOT NULL,
+    step INTEGER NOT NULL,
+    vehicle TEXT NOT NULL,
+    vtype TEXT NOT NULL,
+    event TEXT NOT NULL,
+    pothole TEXT,
+    x REAL,
+    y REAL
+);
+CREATE INDEX IF NOT EXISTS idx_events_event_vtype ON events(event, vtype);
+CREATE INDEX IF NOT EXISTS idx_events_pothole ON events(pothole) WHERE pothole IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_events_step ON events(step);
+CREATE INDEX IF NOT EXISTS idx_events_vehicle ON events(log_id, vehicle, line_no);
+"""
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def vehicle_type(veh_id):
+    """Vehicle type from its ID ('motorbike_flow_6.0' -> 'motorbike')"""
+    return veh_id.split('_', 1)[0]
+
+
+def load_pothole_grid(obstacles_file, cell_size=SNAP_RADIUS):
+    """Load pothole centres into a coarse grid for nearest-pothole snapping"""
+    grid = {}
+    root = ET.parse(obstacles_file).getroot()
+    for poly in root.findall('poly'):
+        poly_id = poly.get('id', '')
+        shape = poly.get('shape', '')
+        if not poly_id.startswith(POTHOLE_PREFIX) or not shape:  # Same polygons as the controllers
+            continue
+        points = [tuple(map(float, p.split(','))) for p in shape.split()]
+        cx = sum(p[0] for p in points) / len(points)
+        cy = sum(p[1] for p in points) / len(points)
+        cell = (int(cx // cell_size), int(cy // cell_size))
+        grid.setdefault(cell, []).append((poly_id, cx, cy))
+    return grid
+
+
+def snap_to_pothole(grid, x, y, cell_size=SNAP_RADIUS):
+    """ID of the pothole nearest to (x, y) within SNAP_RADIUS, or None"""
+    cx, cy = int(x // cell_size), int(y // cell_size)
+    best_id, best_dist = None, SNAP_RADIUS
+    for gx in (cx - 1, cx, cx + 1):
+        for gy in (cy - 1, cy, cy + 1):
+            for poly_id, px, py in grid.get((gx, gy), ()):
+                dist = ((px - x)**2 + (py - y)**2)**0.5
+                if dist < best_dist:
+                    best_id, best_dist = poly_id, dist
+    return best_id
+
+
+def classify(message):
+    """Map a controller message to an event name (or None)"""
+    for prefix, event in MESSAGE_EVENTS:
+        if message.startswith(prefix):
+            return event
+    return None
+
+
+def parse_line(line, last_step, pothole_grid=None):
+    """
+    Parse one log line.
+    Returns (event_row or None, last_step). event_row is
+    (step, vehicle, event, pothole, x, y).
+
+    Older simple controller logs do not print a step with each event, only a
+    progress line every 100 steps, so their events are stamped with the step
+    after the last progress line seen.
+    """
+    match = STEP_PROGRESS_RE.match(line)
+    if match:
+        return None, int(match.group(1))
+
+    match = STEP_VEHICLE_RE.match(line)
+    if match:
+        step = int(match.group(1))
+        last_step = max(last_step, step)
+        veh_id, message = match.group(2), match.group(3)
+    else:
+        match = BRACKET_VEHICLE_RE.match(line)
+        if not match:
+            return None, last_step
+        step = last_step + 1
+        veh_id, message = match.group(1), match.group(2)
+
+    event = classify(message)
+    if event is None:
+        return None, last_step
+
+    pothole, x, y = None, None, None
+    if event == HIT:
+        xy = XY_RE.search(message)
+        lane = LANE_RE.search(message)
+        if xy:
+            x, y = float(xy.group(1)), float(xy.group(2))
+            if pothole_grid:
+                pothole = snap_to_pothole(pothole_grid, x, y)
+            if pothole is None:
+                pothole = f"{x:.0f},{y:.0f}"
+        elif lane:
+            pothole = f"{lane.group(1)}@{float(lane.group(2)):.0f}"
+
+    return (step, veh_id, event, pothole, x, y), last_step
+
+
+# ============================================================================
+# INGEST
+# ============================================================================
+
+def connect(db_file):
+    """Open (and create if needed) the analytics database"""
+    conn = sqlite3.connect(db_file)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def head_hash(path, length):
+    """Fingerprint of the first bytes of a file, used to detect replacement"""
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read(min(length, HEAD_FINGERPRINT_BYTES))).hexdigest()
+
+
+def ingest_log(conn, path, pothole_grid=None):
+    """
+    Ingest new lines of a log file. Returns the number of new events.
+    Only complete lines are consumed; a partially written last line is
+    picked up on the next ingest.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+
+    row = conn.execute(
+        "SELECT id, inode, offset, line_no, last_step, head_hash FROM logs WHERE path = ?",
+        (path,)).fetchone()
+
+    if row is None:
+        cur = conn.execute("INSERT INTO logs (path, inode) VALUES (?, ?)", (path, stat.st_ino))
+        log_id, offset, line_no, last_step = cur.lastrowid, 0, 0, 0
+    else:
+        log_id, inode, offset, line_no, last_step, old_hash = row
+        replaced = (inode != stat.st_ino or stat.st_size < offset or
+                    (offset > 0 and head_hash(path, offset) != old_hash))
+        if replaced:
+            print(f"Log {path} was truncated or replaced, re-ingesting from start")
+            conn.execute("DELETE FROM events WHERE log_id = ?", (log_id,))
+            offset, line_no, last_step = 0, 0, 0
+
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+
+    end = data.rfind(b'\n') + 1
+    rows = []
+    for raw in data[:end].splitlines():
+        line_no += 1
+        event_row, last_step = parse_line(raw.decode('utf-8', errors='replace'),
+                                          last_step, pothole_grid)
+        if event_row:
+            step, veh_id, event, pothole, x, y = event_row
+            rows.append((log_id, line_no, step, veh_id, vehicle_type(veh_id), event, pothole, x, y))
+
+    offset += end
+    conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.execute(
+        "UPDATE logs SET inode = ?, offset = ?, line_no = ?, last_step = ?, head_hash = ? WHERE id = ?",
+        (stat.st_ino, offset, line_no, last_step, head_hash(path, offset), log_id))
+    conn.commit()
+    return len(rows)
+
+
+# ============================================================================
+# QUERIES
+# ============================================================================
+
+def timed_query(conn, sql, params=()):
+    """Run a query, returning (rows, elapsed milliseconds)"""
+    start = time.perf_counter()
+    rows = conn.execute(sql, params).fetchall()
+    return rows, (time.perf_counter() - start) * 1000.0
+
+
+def hit_rate_by_type(conn):
+    """Hits, swerves and hit rate per vehicle type"""
+    return timed_query(conn, """
+        SELECT vtype,
+               COUNT(DISTINCT vehicle) AS vehicles,
+               SUM(event = 'hit') AS hits,
+               SUM(event = 'swerve') AS swerves,
+               1.0 * SUM(event = 'hit') / MAX(SUM(event IN ('hit', 'swerve')), 1) AS hit_rate
+        FROM events
+        GROUP BY vtype
+        ORDER BY vtype
+    """)
+
+
+def swerve_success(conn, horizon_seconds=SWERVE_HORIZON, step_length=DEFAULT_STEP_LENGTH):
+    """
+    A swerve succeeds unless the vehicle hits a pothole before its next
+    swerve and within horizon_seconds. Returning to the lane centre ends
+    the manoeuvre, not the risk, so 'return' events are not looked at.
+    """
+    horizon_steps = max(1, int(round(horizon_seconds / step_length)))
+    return timed_query(conn, """
+        WITH seq AS (
+            SELECT vtype, event, step,
+                   LEAD(event) OVER (PARTITION BY log_id, vehicle ORDER BY line_no) AS next_event,
+                   LEAD(step) OVER (PARTITION BY log_id, vehicle ORDER BY line_no) AS next_step
+            FROM events
+            WHERE event IN ('hit', 'swerve')
+        ),
+        outcome AS (
+            SELECT vtype, NOT (next_event IS 'hit' AND next_step - step <= ?) AS ok
+            FROM seq
+            WHERE event = 'swerve'
+        )
+        SELECT vtype,
+               COUNT(*) AS swerves,
+               SUM(ok) AS successful,
+               1.0 * SUM(ok) / COUNT(*) AS ratio
+        FROM outcome
+        GROUP BY vtype
+        ORDER BY vtype
+    """, (horizon_steps,))
+
+
+def pothole_hits(conn, top=20):
+    """Most frequently hit potholes"""
+    return timed_query(conn, """
+        SELECT pothole, COUNT(*) AS hits, COUNT(DISTINCT vehicle) AS vehicles
+        FROM events
+        WHERE event = 'hit' AND pothole IS NOT NULL
+        GROUP BY pothole
+        ORDER BY hits DESC, pothole
+        LIMIT ?
+    """, (top,))
+
+
+def time_series(conn, bucket_seconds=60.0, step_length=DEFAULT_STEP_LENGTH):
+    """Event counts per time bucket of simulated time"""
+    steps_per_bucket = max(1, int(round(bucket_seconds / step_length)))
+    return timed_query(conn, """
+        SELECT (step / ?) * ? AS bucket_start,
+               SUM(event = 'hit') AS hits,
+               SUM(event = 'swerve') AS swerves,
+               SUM(event = 'slow') AS slowdowns,
+               SUM(event = 'blocked') AS blocked
+        FROM events
+        GROUP BY step / ?
+        ORDER BY bucket_start
+    """, (steps_per_bucket, bucket_seconds, steps_per_bucket))
+
+
+def print_table(title, header, rows, elapsed_ms):
+    """Print query results as a plain text table"""
+    print(f"\n=== {title} ({elapsed_ms:.2f} ms) ===")
+    print("  ".join(f"{h:>12}" for h in header))
+    for row in rows:
+        cells = []
+        for value in row:
+            if isinstance(value, float):
+                cells.append(f"{value:>12.3f}")
+            else:
+                cells.append(f"{str(value):>12}")
+        print("  ".join(cells))
+    if not rows:
+        print("  (no events)")
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Indexed analytics over pothole controller logs")
+    parser.add_argument('--db', default=DEFAULT_DB, help='SQLite database file')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    ingest = sub.add_parser('ingest', help='Ingest (new lines of) controller logs')
+    ingest.add_argument('logs', nargs='+', help='Controller log files')
+    ingest.add_argument('--obstacles', help='Obstacles file used to snap hits to pothole IDs')
+
+    report = sub.add_parser('report', help='Hit rate, swerve success and top potholes')
+    sub.add_parser('hit-rate', help='Hit rate per vehicle type')
+    success = sub.add_parser('swerve-success', help='Swerve success ratio per vehicle type')
+    for p in (report, success):
+        p.add_argument('--horizon', type=float, default=SWERVE_HORIZON,
+                       help='Seconds after a swerve in which a hit counts as a failed swerve')
+        p.add_argument('--step-length', type=float, default=DEFAULT_STEP_LENGTH)
+
+    potholes = sub.add_parser('potholes', help='Per-pothole hit counts')
+    potholes.add_argument('--top', type=int, default=20)
+
+    series = sub.add_parser('timeseries', help='Event counts per time bucket')
+    series.add_argument('--bucket', type=float, default=60.0, help='Bucket size in seconds')
+    series.add_argument('--step-length', type=float, default=DEFAULT_STEP_LENGTH)
+
+    args = parser.parse_args(argv)
+    conn = connect(args.db)
+
+    if args.command == 'ingest':
+        grid = load_pothole_grid(args.obstacles) if args.obstacles else None
+        for log in args.logs:
+            start = time.perf_counter()
+            added = ingest_log(conn, log, grid)
+            print(f"✓ {log}: {added} new events ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        return
+
+    if args.command in ('report', 'hit-rate'):
+        rows, ms = hit_rate_by_type(conn)
+        print_table("Hit rate per vehicle type", ["vtype", "vehicles", "hits", "swerves", "hit_rate"], rows, ms)
+    if args.command in ('report', 'swerve-success'):
+        rows, ms = swerve_success(conn, args.horizon, args.step_length)
+        print_table("Swerve success", ["vtype", "swerves", "successful", "ratio"], rows, ms)
+    if args.command in ('report', 'potholes'):
+        rows, ms = pothole_hits(conn, getattr(args, 'top', 20))
+        print_table("Per-pothole hits", ["pothole", "hits", "vehicles"], rows, ms)
+    if args.command == 'timeseries':
+        rows, ms = time_series(conn, args.bucket, args.step_length)
+        print_table(f"Events per {args.bucket:g}s", ["start_s", "hits", "swerves", "slowdowns", "blocked"], rows, ms)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Pothole Model
+=============
+Size and severity of every pothole, carried from generation to the hit
+test instead of one hard-coded radius and speed drop per controller:
+
+    radius       circle radius of the pothole polygon (m, 0.8-1.5 generated)
+    speed_mult   speed factor on a hit (0.01 = 99% drop); severity = 1 - speed_mult
+
+The generators write both as <param> children of the pothole <poly> (SUMO
+keeps them as polygon parameters). pothole_attributes() reads them back;
+obstacle files without params get the radius from the polygon shape and
+DEFAULT_SPEED_MULT. The loaders store them in their existing per-pothole
+tuples, so heterogeneous potholes cost one tuple field each and no extra
+work per step.
+
+A vehicle hits a pothole when the pothole's circle reaches the strip under
+the vehicle's front: within radius + HIT_MARGIN along the heading (one
+step of travel either way) and within radius + half the vehicle's width
+across it. Widths come from the vTypes (SUMO's 1.8m passenger default when
+unset) and are read once per vehicle; swerved vehicles that pass beside a
+pothole no longer count as hits. Potholes are capped at MAX_RADIUS and
+vehicles at MAX_WIDTH so the wake-up and subscription ranges stay bounded.
+
+A vehicle evaluated on consecutive steps is tested against the path its
+front drove since the previous step (segment vs circle: closest approach
+< radius + half width), so fast vehicles and long steps cannot tunnel
+through a pothole between two samples. Jumps longer than MAX_SWEEP are
+teleports and fall back to the single-position test.
+
+The XY scans (hits, lookahead, swerve clearance) only test the potholes
+in the PotholeGrid cells around the query point, so their cost grows with
+the local pothole density instead of the size of the layout.
+"""
+
+import math
+from collections import defaultdict
+
+POTHOLE_PREFIX = "pothole_"   # Polygon IDs treated as potholes (controllers, analytics, native/meso builds)
+DEFAULT_SPEED_MULT = 0.01   # 99% speed drop
+DEFAULT_RADIUS = 1.15       # Middle of the generated 0.8-1.5m
+MAX_RADIUS = 1.5            # Largest radius the hit ranges allow for
+HIT_MARGIN = 0.9            # Along the heading: ~one 0.1s step at urban speeds, either way
+DEFAULT_WIDTH = 1.8         # SUMO's passenger vType width
+MAX_WIDTH = 2.5             # Widest generated vType (bus)
+MAX_SWEEP = 50.0            # Longest plausible drive between two steps (m)
+SWEEP_SPEED = 40.0          # Fastest vehicle zone radii allow for (m/s): evaluated on both sides of a pothole
+HIT_REACH = math.hypot(MAX_RADIUS + HIT_MARGIN, MAX_RADIUS + MAX_WIDTH / 2)   # Farthest possible hit, centre to centre
+MIN_HIT_SPEED = 0.5         # Never stop a vehicle completely (m/s)
+GRID_CELL_SIZE = 25.0       # PotholeGrid cell (m): a hit query touches 1-4 cells, an 80m lookahead ~20
+
+
+def pothole_params_xml(radius, speed_mult, indent="        "):
+    """<param> lines for a generated pothole <poly>"""
+    return (f'{indent}<param key="radius" value="{radius:.2f}"/>\n'
+            f'{indent}<param key="speedMult" value="{speed_mult:g}"/>\n')
+
+
+def pothole_attributes(poly, coords):
+    """(radius, speed_mult) of a pothole <poly> element with shape points coords"""
+    params = {param.get('key'): param.get('value') for param in poly.findall('param')}
+    try:
+        radius = float(params['radius'])
+    except (KeyError, ValueError):
+        cx = sum(x for x, y in coords) / len(coords)
+        cy = sum(y for x, y in coords) / len(coords)
+        radius = sum(math.hypot(x - cx, y - cy) for x, y in coords) / len(coords) or DEFAULT_RADIUS
+    try:
+        speed_mult = float(params['speedMult'])
+    except (KeyError, ValueError):
+        speed_mult = DEFAULT_SPEED_MULT
+    return min(radius, MAX_RADIUS), speed_mult
+
+
+def vehicle_width(veh_id, vehicle=None):
+    """Width of a vehicle's vType, read through the controller's vehicle view (cache it per vehicle)"""
+    import traci
+    try:
+        return min((vehicle or traci.vehicle).getWidth(veh_id), MAX_WIDTH)
+    except traci.exceptions.TraCIException:
+        return DEFAULT_WIDTH
+
+
+def vehicle_frame(dx, dy, angle):
+    """(along, across) of the offset (dx, dy) seen from a vehicle with SUMO angle (deg, 0 = north, clockwise)"""
+    rad = math.radians(angle)
+    sin_a, cos_a = math.sin(rad), math.cos(rad)
+    return dx * sin_a + dy * cos_a, dx * cos_a - dy * sin_a
+
+
+def under_vehicle(along, across, radius, half_width, margin=HIT_MARGIN):
+    """Pothole at (along, across) from the vehicle front overlaps the strip its wheels are on"""
+    return abs(along) < radius + margin and abs(across) < radius + half_width
+
+
+def segment_distance(px, py, x0, y0, x1, y1):
+    """Distance from (px, py) to the segment (x0, y0)-(x1, y1)"""
+    dx, dy = x1 - x0, y1 - y0
+    length_sq = dx * dx + dy * dy
+    t = 0.0 if length_sq == 0 else max(0.0, min(1.0, ((px - x0) * dx + (py - y0) * dy) / length_sq))
+    return math.hypot(px - x0 - t * dx, py - y0 - t * dy)
+
+
+class PotholeGrid:
+    """potholes_xy entries bucketed on a square grid; kept in step with dynamic potholes by PotholeRegistry"""
+
+    def __init__(self, potholes_xy=(), cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)   # (gx, gy) -> [(x, y, radius, type, speed_mult)]
+        for entry in potholes_xy:
+            self.add(entry)
+
+    def add(self, entry):
+        self.cells[(int(entry[0] // self.cell_size), int(entry[1] // self.cell_size))].append(entry)
+
+    def remove(self, entry):
+        key = (int(entry[0] // self.cell_size), int(entry[1] // self.cell_size))
+        cell = self.cells.get(key)
+        if cell and entry in cell:
+            cell.remove(entry)
+            if not cell:
+                del self.cells[key]
+
+    def near(self, x, y, reach):
+        """Every entry within `reach` of (x, y), plus some from the same cells (callers test the exact distance)"""
+        size = self.cell_size
+        x0, x1 = int((x - reach) // size), int((x + reach) // size)
+        y0, y1 = int((y - reach) // size), int((y + reach) // size)
+        cells = self.cells
+        if x0 == x1 and y0 == y1:
+            return cells.get((x0, y0), ())
+        found = []
+        for gx in range(x0, x1 + 1):
+            for gy in range(y0, y1 + 1):
+                cell = cells.get((gx, gy))
+                if cell:
+                    found.extend(cell)
+        return found
+
+
+def hit_speed(original_max, speed_mult):
+    """Speed to hold after hitting a pothole"""
+    return max(MIN_HIT_SPEED, original_max * speed_mult)
+
+
+def lane_projection(shape, x, y):
+    """(offset along shape, distance, lateral offset (positive = left), shape length) of (x, y) on a lane shape"""
+    best = None
+    offset = 0.0
+    for (x1, y1), (x2, y2) in zip(shape, shape[1:] or shape):
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+        t = 0.0 if length == 0 else max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / (length * length)))
+        dist = math.hypot(x - x1 - t * dx, y - y1 - t * dy)
+        if best is None or dist < best[1]:
+            lateral = (dx * (y - y1) - dy * (x - x1)) / length if length > 0 else 0.0
+            best = (offset + t * length, dist, lateral)
+        offset += length
+    return best + (offset,)
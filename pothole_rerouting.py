@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Pothole-Aware Rerouting
+=======================
+device.rerouting routes on plain travel times, so vehicles keep choosing
+pothole-dense edges. This cost model turns the pothole layout into a
+per-edge penalty and lets a share of the vehicles route around it:
+
+    penalty(edge) = sum over its potholes of severity * EXPECTED_HIT_DELAY
+                    / number of lanes          (a vehicle drives one lane)
+    severity      = 1 - speed multiplier of the pothole (0.01 -> 0.99)
+
+Effort of an edge = current travel time + penalty (seconds). SUMO takes an
+edge without an effort as free (effort 0), so the first update pushes every
+edge; after that only the penalized edges are refreshed every EFFORT_PERIOD
+simulated seconds (an edge whose last pothole was repaired is reset to its
+travel time once). Unpenalized edges keep their first, near free-flow
+effort, and the cost per update is 2 calls per penalized edge however big
+the network is. Avoiding vehicles (AVOID_SHARE of the departures,
+picked by a hash of the vehicle ID, so the same vehicles avoid in every
+run) are rerouted by effort once, when they depart. Everybody else keeps
+routing by travel time only: efforts are invisible to device.rerouting.
+
+Usage:
+    python3 pothole_swerve_controller.py --pothole-rerouting --avoid-share 0.3
+"""
+
+import zlib
+import traci
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+EXPECTED_HIT_DELAY = 8.0    # Seconds lost per pothole hit: 5s recovery crawl + re-acceleration
+EFFORT_PERIOD = 300.0       # Refresh edge efforts every 5 simulated minutes
+AVOID_SHARE = 0.5           # Share of vehicles that route around potholes
+WORST_EDGES_SHOWN = 10
+
+
+def edge_penalties(potholes_by_lane, lanes_per_edge):
+    """{edge_id: (pothole count, mean severity, expected delay s)} from the controller's lane index"""
+    by_edge = {}
+    for lane_id, entries in potholes_by_lane.items():
+        edge_id = lane_id.rsplit('_', 1)[0]
+        count, severity = by_edge.get(edge_id, (0, 0.0))
+        by_edge[edge_id] = (count + len(entries), severity + sum(1.0 - entry[1] for entry in entries))
+
+    penalties = {}
+    for edge_id, (count, severity) in by_edge.items():
+        lanes = max(1, lanes_per_edge.get(edge_id, 1))
+        penalties[edge_id] = (count, severity / count, severity * EXPECTED_HIT_DELAY / lanes)
+    return penalties
+
+
+def avoids_potholes(veh_id, share):
+    """Stable pick of `share` of the vehicles (the same IDs in every run)"""
+    return zlib.crc32(veh_id.encode('utf8')) % 1000 < share * 1000
+
+
+class PotholeRerouting:
+    """Low-frequency edge efforts + reroute-on-departure for avoiding vehicles"""
+
+    def __init__(self, share=AVOID_SHARE, period=EFFORT_PERIOD):
+        self.share = share
+        self.period = period
+        self.edges = []
+        self.lanes_per_edge = {}
+        self.penalties = {}
+        self.pushed = None          # Edges whose effort includes a penalty (None: nothing pushed yet)
+        self.next_update = None
+        self.rerouted = 0
+        self.updates = 0
+
+    def start(self, potholes_by_lane):
+        """Compute the penalties (call once the simulation is running)"""
+        self.edges = [edge_id for edge_id in traci.edge.getIDList() if not edge_id.startswith(':')]
+        self.lanes_per_edge = {edge_id: traci.edge.getLaneNumber(edge_id) for edge_id in self.edges}
+        self.penalties = edge_penalties(potholes_by_lane, self.lanes_per_edge)
+
+        worst = sorted(self.penalties.items(), key=lambda item: -item[1][2])[:WORST_EDGES_SHOWN]
+        print(f"Pothole rerouting: {len(self.penalties)} edges penalized, {self.share:.0%} of vehicles avoid them")
+        for edge_id, (count, severity, delay) in worst:
+            print(f"  {edge_id}: {count} potholes, severity {severity:.2f}, +{delay:.1f}s")
+
+    def pothole_changed(self, lane_id, speed_mult, added=True):
+        """Adjust one edge's penalty for an added/removed pothole (pushed with the next effort update)"""
+        edge_id = lane_id.rsplit('_', 1)[0]
+        count, severity, _ = self.penalties.get(edge_id, (0, 0.0, 0.0))
+        total = severity * count + (1.0 if added else -1.0) * (1.0 - speed_mult)
+        count += 1 if added else -1
+        if count <= 0:
+            self.penalties.pop(edge_id, None)
+            return
+        lanes = max(1, self.lanes_per_edge.get(edge_id, 1))
+        self.penalties[edge_id] = (count, total / count, total * EXPECTED_HIT_DELAY / lanes)
+
+    def update_efforts(self):
+        """Effort = current travel time + pothole penalty: every edge the first time, then the penalized ones"""
+        if self.pushed is None:
+            edges = self.edges
+        else:
+            edges = [edge_id for edge_id in self.penalties if edge_id in self.lanes_per_edge]
+            edges += [edge_id for edge_id in self.pushed if edge_id not in self.penalties]
+        for edge_id in edges:
+            penalty = self.penalties.get(edge_id)
+            traci.edge.setEffort(edge_id, traci.edge.getTraveltime(edge_id) + (penalty[2] if penalty else 0.0))
+        self.pushed = {edge_id for edge_id in self.penalties if edge_id in self.lanes_per_edge}
+        self.updates += 1
+
+    def step(self):
+        """Call once per simulation step, after traci.simulationStep()"""
+        now = traci.simulation.getTime()
+        if self.next_update is None or now >= self.next_update:
+            self.update_efforts()
+            self.next_update = now + self.period
+
+        for veh_id in traci.simulation.getDepartedIDList():
+            if avoids_potholes(veh_id, self.share):
+                try:
+                    traci.vehicle.rerouteEffort(veh_id)
+                    self.rerouted += 1
+                except traci.exceptions.TraCIException:
+                    pass
+
+    def summary(self):
+        return f"Pothole rerouting: {self.rerouted} vehicles routed around potholes, {self.updates} effort updates"
+
+
+def add_rerouting_arguments(parser):
+    """Register --pothole-rerouting / --avoid-share on a controller's argparse parser"""
+    parser.add_argument('--pothole-rerouting', action='store_true',
+                        help='Route a share of the vehicles around pothole-dense edges (pothole_rerouting.py)')
+    parser.add_argument('--avoid-share', type=float, default=AVOID_SHARE,
+                        help='Share of vehicles that avoid potholes when rerouting (0..1)')
+    parser.add_argument('--effort-period', type=float, default=EFFORT_PERIOD,
+                        help='Simulated seconds between edge effort updates')
+
+
+def rerouting_from_args(args):
+    """PotholeRerouting for run_simulation(..., rerouting=...), or None"""
+    if not args.pothole_rerouting:
+        return None
+    return PotholeRerouting(args.avoid_share, args.effort_period)
@@ -3,365 +3,390 @@
 Pothole Swerve Controller using TraCI
 Vehicles detect potholes ahead, slow down, swerve laterally to avoid them, then return to lane center.
 Uses XY coordinate-based detection for true lateral avoidance.
+Runs as the swerve policy of the shared controller engine (controller_core.py).
 """
 
-import os
-import sys
 import traci
-import xml.etree.ElementTree as ET
+import traci.constants as tc
 import math
 
-# Add SUMO tools to path
-if 'SUMO_HOME' in os.environ:
-    tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
-    sys.path.append(tools)
-else:
-    sys.exit("Please set SUMO_HOME environment variable")
-
-import sumolib
-
-def load_potholes(obstacles_file, net_file):
-    """Load pothole positions and calculate XY coordinates"""
-    potholes_by_lane = {}
-    potholes_xy = []  # List of (x, y, radius, type) for XY-based detection
-    
-    try:
-        tree = ET.parse(obstacles_file)
-        root = tree.getroot()
-        net = sumolib.net.readNet(net_file)
-    except Exception as e:
-        print(f"Error loading files: {e}")
-        return potholes_by_lane, potholes_xy
-    
-    for poly in root.findall('poly'):
-        poly_id = poly.get('id', '')
-        poly_type = poly.get('type', '')
-        
-        if not poly_id.startswith('pothole_'):
-            continue
-        
-        speed_mult = 0.01  # 99% speed reduction
-        shape_str = poly.get('shape', '')
-        
-        if not shape_str:
-            continue
-        
-        try:
-            coords = []
-            for point in shape_str.split():
-                x, y = map(float, point.split(','))
-                coords.append((x, y))
-            
-            if not coords:
-                continue
-            
-            # Calculate polygon center
-            center_x = sum(x for x, y in coords) / len(coords)
-            center_y = sum(y for x, y in coords) / len(coords)
-            
-            # Store XY coordinate pothole (2.5m radius for hit detection)
-            potholes_xy.append((center_x, center_y, 2.5, poly_type))
-            
-            # Also map to nearest lane for ahead detection
-            nearest_lane = None
-            min_dist = float('inf')
-            
-            for edge in net.getEdges():
-                for lane in edge.getLanes():
-                    lane_shape = lane.getShape()
-                    for lx, ly in lane_shape:
-                        dist = ((center_x - lx)**2 + (center_y - ly)**2)**0.5
-                        if dist < min_dist:
-                            min_dist = dist
-                            nearest_lane = lane
-            
-            if nearest_lane and min_dist < 50.0:
-                lane_id = nearest_lane.getID()
-                lane_shape = nearest_lane.getShape()
-                
-                # Project pothole onto lane to get position
-                closest_point_idx = 0
-                min_point_dist = float('inf')
-                for idx, (lx, ly) in enumerate(lane_shape):
-                    dist = ((center_x - lx)**2 + (center_y - ly)**2)**0.5
-                    if dist < min_point_dist:
-                        min_point_dist = dist
-                        closest_point_idx = idx
-                
-                # Calculate lane position
-                lane_length = nearest_lane.getLength()
-                if len(lane_shape) > 1:
-                    dist_along = sum(
-                        ((lane_shape[i+1][0] - lane_shape[i][0])**2 + 
-                         (lane_shape[i+1][1] - lane_shape[i][1])**2)**0.5
-                        for i in range(min(closest_point_idx, len(lane_shape)-2))
-                    )
-                    pothole_pos = min(dist_along, lane_length - 1)
-                else:
-                    pothole_pos = lane_length / 2
-                
-                if lane_id not in potholes_by_lane:
-                    potholes_by_lane[lane_id] = []
-                potholes_by_lane[lane_id].append((pothole_pos, speed_mult, poly_type, center_x, center_y))
-        
-        except Exception as e:
-            print(f"Error processing pothole {poly_id}: {e}")
-            continue
-    
-    print(f"Loaded {len(potholes_xy)} potholes at XY coordinates")
-    return potholes_by_lane, potholes_xy
-
-def run_simulation(sumo_config):
-    """Run SUMO simulation with pothole swerve avoidance"""
-    
-    # Load potholes
-    obstacles_file = sumo_config.replace('.sumocfg', '.obstacles.xml')
-    net_file = sumo_config.replace('.sumocfg', '.net.xml')
-    potholes_by_lane, potholes_xy = load_potholes(obstacles_file, net_file)
-    
-    # Start TraCI with GUI
-    traci.start(["sumo-gui", "-c", sumo_config])
-    
-    # Tracking dictionaries
-    vehicle_original_speeds = {}
-    vehicle_pothole_hit_time = {}
-    vehicle_in_pothole_zone = {}
-    vehicle_slowed_for_pothole = {}
-    vehicle_swerved_for_pothole = {}
-    vehicle_swerve_time = {}
-    vehicle_original_lane = {}
-    
-    # Constants
-    RECOVERY_TIME = 50  # 5 seconds to recover from pothole
-    SWERVE_RETURN_DELAY = 80  # 8 seconds swerved before returning
-    POTHOLE_DETECTION_DISTANCE = 150.0  # Look ahead 150m (increased for earlier detection)
-    SLOWDOWN_START_DISTANCE = 100.0  # Slow at 100m (earlier)
-    SWERVE_START_DISTANCE = 90.0  # Swerve at 90m (earlier)
-    MIN_SWERVE_DISTANCE = 70.0  # Must be 70m+ away (earlier)
-    SLOWDOWN_SPEED = 8.0  # Slow to 8 m/s
-    SWERVE_OFFSET = 4.0  # Swerve 4m laterally (reduced to stay within lane)
-    POTHOLE_HIT_RADIUS = 2.0  # Hit if within 2.0m (vehicle width ~2m + pothole radius ~1.3m = ~3.3m, but 2.0m for center-to-center)
-    
-    step = 0
-    try:
-        while traci.simulation.getMinExpectedNumber() > 0:
-            traci.simulationStep()
-            step += 1
-            
-            vehicle_ids = traci.vehicle.getIDList()
-            
-            for veh_id in vehicle_ids:
+from controller_core import (Policy, load_potholes, run_simulation as run_policy, add_controller_arguments,
+                             run_from_args, HIT, SWERVE, SLOW, BLOCKED, SWERVE_FAILED, RETURN)
+from wakeup_scheduler import WakeupScheduler
+from zone_subscriptions import ZoneSubscriptions
+from pothole_model import (hit_speed, vehicle_width, vehicle_frame, under_vehicle, segment_distance,
+                           DEFAULT_SPEED_MULT, DEFAULT_WIDTH, HIT_REACH, MAX_RADIUS, MAX_SWEEP, SWEEP_SPEED)
+
+# Constants
+RECOVERY_TIME = 5.0  # Simulated seconds to recover from pothole
+SWERVE_RETURN_DELAY = 8.0  # Simulated seconds swerved before returning
+POTHOLE_DETECTION_DISTANCE = 150.0  # Look ahead 150m (increased for earlier detection)
+SLOWDOWN_START_DISTANCE = 100.0  # Slow at 100m (earlier)
+SWERVE_START_DISTANCE = 90.0  # Swerve at 90m (earlier)
+MIN_SWERVE_DISTANCE = 70.0  # Must be 70m+ away (earlier)
+SLOWDOWN_SPEED = 8.0  # Slow to 8 m/s
+SWERVE_OFFSET = 4.0  # Swerve 4m laterally (reduced to stay within lane)
+POTHOLE_HIT_RADIUS = HIT_REACH  # Largest centre-to-centre hit distance (widest vehicle, largest pothole)
+
+def find_pothole_ahead(potholes_by_lane, lane_id, lane_pos):
+    """Nearest pothole ahead on the lane within detection distance: (pothole, distance)"""
+    pothole_ahead = None
+    pothole_distance = float('inf')
+
+    for pothole in potholes_by_lane.get(lane_id, ()):
+        distance = pothole[0] - lane_pos
+
+        if 0 < distance < POTHOLE_DETECTION_DISTANCE:
+            if distance < pothole_distance:
+                pothole_ahead = pothole
+                pothole_distance = distance
+
+    return pothole_ahead, pothole_distance
+
+def find_pothole_hit(grid, veh_x, veh_y, half_width=DEFAULT_WIDTH / 2, heading=None, prev_xy=None):
+    """First pothole under the vehicle's front: (x, y, radius, type, speed_mult, dist) or None
+
+    grid: PotholeGrid of potholes_xy; only the cells within reach are tested.
+
+    prev_xy: front position one step earlier; the whole path driven since then
+    is tested (segment vs circle), so no pothole is skipped at high speed.
+    Otherwise heading() returns the vehicle angle; it is only called once a
+    pothole is close enough to be hit, so distant potholes cost no TraCI call.
+    """
+    angle = None
+    travel = None
+    if prev_xy is not None:
+        x0, y0 = prev_xy
+        travel = math.sqrt((veh_x - x0)**2 + (veh_y - y0)**2)
+        if travel > MAX_SWEEP:  # Teleported
+            travel = None
+    reach = POTHOLE_HIT_RADIUS if travel is None else travel + MAX_RADIUS + half_width
+    for px, py, radius, ptype, speed_mult in grid.near(veh_x, veh_y, reach):
+        xy_dist = math.sqrt((veh_x - px)**2 + (veh_y - py)**2)
+
+        if travel is not None:
+            if xy_dist < travel + radius + half_width:
+                swept_dist = segment_distance(px, py, x0, y0, veh_x, veh_y)
+                if swept_dist < radius + half_width:
+                    return px, py, radius, ptype, speed_mult, swept_dist
+        elif xy_dist < POTHOLE_HIT_RADIUS:
+            if heading is None:
+                hit = xy_dist < radius + half_width  # No heading known: round footprint
+            else:
+                if angle is None:
+                    angle = heading()
+                along, across = vehicle_frame(px - veh_x, py - veh_y, angle)
+                hit = under_vehicle(along, across, radius, half_width)
+            if hit:
+                return px, py, radius, ptype, speed_mult, xy_dist
+    return None
+
+_lane_geometry = {}  # lane_id -> (shape, length, width); lanes never change during a run
+
+def lane_geometry(lane_id):
+    """Shape, length and width of a lane, fetched over TraCI once"""
+    if lane_id not in _lane_geometry:
+        _lane_geometry[lane_id] = (traci.lane.getShape(lane_id), traci.lane.getLength(lane_id),
+                                   traci.lane.getWidth(lane_id))
+    return _lane_geometry[lane_id]
+
+class SwervePolicy(Policy):
+    """Slow down for the pothole ahead, swerve laterally around it, return to lane center; XY hit detection"""
+
+    name = 'pothole_swerve_controller'
+
+    def new_state(self):
+        """Per-vehicle tracking dictionaries used by control_vehicle"""
+        return {
+            'original_speeds': {},
+            'hit_time': {},
+            'in_zone': {},
+            'slowed_for': {},
+            'swerved_for': {},
+            'swerve_time': {},
+            'original_lane': {},
+            'hit_speed': {},
+            'half_width': {},
+            'last_xy': {},      # veh_id -> (step, x, y) of the last evaluation
+        }
+
+    def resume(self, state):
+        """Re-apply the speed drops of recovering vehicles"""
+        speeds = state['hit_speed']
+        for veh_id in state['hit_time']:
+            try:
+                traci.vehicle.setSpeed(veh_id, speeds.get(veh_id) or
+                                       hit_speed(state['original_speeds'][veh_id], DEFAULT_SPEED_MULT))
+            except traci.exceptions.TraCIException:
+                pass
+        # Swerved vehicles come back at lane centre; they still return on schedule
+
+    def new_scheduler(self, step_length=0.1):
+        """
+        Wake-up scheduler: idle vehicles sleep until they could reach the hit
+        range or come within SLOWDOWN_START_DISTANCE of a pothole on their
+        route - the lookahead does nothing for potholes further away.
+        """
+        return WakeupScheduler(step_length,
+                               xy_points=[(p[0], p[1]) for p in self.potholes_xy],
+                               xy_range=POTHOLE_HIT_RADIUS,
+                               lane_potholes=self.potholes_by_lane,
+                               route_range=SLOWDOWN_START_DISTANCE)
+
+    def new_zone_subscriptions(self, step_length=0.1):
+        """Let SUMO report vehicles on pothole lanes or within hit range (plus one step of travel) of a pothole"""
+        return ZoneSubscriptions(lanes=self.potholes_by_lane,
+                                 points=[(p[0], p[1]) for p in self.potholes_xy],
+                                 radius=POTHOLE_HIT_RADIUS + SWEEP_SPEED * step_length)
+
+    def busy(self, state):
+        return state['hit_time'], state['swerve_time'], state['in_zone']
+
+    def swerve_failed(self, step, veh_id, error, state, cmd):
+        """Fallback for a rejected lateral swerve: just slow down; there is no centre to return to"""
+        cmd.slowDown(veh_id, 2.0, 1.0)
+        state['swerve_time'].pop(veh_id, None)
+        state['original_lane'].pop(veh_id, None)
+        self.log.record(step, veh_id, SWERVE_FAILED, f"lateral swerve failed ({error}), slowing to 2 m/s")
+
+    def command_failed(self, step, veh_id, var, error, state, cmd):
+        """With --batch-commands a swerve is only rejected at flush time"""
+        if var == tc.VAR_LANEPOSITION_LAT and veh_id in state['swerve_time']:
+            self.swerve_failed(step, veh_id, error, state, cmd)
+
+    def control_vehicle(self, veh_id, step, now, state, cmd, vehicle, profiler):
+        """Slowdown, swerve and hit logic for one vehicle"""
+        potholes_by_lane = self.potholes_by_lane
+        pothole_grid = self.pothole_grid
+        vehicle_original_speeds = state['original_speeds']
+        vehicle_pothole_hit_time = state['hit_time']
+        vehicle_in_pothole_zone = state['in_zone']
+        vehicle_slowed_for_pothole = state['slowed_for']
+        vehicle_swerved_for_pothole = state['swerved_for']
+        vehicle_swerve_time = state['swerve_time']
+        vehicle_original_lane = state['original_lane']
+        vehicle_hit_speed = state['hit_speed']
+        vehicle_half_width = state['half_width']
+        vehicle_last_xy = state['last_xy']
+
+        # Store original max speed
+        if veh_id not in vehicle_original_speeds:
+            vehicle_original_speeds[veh_id] = vehicle.getMaxSpeed(veh_id)
+        if veh_id not in vehicle_half_width:
+            vehicle_half_width[veh_id] = vehicle_width(veh_id, vehicle) / 2
+
+        original_max = vehicle_original_speeds[veh_id]
+        current_speed = vehicle.getSpeed(veh_id)
+        profiler.lap('getters')
+
+        # Recovery from pothole hit
+        if veh_id in vehicle_pothole_hit_time:
+            if now - vehicle_pothole_hit_time[veh_id] >= RECOVERY_TIME:
+                cmd.setSpeed(veh_id, -1)  # Resume normal
+                cmd.setMaxSpeed(veh_id, original_max)
+                del vehicle_pothole_hit_time[veh_id]
+                vehicle_hit_speed.pop(veh_id, None)
+                if veh_id in vehicle_in_pothole_zone:
+                    del vehicle_in_pothole_zone[veh_id]
+            profiler.lap('state_update')
+            return None
+
+        # Return to lane center after swerve
+        if veh_id in vehicle_swerve_time:
+            if now - vehicle_swerve_time[veh_id] >= SWERVE_RETURN_DELAY:
                 try:
-                    # Store original max speed
-                    if veh_id not in vehicle_original_speeds:
-                        vehicle_original_speeds[veh_id] = traci.vehicle.getMaxSpeed(veh_id)
-                    
-                    original_max = vehicle_original_speeds[veh_id]
-                    current_speed = traci.vehicle.getSpeed(veh_id)
-                    
-                    # Recovery from pothole hit
-                    if veh_id in vehicle_pothole_hit_time:
-                        if step - vehicle_pothole_hit_time[veh_id] >= RECOVERY_TIME:
-                            traci.vehicle.setSpeed(veh_id, -1)  # Resume normal
-                            traci.vehicle.setMaxSpeed(veh_id, original_max)
-                            del vehicle_pothole_hit_time[veh_id]
-                            if veh_id in vehicle_in_pothole_zone:
-                                del vehicle_in_pothole_zone[veh_id]
-                        continue
-                    
-                    # Return to lane center after swerve
-                    if veh_id in vehicle_swerve_time:
-                        if step - vehicle_swerve_time[veh_id] >= SWERVE_RETURN_DELAY:
-                            try:
-                                # Return to lane center (lateral position 0)
-                                traci.vehicle.setLateralLanePosition(veh_id, 0.0)
-                                traci.vehicle.setMaxSpeed(veh_id, original_max)
-                                
-                                print(f"Step {step}: Vehicle {veh_id} RETURNED to lane center")
-                                
-                                del vehicle_swerve_time[veh_id]
-                                if veh_id in vehicle_swerved_for_pothole:
-                                    del vehicle_swerved_for_pothole[veh_id]
-                                if veh_id in vehicle_slowed_for_pothole:
-                                    del vehicle_slowed_for_pothole[veh_id]
-                                if veh_id in vehicle_original_lane:
-                                    del vehicle_original_lane[veh_id]
-                            except Exception as e:
-                                print(f"Return to center failed for {veh_id}: {e}")
-                        continue
-                    
-                    # Get vehicle position
-                    edge_id = traci.vehicle.getRoadID(veh_id)
-                    if edge_id.startswith(':'):  # Skip junctions
-                        continue
-                    
-                    lane_idx = traci.vehicle.getLaneIndex(veh_id)
-                    lane_id = f"{edge_id}_{lane_idx}"
-                    lane_pos = traci.vehicle.getLanePosition(veh_id)
-                    veh_x, veh_y = traci.vehicle.getPosition(veh_id)
-                    
-                    # Check for potholes ahead on current lane
-                    if lane_id in potholes_by_lane:
-                        pothole_ahead = None
-                        pothole_distance = float('inf')
-                        
-                        for pothole_pos, speed_mult, ptype, px, py in potholes_by_lane[lane_id]:
-                            distance = pothole_pos - lane_pos
-                            
-                            if 0 < distance < POTHOLE_DETECTION_DISTANCE:
-                                if distance < pothole_distance:
-                                    pothole_ahead = (pothole_pos, speed_mult, ptype, px, py)
-                                    pothole_distance = distance
-                        
-                        # STEP 1: Slowdown when approaching
-                        if pothole_ahead and pothole_distance < SLOWDOWN_START_DISTANCE:
-                            pothole_pos, speed_mult, ptype, px, py = pothole_ahead
-                            
-                            if veh_id not in vehicle_slowed_for_pothole or vehicle_slowed_for_pothole[veh_id] != (px, py):
-                                if current_speed > SLOWDOWN_SPEED:
-                                    traci.vehicle.slowDown(veh_id, SLOWDOWN_SPEED, 1.0)
-                                    print(f"Step {step}: Vehicle {veh_id} SLOWING DOWN to {SLOWDOWN_SPEED} m/s - pothole at {pothole_distance:.1f}m")
-                                vehicle_slowed_for_pothole[veh_id] = (px, py)
-                        
-                        # STEP 2: Swerve laterally
-                        if pothole_ahead and MIN_SWERVE_DISTANCE < pothole_distance < SWERVE_START_DISTANCE:
-                            pothole_pos, speed_mult, ptype, px, py = pothole_ahead
-                            
-                            if veh_id not in vehicle_swerved_for_pothole or vehicle_swerved_for_pothole[veh_id] != (px, py):
+                    # Return to lane center (lateral position 0)
+                    cmd.setLateralLanePosition(veh_id, 0.0)
+                    cmd.setMaxSpeed(veh_id, original_max)
+
+                    self.log.record(step, veh_id, RETURN, "RETURNED to lane center")
+
+                    del vehicle_swerve_time[veh_id]
+                    if veh_id in vehicle_swerved_for_pothole:
+                        del vehicle_swerved_for_pothole[veh_id]
+                    if veh_id in vehicle_slowed_for_pothole:
+                        del vehicle_slowed_for_pothole[veh_id]
+                    if veh_id in vehicle_original_lane:
+                        del vehicle_original_lane[veh_id]
+                except Exception as e:
+                    print(f"Return to center failed for {veh_id}: {e}")
+            profiler.lap('state_update')
+            return None
+
+        # Get vehicle position
+        edge_id = vehicle.getRoadID(veh_id)
+        if edge_id.startswith(':'):  # Skip junctions
+            profiler.lap('getters')
+            return None
+
+        lane_idx = vehicle.getLaneIndex(veh_id)
+        lane_id = f"{edge_id}_{lane_idx}"
+        lane_pos = vehicle.getLanePosition(veh_id)
+        veh_x, veh_y = vehicle.getPosition(veh_id)
+        last = vehicle_last_xy.get(veh_id)
+        prev_xy = last[1:] if last and last[0] == step - 1 else None  # Not after sleeping or recovering
+        vehicle_last_xy[veh_id] = (step, veh_x, veh_y)
+        profiler.lap('getters')
+
+        # Check for potholes ahead on current lane
+        pothole_ahead, pothole_distance = None, float('inf')
+        if lane_id in potholes_by_lane:
+            pothole_ahead, pothole_distance = find_pothole_ahead(potholes_by_lane, lane_id, lane_pos)
+
+            # STEP 1: Slowdown when approaching
+            if pothole_ahead and pothole_distance < SLOWDOWN_START_DISTANCE:
+                pothole_pos, speed_mult, ptype, px, py = pothole_ahead[:5]
+
+                if veh_id not in vehicle_slowed_for_pothole or vehicle_slowed_for_pothole[veh_id] != (px, py):
+                    if current_speed > SLOWDOWN_SPEED:
+                        cmd.slowDown(veh_id, SLOWDOWN_SPEED, 1.0)
+                        self.log.record(step, veh_id, SLOW, f"SLOWING DOWN to {SLOWDOWN_SPEED} m/s - pothole at {pothole_distance:.1f}m")
+                    vehicle_slowed_for_pothole[veh_id] = (px, py)
+
+            # STEP 2: Swerve laterally
+            if pothole_ahead and MIN_SWERVE_DISTANCE < pothole_distance < SWERVE_START_DISTANCE:
+                pothole_pos, speed_mult, ptype, px, py = pothole_ahead[:5]
+
+                if veh_id not in vehicle_swerved_for_pothole or vehicle_swerved_for_pothole[veh_id] != (px, py):
+                    try:
+                        lane_shape, lane_length, lane_width = lane_geometry(lane_id)
+
+                        if lane_length > 0 and len(lane_shape) >= 2:
+                            # Calculate current position on lane
+                            pos_ratio = min(lane_pos / lane_length, 1.0)
+                            x1, y1 = lane_shape[0]
+                            x2, y2 = lane_shape[-1]
+                            center_x = x1 + (x2 - x1) * pos_ratio
+                            center_y = y1 + (y2 - y1) * pos_ratio
+
+                            # Calculate perpendicular vector
+                            dx = x2 - x1
+                            dy = y2 - y1
+                            length = math.sqrt(dx*dx + dy*dy)
+
+                            if length > 0:
+                                # Normalize and get perpendicular
+                                dx_norm = dx / length
+                                dy_norm = dy / length
+                                perp_x = -dy_norm
+                                perp_y = dx_norm
+
+                                # Determine swerve direction - check which side is safer
+                                # Check both swerve directions for other potholes
+                                # We need to check the entire swerved path, not just target point
+                                left_safe = True
+                                right_safe = True
+
+                                # Check multiple points along the swerved path
+                                test_distances = [0, 20, 40, 60, 80]  # Check at 0m, 20m, 40m, 60m, 80m ahead
+                                SAFETY_MARGIN = 4.0  # Need 4m clearance from any pothole
+
+                                for test_dist in test_distances:
+                                    # Calculate test position ahead
+                                    test_ratio = min((lane_pos + test_dist) / lane_length, 1.0) if lane_length > 0 else 0
+                                    test_cx = x1 + (x2 - x1) * test_ratio
+                                    test_cy = y1 + (y2 - y1) * test_ratio
+
+                                    test_left_x = test_cx + perp_x * SWERVE_OFFSET
+                                    test_left_y = test_cy + perp_y * SWERVE_OFFSET
+                                    test_right_x = test_cx - perp_x * SWERVE_OFFSET
+                                    test_right_y = test_cy - perp_y * SWERVE_OFFSET
+
+                                    # Check potholes near swerve path
+                                    for test_px, test_py, test_radius, test_ptype, test_mult in pothole_grid.near(
+                                            test_cx, test_cy, SWERVE_OFFSET + SAFETY_MARGIN):
+                                        left_dist = math.sqrt((test_left_x - test_px)**2 + (test_left_y - test_py)**2)
+                                        right_dist = math.sqrt((test_right_x - test_px)**2 + (test_right_y - test_py)**2)
+
+                                        if left_dist < SAFETY_MARGIN:
+                                            left_safe = False
+                                        if right_dist < SAFETY_MARGIN:
+                                            right_safe = False
+
+                                # Choose safer direction
+                                if not left_safe and not right_safe:
+                                    # Both sides blocked - STOP HARD instead of swerving into another pothole
+                                    cmd.slowDown(veh_id, 1.0, 2.0)
+                                    self.log.record(step, veh_id, BLOCKED, f"BLOCKED - both sides have potholes within {SAFETY_MARGIN}m, hard brake at {pothole_distance:.1f}m")
+                                    profiler.lap('swerve_geometry')
+                                    return None
+                                elif right_safe and not left_safe:
+                                    swerve_dir = -SWERVE_OFFSET  # Right is safer
+                                elif left_safe and not right_safe:
+                                    swerve_dir = SWERVE_OFFSET  # Left is safer
+                                elif lane_idx > 0 or lane_width > 4.0:
+                                    swerve_dir = -SWERVE_OFFSET  # Both safe, prefer right
+                                else:
+                                    swerve_dir = SWERVE_OFFSET  # Both safe, default left
+
+                                # Apply swerve using lateral lane position (MUCH simpler and works!)
+                                # Positive = left, Negative = right from lane center
+                                lateral_offset = swerve_dir  # 4.0m or -4.0m
+
+                                vehicle_swerved_for_pothole[veh_id] = (px, py)  # One attempt per pothole
                                 try:
-                                    lane_shape = traci.lane.getShape(lane_id)
-                                    lane_length = traci.lane.getLength(lane_id)
-                                    lane_width = traci.lane.getWidth(lane_id)
-                                    
-                                    if lane_length > 0 and len(lane_shape) >= 2:
-                                        # Calculate current position on lane
-                                        pos_ratio = min(lane_pos / lane_length, 1.0)
-                                        x1, y1 = lane_shape[0]
-                                        x2, y2 = lane_shape[-1]
-                                        center_x = x1 + (x2 - x1) * pos_ratio
-                                        center_y = y1 + (y2 - y1) * pos_ratio
-                                        
-                                        # Calculate perpendicular vector
-                                        dx = x2 - x1
-                                        dy = y2 - y1
-                                        length = math.sqrt(dx*dx + dy*dy)
-                                        
-                                        if length > 0:
-                                            # Normalize and get perpendicular
-                                            dx_norm = dx / length
-                                            dy_norm = dy / length
-                                            perp_x = -dy_norm
-                                            perp_y = dx_norm
-                                            
-                                            # Determine swerve direction - check which side is safer
-                                            num_lanes = traci.edge.getLaneNumber(edge_id)
-                                            
-                                            # Check both swerve directions for other potholes
-                                            # We need to check the entire swerved path, not just target point
-                                            left_safe = True
-                                            right_safe = True
-                                            
-                                            # Check multiple points along the swerved path
-                                            test_distances = [0, 20, 40, 60, 80]  # Check at 0m, 20m, 40m, 60m, 80m ahead
-                                            SAFETY_MARGIN = 4.0  # Need 4m clearance from any pothole
-                                            
-                                            for test_dist in test_distances:
-                                                # Calculate test position ahead
-                                                test_ratio = min((lane_pos + test_dist) / lane_length, 1.0) if lane_length > 0 else 0
-                                                test_cx = x1 + (x2 - x1) * test_ratio
-                                                test_cy = y1 + (y2 - y1) * test_ratio
-                                                
-                                                test_left_x = test_cx + perp_x * SWERVE_OFFSET
-                                                test_left_y = test_cy + perp_y * SWERVE_OFFSET
-                                                test_right_x = test_cx - perp_x * SWERVE_OFFSET
-                                                test_right_y = test_cy - perp_y * SWERVE_OFFSET
-                                                
-                                                # Check potholes near swerve path
-                                                for test_px, test_py, test_radius, test_ptype in potholes_xy:
-                                                    left_dist = math.sqrt((test_left_x - test_px)**2 + (test_left_y - test_py)**2)
-                                                    right_dist = math.sqrt((test_right_x - test_px)**2 + (test_right_y - test_py)**2)
-                                                    
-                                                    if left_dist < SAFETY_MARGIN:
-                                                        left_safe = False
-                                                    if right_dist < SAFETY_MARGIN:
-                                                        right_safe = False
-                                            
-                                            # Choose safer direction
-                                            if not left_safe and not right_safe:
-                                                # Both sides blocked - STOP HARD instead of swerving into another pothole
-                                                traci.vehicle.slowDown(veh_id, 1.0, 2.0)
-                                                print(f"Step {step}: Vehicle {veh_id} BLOCKED - both sides have potholes within {SAFETY_MARGIN}m, hard brake at {pothole_distance:.1f}m")
-                                                continue
-                                            elif right_safe and not left_safe:
-                                                swerve_dir = -SWERVE_OFFSET  # Right is safer
-                                            elif left_safe and not right_safe:
-                                                swerve_dir = SWERVE_OFFSET  # Left is safer
-                                            elif lane_idx > 0 or lane_width > 4.0:
-                                                swerve_dir = -SWERVE_OFFSET  # Both safe, prefer right
-                                            else:
-                                                swerve_dir = SWERVE_OFFSET  # Both safe, default left
-                                            
-                                            # Apply swerve using lateral lane position (MUCH simpler and works!)
-                                            # Positive = left, Negative = right from lane center
-                                            lateral_offset = swerve_dir  # 4.0m or -4.0m
-                                            
-                                            try:
-                                                traci.vehicle.setLateralLanePosition(veh_id, lateral_offset)
-                                                
-                                                # Verify it worked
-                                                actual_lateral = traci.vehicle.getLateralLanePosition(veh_id)
-                                                
-                                                print(f"Step {step}: Vehicle {veh_id} SWERVED {abs(lateral_offset):.1f}m {'RIGHT' if lateral_offset < 0 else 'LEFT'} - lateral position: {actual_lateral:.2f}m from center")
-                                            except traci.exceptions.TraCIException as e:
-                                                # Fallback: just slow down if lateral movement fails
-                                                traci.vehicle.slowDown(veh_id, 2.0, 1.0)
-                                                print(f"Step {step}: Vehicle {veh_id} lateral swerve failed ({e}), slowing to 2 m/s")
-                                            
-                                            vehicle_swerved_for_pothole[veh_id] = (px, py)
-                                            vehicle_swerve_time[veh_id] = step
-                                            vehicle_original_lane[veh_id] = lane_idx
-                                
-                                except Exception as e:
-                                    print(f"Swerve failed for {veh_id}: {e}")
-                    
-                    # Check for pothole HITS using XY distance
-                    for px, py, radius, ptype in potholes_xy:
-                        xy_dist = math.sqrt((veh_x - px)**2 + (veh_y - py)**2)
-                        
-                        if xy_dist < POTHOLE_HIT_RADIUS:
-                            if veh_id not in vehicle_in_pothole_zone:
-                                # HIT!
-                                target_speed = max(0.5, original_max * 0.01)
-                                traci.vehicle.setSpeed(veh_id, target_speed)
-                                vehicle_pothole_hit_time[veh_id] = step
-                                vehicle_in_pothole_zone[veh_id] = (px, py)
-                                print(f"Step {step}: Vehicle {veh_id} HIT {ptype} pothole at XY dist {xy_dist:.1f}m - speed drop {current_speed:.1f} -> {target_speed:.1f} m/s")
-                            break
-                    
-                    # Clear zone if left
-                    if veh_id in vehicle_in_pothole_zone and veh_id not in vehicle_pothole_hit_time:
-                        px, py = vehicle_in_pothole_zone[veh_id]
-                        xy_dist = math.sqrt((veh_x - px)**2 + (veh_y - py)**2)
-                        if xy_dist >= POTHOLE_HIT_RADIUS:
-                            del vehicle_in_pothole_zone[veh_id]
-                
-                except traci.exceptions.TraCIException:
-                    # Vehicle left simulation
-                    for d in [vehicle_in_pothole_zone, vehicle_pothole_hit_time, vehicle_original_speeds,
-                             vehicle_slowed_for_pothole, vehicle_swerved_for_pothole, vehicle_swerve_time]:
-                        if veh_id in d:
-                            del d[veh_id]
-                    continue
-    
-    except KeyboardInterrupt:
-        print("\nSimulation interrupted by user")
-    finally:
-        traci.close()
+                                    cmd.setLateralLanePosition(veh_id, lateral_offset)
+
+                                    self.log.record(step, veh_id, SWERVE, f"SWERVED {abs(lateral_offset):.1f}m {'RIGHT' if lateral_offset < 0 else 'LEFT'} - target lateral position: {lateral_offset:.2f}m from center")
+                                    vehicle_swerve_time[veh_id] = now
+                                    vehicle_original_lane[veh_id] = lane_idx
+                                except traci.exceptions.TraCIException as e:
+                                    self.swerve_failed(step, veh_id, e, state, cmd)
+
+                    except Exception as e:
+                        print(f"Swerve failed for {veh_id}: {e}")
+
+        profiler.lap('swerve_geometry')
+
+        # Check for pothole HITS using XY distance
+        hit = find_pothole_hit(pothole_grid, veh_x, veh_y, vehicle_half_width[veh_id],
+                               lambda: vehicle.getAngle(veh_id), prev_xy)
+        if hit is not None and veh_id not in vehicle_in_pothole_zone:
+            # HIT!
+            px, py, radius, ptype, speed_mult, xy_dist = hit
+            target_speed = hit_speed(original_max, speed_mult)
+            cmd.setSpeed(veh_id, target_speed)
+            vehicle_pothole_hit_time[veh_id] = now
+            vehicle_hit_speed[veh_id] = target_speed
+            vehicle_in_pothole_zone[veh_id] = (px, py)
+            self.log.record(step, veh_id, HIT, f"HIT {ptype} pothole at XY dist {xy_dist:.1f}m ({px:.1f}, {py:.1f}) - speed drop {current_speed:.1f} -> {target_speed:.1f} m/s")
+
+        # Clear zone if left
+        if veh_id in vehicle_in_pothole_zone and veh_id not in vehicle_pothole_hit_time:
+            px, py = vehicle_in_pothole_zone[veh_id]
+            xy_dist = math.sqrt((veh_x - px)**2 + (veh_y - py)**2)
+            if xy_dist >= POTHOLE_HIT_RADIUS:
+                del vehicle_in_pothole_zone[veh_id]
+        profiler.lap('hit_scan')
+
+        # Idle: sleep until the vehicle could reach the lookahead or hit range
+        # (a pothole already close enough to slow for keeps it awake without asking the scheduler)
+        if (veh_id not in vehicle_in_pothole_zone and veh_id not in vehicle_swerve_time and
+                pothole_distance >= SLOWDOWN_START_DISTANCE):
+            return veh_x, veh_y, original_max, edge_id, lane_pos
+        return None
+
+def run_simulation(sumo_config, profiler=None, adaptive=False, subscriptions=False, batch=False,
+                   checkpoints=None, resume=None, obstacles_file=None, potholes=None, sumo_cmd=None,
+                   rerouting=None, events=None, step_length=None):
+    """Run SUMO simulation with pothole swerve avoidance"""
+    return run_policy(SwervePolicy, sumo_config, obstacles_file, profiler=profiler, adaptive=adaptive,
+                      subscriptions=subscriptions, batch=batch, checkpoints=checkpoints, resume=resume,
+                      potholes=potholes, sumo_cmd=sumo_cmd, rerouting=rerouting, events=events,
+                      step_length=step_length)
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
-    parser.add_argument('--config', default='mymap.sumocfg', help='SUMO config file')
+    mode = add_controller_arguments(parser)
+    mode.add_argument('--num-clients', type=int, default=0,
+                      help='Shard control over N processes connected to one SUMO (sharded_control.py, always batched; '
+                           'only --config, --obstacles and --step-length apply)')
     args = parser.parse_args()
-    
-    run_simulation(args.config)
+
+    if args.num_clients > 1:
+        from sharded_control import run_sharded, check_sharded_args
+        check_sharded_args(parser, args)
+        run_sharded(args.config, args.num_clients, step_length=args.step_length, obstacles_file=args.obstacles)
+    else:
+        run_from_args(SwervePolicy, args)
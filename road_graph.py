@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Road Graph Connectivity
+=======================
+Trip endpoints used to be drawn from every suitable edge, and duarouter
+(--ignore-errors --repair) silently dropped the pairs it could not connect:
+dead-end slip roads, one-way pockets, edges cut off by junction joining.
+How many routes came out varied from seed to seed, and time was spent
+searching for routes that do not exist.
+
+connected_edges() computes the strongly connected components of the edge
+graph for one vehicle class ONCE (iterative Tarjan, no recursion limit on
+city-scale networks) and returns the largest one. Any two edges in it are
+reachable from each other, so every trip sampled inside it is routable.
+
+Usage:
+    connected = connected_edges(net_file)                   # passenger edges
+    endpoints = [e for e in candidate_edges if e in connected]
+    python3 road_graph.py mymap.net.xml                     # component sizes
+"""
+
+import os
+import sys
+
+# Add SUMO tools to path
+if 'SUMO_HOME' in os.environ:
+    tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
+    sys.path.append(tools)
+
+import sumolib
+
+VCLASS = "passenger"     # Every generated vType routes as passenger
+
+
+def edge_graph(net, vclass=VCLASS):
+    """{edge_id: [successor edge_ids]} over the edges and connections vclass may use"""
+    graph = {}
+    for edge in net.getEdges():
+        if edge.getFunction() == 'internal' or not edge.allows(vclass):
+            continue
+        successors = []
+        for to_edge, connections in edge.getOutgoing().items():
+            if to_edge.allows(vclass) and any(c.getFromLane().allows(vclass) and c.getToLane().allows(vclass)
+                                              for c in connections):
+                successors.append(to_edge.getID())
+        graph[edge.getID()] = successors
+    return graph
+
+
+def strongly_connected_components(graph):
+    """Tarjan's algorithm, iterative; returns a list of sets of nodes"""
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+
+    for start in graph:
+        if start in index:
+            continue
+        work = [(start, iter(graph[start]))]
+        index[start] = lowlink[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack.add(start)
+
+        while work:
+            node, successors = work[-1]
+            for succ in successors:
+                if succ not in graph:
+                    continue
+                if succ not in index:
+                    index[succ] = lowlink[succ] = counter
+                    counter += 1
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(graph[succ])))
+                    break
+                if succ in on_stack:
+                    lowlink[node] = min(lowlink[node], index[succ])
+            else:
+                # All successors done: close the component rooted here, hand lowlink to the parent
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = set()
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.add(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+def connected_edges(net_file, vclass=VCLASS):
+    """Edge IDs of the largest strongly connected component for vclass"""
+    net = sumolib.net.readNet(net_file)
+    graph = edge_graph(net, vclass)
+    components = strongly_connected_components(graph)
+    largest = max(components, key=len) if components else set()
+    print(f"Road graph: {len(graph)} {vclass} edges, {len(components)} strongly connected components, "
+          f"largest has {len(largest)} edges")
+    return largest
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Strongly connected components of a SUMO network")
+    parser.add_argument('net', nargs='?', default='mymap.net.xml', help='SUMO network')
+    parser.add_argument('--vclass', default=VCLASS, help='Vehicle class whose permissions apply')
+    args = parser.parse_args()
+
+    net = sumolib.net.readNet(args.net)
+    components = sorted(strongly_connected_components(edge_graph(net, args.vclass)), key=len, reverse=True)
+    print(f"{len(components)} components")
+    for component in components[:10]:
+        print(f"{len(component):>7} edges  e.g. {sorted(component)[0]}")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Scenario Seed
+=============
+One seed for everything random in a generated scenario, so the same seed
+gives byte-identical inputs (and benchmark differences come from the code,
+not from a different workload):
+
+    pothole placement and sizes    seeded_rng(seed, 'potholes')
+    trip / flow endpoints          seeded_rng(seed, 'trips')
+    duarouter                      --seed (randomized flows, random weight factor)
+    SUMO                           <seed> in the sumocfg
+
+Each consumer gets its own random stream, so e.g. changing the pothole
+count does not shuffle the trip endpoints.
+
+SUMO tools stamp the generation time into the header of every file they
+write; strip_generation_date() removes it so the files compare equal.
+
+The seed comes from $SCENARIO_SEED, default 42:
+    SCENARIO_SEED=7 python3 indian_road_simulator.py
+"""
+
+import os
+import re
+import random
+
+DEFAULT_SEED = 42
+
+GENERATED_ON_RE = re.compile(r'<!-- generated on .*? by ')
+
+
+def scenario_seed():
+    """Seed from $SCENARIO_SEED, else DEFAULT_SEED"""
+    return int(os.environ.get('SCENARIO_SEED', DEFAULT_SEED))
+
+
+def seeded_rng(seed, purpose):
+    """Independent random stream for one generation step"""
+    return random.Random(f"{seed}-{purpose}")
+
+
+def strip_generation_date(path):
+    """Drop the timestamp from the header comment of a SUMO-written file"""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    stripped = GENERATED_ON_RE.sub('<!-- generated by ', text, count=1)
+    if stripped != text:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(stripped)
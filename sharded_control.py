@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Multi-Client Sharded Control
+============================
+Runs the swerve controller in N worker processes against ONE SUMO instance
+started with --num-clients N. The network is cut into N strips along its
+longer axis (balanced by road length, a proxy for traffic); every worker
+owns the edges of one strip plus the potholes on and near them, and only
+controls the vehicles driving on its edges.
+
+How the work is spread:
+- SUMO serves the clients one after another within a step, so any blocking
+  getter would make a shard wait for all shards before it. Workers therefore
+  never call getters while controlling: the first client subscribes every
+  departing vehicle, SUMO sends those subscription results to ALL clients
+  with the simulationStep() reply, and each shard reads its vehicles from
+  them (control_step(..., view=...)). On its departure step a vehicle's
+  results have only reached the first client, so the other shards read
+  that vehicle with getters once.
+- Set-commands are batched (traci_batch.py) and sent together with the next
+  simulationStep(), so each shard talks to SUMO once per step.
+
+Vehicle ownership:
+- an idle vehicle belongs to the shard owning the edge it is on
+- a busy vehicle (hit recovery, swerved, inside a pothole zone) stays with
+  the shard that started the manoeuvre, even after it crosses into another
+  strip. The owner writes its name to the vehicle parameter "pothole.shard"
+  (part of the subscription, so every shard sees it) and clears it again
+  once the manoeuvre is over.
+
+Usage:
+    python3 pothole_swerve_controller.py --num-clients 8
+    python3 sharded_control.py --config mymap.sumocfg --num-clients 8 --sumo sumo
+"""
+
+import os
+import sys
+import time
+import subprocess
+import multiprocessing
+
+# Add SUMO tools to path
+if 'SUMO_HOME' in os.environ:
+    tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
+    sys.path.append(tools)
+
+import traci
+import traci.constants as tc
+import sumolib
+
+import pothole_swerve_controller as swerve
+from controller_core import control_step, flush_commands
+from traci_batch import CommandBuffer
+from sim_clock import add_step_length_arguments, step_length_options, COARSE_STEP_LENGTH
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+MAX_SPEED_FACTOR = 2.0            # Upper bound of SUMO's default speedFactor distribution
+OWNER_PARAM = "pothole.shard"     # Vehicle parameter naming the shard a busy vehicle belongs to
+SUMO_BINARY = "sumo"              # Headless: sharding is for batch runs on multi-core nodes
+
+# Controller options a sharded run honours (it always batches commands)
+SHARDED_OPTIONS = {'config', 'num_clients', 'obstacles', 'step_length', 'batch_commands'}
+
+# Everything control_step reads about a vehicle, plus the owner parameter
+VEHICLE_VARS = [tc.VAR_SPEED, tc.VAR_MAXSPEED, tc.VAR_ROAD_ID, tc.VAR_LANE_INDEX,
+                tc.VAR_LANEPOSITION, tc.VAR_POSITION, tc.VAR_ANGLE, tc.VAR_LANEPOSITION_LAT,
+                tc.VAR_WIDTH, tc.VAR_PARAMETER]
+
+
+# ============================================================================
+# PARTITIONING
+# ============================================================================
+
+def edge_extents(net):
+    """{edge_id: (min_x, max_x, min_y, max_y, length, lane_ids)} for every edge, junction internals included"""
+    extents = {}
+    for edge in net.getEdges(withInternal=True):
+        points = [point for lane in edge.getLanes() for point in lane.getShape()]
+        if not points:
+            continue
+        xs = [x for x, y in points]
+        ys = [y for x, y in points]
+        lanes = [lane.getID() for lane in edge.getLanes()]
+        extents[edge.getID()] = (min(xs), max(xs), min(ys), max(ys), edge.getLength(), lanes)
+    return extents
+
+
+def shard_halo(net, step_length=None):
+    """
+    How far beyond its strip a shard must see potholes and lanes (m): the
+    swerve lookahead plus one step of the fastest vehicle, so a vehicle on
+    the strip's last edge detects and hits exactly what a single controller
+    would. Without a step length the coarsest supported one is assumed.
+    """
+    max_speed = max((edge.getSpeed() for edge in net.getEdges()), default=0.0) * MAX_SPEED_FACTOR
+    return swerve.POTHOLE_DETECTION_DISTANCE + max_speed * (step_length or COARSE_STEP_LENGTH)
+
+
+def partition(net_file, potholes_by_lane, potholes_xy, num_shards, step_length=None):
+    """
+    Cut the network into num_shards strips with about the same road length each.
+    Whole edges are assigned, so lane changes never cross a shard boundary.
+    Returns one dict per shard: owned edges plus the potholes its vehicles can reach.
+    """
+    net = sumolib.net.readNet(net_file, withInternal=True)
+    extents = edge_extents(net)
+    halo = shard_halo(net, step_length)
+    (xmin, ymin), (xmax, ymax) = net.getBBoxXY()
+    axis = 0 if xmax - xmin >= ymax - ymin else 1   # Cut along the longer side
+
+    def span(edge_id):
+        e = extents[edge_id]
+        return (e[0], e[1]) if axis == 0 else (e[2], e[3])
+
+    edges = sorted(extents, key=lambda edge_id: sum(span(edge_id)))
+    total_length = sum(e[4] for e in extents.values()) or 1.0
+
+    shards = [{'index': i, 'edges': []} for i in range(num_shards)]
+    done = 0.0
+    for edge_id in edges:
+        index = min(int(done / total_length * num_shards), num_shards - 1)
+        shards[index]['edges'].append(edge_id)
+        done += extents[edge_id][4]
+
+    for shard in shards:
+        if shard['edges']:
+            lo = min(span(edge_id)[0] for edge_id in shard['edges']) - halo
+            hi = max(span(edge_id)[1] for edge_id in shard['edges']) + halo
+        else:
+            lo = hi = 0.0
+        shard['range'] = (lo, hi)
+
+        reachable = set()
+        for edge_id, e in extents.items():
+            if span(edge_id)[0] <= hi and span(edge_id)[1] >= lo:
+                reachable.update(e[5])
+        shard['potholes_by_lane'] = {lane_id: entries for lane_id, entries in potholes_by_lane.items()
+                                     if lane_id in reachable}
+        shard['potholes_xy'] = [p for p in potholes_xy if lo <= p[axis] <= hi]
+    return shards
+
+
+# ============================================================================
+# VEHICLE OWNERSHIP
+# ============================================================================
+
+class ShardVehicles:
+    """
+    One shard's vehicles and their subscribed values. Serves control_step as
+    both zones= (which vehicles) and view= (traci.vehicle compatible getters).
+    """
+
+    def __init__(self, name, edges, commands, subscriber=False):
+        self.name = name
+        self.edges = set(edges)
+        self.commands = commands
+        self.subscriber = subscriber   # This client subscribes every departing vehicle
+        self.values = {}               # veh_id -> {var: value}, all subscribed vehicles
+        self.departed = set()          # Departed this step, subscribed by another client (no values yet)
+        self.owned = set()             # Vehicles controlled this step
+        self.claimed = set()           # Busy vehicles carrying my name
+        self.controlled = set()        # Every vehicle this shard ever controlled
+
+        traci.simulation.subscribe([tc.VAR_DEPARTED_VEHICLES_IDS])
+        if subscriber:
+            self._subscribe(traci.vehicle.getIDList())   # Already running when we connected
+
+    def _subscribe(self, veh_ids):
+        for veh_id in veh_ids:
+            traci.vehicle.subscribe(veh_id, VEHICLE_VARS, parameters={tc.VAR_PARAMETER: OWNER_PARAM})
+
+    def refresh(self):
+        """Pick up this step's subscription results (call right after simulationStep())"""
+        departed = traci.simulation.getSubscriptionResults()[tc.VAR_DEPARTED_VEHICLES_IDS]
+        if self.subscriber:
+            self._subscribe(departed)
+        self.values = traci.vehicle.getAllSubscriptionResults()
+        self.departed = {veh_id for veh_id in departed if veh_id not in self.values}
+
+    def vehicles(self, busy=()):
+        """My busy vehicles first, then the idle vehicles on my edges"""
+        ids = {}
+        for tracked in busy:
+            ids.update(dict.fromkeys(veh_id for veh_id in tracked if veh_id in self.values))
+        for veh_id, values in self.values.items():
+            owner = values[tc.VAR_PARAMETER]
+            if owner == self.name or (owner == '' and values[tc.VAR_ROAD_ID] in self.edges):
+                ids[veh_id] = None
+        # Their subscription results arrive with the next step: read them directly, like a single client would
+        for veh_id in self.departed:
+            if traci.vehicle.getRoadID(veh_id) in self.edges:
+                ids[veh_id] = None
+        self.owned = set(ids)
+        self.controlled.update(ids)
+        return list(ids)
+
+    def update_claims(self, state):
+        """Mark newly busy vehicles as mine, release finished ones, forget vehicles that are not mine any more"""
+        busy = set(state['hit_time']) | set(state['swerve_time']) | set(state['in_zone'])
+        for veh_id in busy - self.claimed:
+            self.commands.setParameter(veh_id, OWNER_PARAM, self.name)
+        for veh_id in self.claimed - busy:
+            if veh_id in self.values:
+                self.commands.setParameter(veh_id, OWNER_PARAM, '')
+        self.claimed = busy
+
+        # Arrived, or idle and handed to the shard of the edge it drove onto
+        for d in state.values():
+            for veh_id in [v for v in d if (v not in self.values and v not in self.departed) or
+                           (v not in busy and v not in self.owned)]:
+                del d[veh_id]
+                self.commands.forget(veh_id)
+
+    # ------------------------------------------------------------------
+    # traci.vehicle compatible getters (subscribed values, TraCI fallback)
+    # ------------------------------------------------------------------
+
+    def _get(self, veh_id, var, getter):
+        values = self.values.get(veh_id)
+        if values is None:
+            return getter(veh_id)
+        return values[var]
+
+    def getSpeed(self, veh_id):
+        return self._get(veh_id, tc.VAR_SPEED, traci.vehicle.getSpeed)
+
+    def getMaxSpeed(self, veh_id):
+        return self._get(veh_id, tc.VAR_MAXSPEED, traci.vehicle.getMaxSpeed)
+
+    def getRoadID(self, veh_id):
+        return self._get(veh_id, tc.VAR_ROAD_ID, traci.vehicle.getRoadID)
+
+    def getLaneIndex(self, veh_id):
+        return self._get(veh_id, tc.VAR_LANE_INDEX, traci.vehicle.getLaneIndex)
+
+    def getLanePosition(self, veh_id):
+        return self._get(veh_id, tc.VAR_LANEPOSITION, traci.vehicle.getLanePosition)
+
+    def getPosition(self, veh_id):
+        return self._get(veh_id, tc.VAR_POSITION, traci.vehicle.getPosition)
+
+    def getAngle(self, veh_id):
+        return self._get(veh_id, tc.VAR_ANGLE, traci.vehicle.getAngle)
+
+    def getLateralLanePosition(self, veh_id):
+        return self._get(veh_id, tc.VAR_LANEPOSITION_LAT, traci.vehicle.getLateralLanePosition)
+
+    def getWidth(self, veh_id):
+        return self._get(veh_id, tc.VAR_WIDTH, traci.vehicle.getWidth)
+
+
+# ============================================================================
+# WORKERS
+# ============================================================================
+
+def run_shard(shard, port):
+    """Worker process: connect as client shard['index'] + 1 and control my strip"""
+    index = shard['index']
+    name = f"shard{index}"
+    traci.init(port, label=name)
+    traci.setOrder(index + 1)
+
+    # Swerve geometry is only needed on pothole lanes; fetch it before the clock starts
+    for lane_id in shard['potholes_by_lane']:
+        swerve.lane_geometry(lane_id)
+
+    commands = CommandBuffer()
+    shard_vehicles = ShardVehicles(name, shard['edges'], commands, subscriber=(index == 0))
+    policy = swerve.SwervePolicy(shard['potholes_by_lane'], shard['potholes_xy'])
+    state = policy.new_state()
+    print(f"[{name}] {len(shard['edges'])} edges, {len(shard['potholes_xy'])} potholes, "
+          f"range {shard['range'][0]:.0f}..{shard['range'][1]:.0f}m")
+
+    step = 0
+    busy_time = 0.0
+    try:
+        while traci.simulation.getMinExpectedNumber() > 0:
+            flush_commands(policy, step, state, commands)
+            traci.simulationStep()
+            step += 1
+
+            start = time.perf_counter()
+            shard_vehicles.refresh()
+            control_step(policy, step, state, zones=shard_vehicles, commands=commands, view=shard_vehicles)
+            shard_vehicles.update_claims(state)
+            busy_time += time.perf_counter() - start
+    except traci.exceptions.FatalTraCIError as e:
+        print(f"[{name}] connection closed: {e}")
+    finally:
+        traci.close()
+
+    print(f"[{name}] {step} steps, {len(shard_vehicles.controlled)} vehicles controlled, "
+          f"control time {busy_time:.1f}s")
+    print(f"[{name}] {commands.summary()}")
+
+
+def run_sharded(sumo_config, num_clients, sumo_binary=SUMO_BINARY, step_length=None, obstacles_file=None):
+    """Start SUMO with --num-clients and one controller process per shard"""
+    obstacles_file = obstacles_file or sumo_config.replace('.sumocfg', '.obstacles.xml')
+    net_file = sumo_config.replace('.sumocfg', '.net.xml')
+    potholes_by_lane, potholes_xy = swerve.load_potholes(obstacles_file, net_file)
+    shards = partition(net_file, potholes_by_lane, potholes_xy, num_clients, step_length)
+
+    port = sumolib.miscutils.getFreeSocketPort()
+    sumo = subprocess.Popen([sumo_binary, "-c", sumo_config,
+                             "--remote-port", str(port), "--num-clients", str(num_clients)]
+                            + step_length_options(step_length))
+    print(f"SUMO listening on port {port} for {num_clients} controller processes")
+
+    workers = [multiprocessing.Process(target=run_shard, args=(shard, port), name=f"shard{shard['index']}")
+               for shard in shards]
+    try:
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        print("\nSimulation interrupted by user")
+        for worker in workers:
+            worker.terminate()
+    finally:
+        sumo.wait()
+
+
+def check_sharded_args(parser, args):
+    """parser.error() for controller options a sharded run would otherwise silently drop"""
+    dropped = [f"--{dest.replace('_', '-')}" for dest, value in vars(args).items()
+               if dest not in SHARDED_OPTIONS and value != parser.get_default(dest)]
+    if dropped:
+        parser.error(f"--num-clients does not support {', '.join(dropped)}")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Swerve controller sharded over several TraCI clients")
+    parser.add_argument('--config', default='mymap.sumocfg', help='SUMO config file')
+    parser.add_argument('--num-clients', type=int, default=os.cpu_count(),
+                        help='Controller processes (SUMO --num-clients)')
+    parser.add_argument('--sumo', default=SUMO_BINARY, help='sumo or sumo-gui')
+    parser.add_argument('--obstacles', default=None, help='Pothole layout (default: <config>.obstacles.xml)')
+    add_step_length_arguments(parser)
+    args = parser.parse_args()
+
+    run_sharded(args.config, args.num_clients, args.sumo, args.step_length, args.obstacles)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Simulation Clock
+================
+Controller timers (pothole recovery, swerve return, wake-up caps, progress
+lines) are simulated seconds measured with traci.simulation.getTime(), not
+step counts that silently assumed the 0.1s <step-length> of mymap.sumocfg.
+A run at --step-length 0.5 therefore holds the same 5s recovery and 8s
+swerve as one at 0.1, with a fifth of the simulation steps and TraCI round
+trips: temporal resolution traded for throughput on large batch studies.
+
+What keeps coarse steps equivalent:
+    hit tests       swept along the path driven since the previous step
+                    (pothole_model.py), so no pothole is skipped
+    zone radii      grow with one step of travel (SWEEP_SPEED * step length)
+    wake-ups        distances per step come from getDeltaT()
+
+Distance windows (the swerve controller starts swerving between 70m and
+90m) are sampled once per step: above 0.5s, vehicles faster than 40 m/s
+can step over the 20m window and drive straight to the hit test.
+
+--step-length overrides the config's <step-length> on SUMO's command line;
+without it the .sumocfg value applies.
+
+Usage:
+    python3 pothole_swerve_controller.py --step-length 0.5
+    traci.start(["sumo", "-c", sumocfg] + step_length_options(args.step_length))
+"""
+
+import argparse
+
+DEFAULT_STEP_LENGTH = 0.1   # mymap.sumocfg
+COARSE_STEP_LENGTH = 0.5    # Largest step the controllers' distance windows are tuned for
+
+
+def steps_for(seconds, step_length):
+    """Whole simulation steps covering `seconds` (at least one)"""
+    return max(1, int(round(seconds / step_length)))
+
+
+def step_length_options(step_length):
+    """SUMO command-line options overriding the config's step length (none when step_length is None)"""
+    return [] if step_length is None else ["--step-length", f"{step_length:g}"]
+
+
+def positive_seconds(value):
+    """argparse type: a step length in seconds > 0"""
+    seconds = float(value)
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError(f"step length must be positive, got {value}")
+    return seconds
+
+
+def add_step_length_arguments(parser):
+    """Register --step-length on a controller's argparse parser"""
+    parser.add_argument('--step-length', type=positive_seconds, default=None, metavar='SECONDS',
+                        help=f'Simulated seconds per step (default: the config\'s, {DEFAULT_STEP_LENGTH}s for '
+                             f'mymap.sumocfg; up to {COARSE_STEP_LENGTH}s keeps the controllers\' behaviour)')
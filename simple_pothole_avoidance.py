@@ -15,20 +15,21 @@ Key Features:
 - 5-second recovery after hits
 - Realistic lateral dodging when space available
 - Simple, clean code - no over-engineering
+
+Runs as the simple dodge policy of the shared controller engine
+(controller_core.py), which provides loading, the main loop and its options.
 """
 
 import os
-import sys
 import traci
 import math
-from collections import defaultdict
 
-# Add SUMO tools to Python path
-if 'SUMO_HOME' in os.environ:
-    tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
-    sys.path.append(tools)
-else:
-    sys.exit("Please declare environment variable 'SUMO_HOME'")
+from controller_core import (Policy, load_potholes as load_pothole_layout, add_controller_arguments, run_from_args,
+                             run_simulation as run_policy, HIT, SWERVE, SLOW, PASSED, RETURN, RECOVER)
+from wakeup_scheduler import WakeupScheduler
+from zone_subscriptions import ZoneSubscriptions
+from pothole_model import (hit_speed, vehicle_width, vehicle_frame, under_vehicle, segment_distance, MAX_RADIUS,
+                           MAX_SWEEP)
 
 # ============================================================================
 # CONFIGURATION - Simple and Clear
@@ -40,12 +41,12 @@ SLOWDOWN_DISTANCE = 60.0    # Start slowing at 60m
 DODGE_DISTANCE = 40.0       # Start dodging at 40m (earlier to have time)
 DODGE_OFFSET = 1.5          # Dodge 1.5m laterally (max safe for 3.5m lanes)
 ROAD_WIDTH_BUFFER = 0.2     # Stay 0.2m from road edge (tight Indian driving!)
-HIT_RADIUS = 1.3            # Vehicle must be within 1.3m of pothole center to hit (tighter)
+HIT_MARGIN = 0.15           # Pothole must be within its radius + 0.15m of the front along the heading (tight)
 
 # Speed Control
 SLOWDOWN_SPEED = 5.0        # Slow to 5 m/s when approaching pothole
-HIT_SPEED = 0.5             # Force 0.5 m/s for 5 seconds after hit (99% reduction)
-HIT_RECOVERY_TIME = 50      # 50 steps = 5 seconds @ 10 steps/sec
+HIT_SPEED = 0.5             # Force at least 0.5 m/s for 5 seconds after hit (pothole severity decides)
+HIT_RECOVERY_TIME = 5.0     # Simulated seconds, whatever the step length
 
 # Vehicle States
 NORMAL = 'normal'
@@ -54,52 +55,31 @@ DODGING = 'dodging'
 RETURNING = 'returning'
 RECOVERING = 'recovering'  # After hit
 
-# ============================================================================
-# GLOBAL STATE
-# ============================================================================
-
-potholes = []               # List of all potholes {x, y}
-vehicle_states = {}         # {vid: {'state': NORMAL, 'target_pothole': None, ...}}
-hit_vehicles = {}           # {vid: recovery_counter}
+# Files
+SUMO_CONFIG = 'mymap.sumocfg'
+FEW_POTHOLES = 'mymap_few_potholes.obstacles.xml'   # Preferred layout when present
+ALL_POTHOLES = 'mymap.obstacles.xml'
 
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
-def load_potholes():
-    """Load pothole coordinates from obstacles file"""
-    global potholes
-    
-    # Try fewer potholes version first, fall back to original
-    obstacles_file = 'mymap_few_potholes.obstacles.xml'
-    if not os.path.exists(obstacles_file):
-        obstacles_file = 'mymap.obstacles.xml'
-    
+def default_obstacles():
+    """Try fewer potholes version first, fall back to original"""
+    return FEW_POTHOLES if os.path.exists(FEW_POTHOLES) else ALL_POTHOLES
+
+
+def load_potholes(obstacles_file=None, net_file=None):
+    """Load pothole coordinates from obstacles file: (potholes_by_lane, potholes_xy)"""
+    if obstacles_file is None:
+        obstacles_file = default_obstacles()
+
     if not os.path.exists(obstacles_file):
         print(f"WARNING: {obstacles_file} not found!")
-        return
-    
-    import xml.etree.ElementTree as ET
-    tree = ET.parse(obstacles_file)
-    root = tree.getroot()
-    
-    for poly in root.findall('poly'):
-        if 'pothole' in poly.get('type', '').lower():
-            shape = poly.get('shape', '')
-            if shape:
-                # Parse polygon points and get center
-                points = []
-                for coord_pair in shape.split():
-                    x, y = map(float, coord_pair.split(','))
-                    points.append((x, y))
-                
-                if points:
-                    # Calculate center of polygon
-                    cx = sum(p[0] for p in points) / len(points)
-                    cy = sum(p[1] for p in points) / len(points)
-                    potholes.append({'x': cx, 'y': cy})
-    
-    print(f"✓ Loaded {len(potholes)} potholes from {obstacles_file}")
+        return {}, []
+
+    # XY only: dodging needs no lanes (unless rerouting penalises them)
+    return load_pothole_layout(obstacles_file, net_file)
 
 
 def distance(x1, y1, x2, y2):
@@ -107,29 +87,32 @@ def distance(x1, y1, x2, y2):
     return math.sqrt((x2 - x1)**2 + (y2 - y1)**2)
 
 
-def get_potholes_ahead(vx, vy, vangle, lane_width):
+def get_potholes_ahead(grid, vx, vy, vangle, lane_width):
     """
     Find potholes ahead of vehicle within detection range.
+    grid: PotholeGrid of (x, y, radius, type, speed_mult) entries.
     Returns list of potholes sorted by distance.
     """
     potholes_ahead = []
-    
+
     # Convert angle to radians
     angle_rad = math.radians(vangle)
     cos_a = math.cos(angle_rad)
     sin_a = math.sin(angle_rad)
-    
-    for pothole in potholes:
-        px, py = pothole['x'], pothole['y']
-        
+
+    # Only the cells around the detection strip (DETECTION_RANGE ahead, lane width across)
+    half = DETECTION_RANGE / 2
+    for pothole in grid.near(vx + cos_a * half, vy + sin_a * half, math.hypot(half, lane_width / 2 + 1.0)):
+        px, py = pothole[0], pothole[1]
+
         # Vector from vehicle to pothole
         dx = px - vx
         dy = py - vy
-        
+
         # Project onto vehicle's heading direction
         forward_dist = dx * cos_a + dy * sin_a
         lateral_dist = abs(-dx * sin_a + dy * cos_a)
-        
+
         # Check if pothole is ahead and within lane
         if forward_dist > 0 and forward_dist < DETECTION_RANGE:
             if lateral_dist < lane_width / 2 + 1.0:  # Within lane plus buffer
@@ -138,282 +121,328 @@ def get_potholes_ahead(vx, vy, vangle, lane_width):
                     'forward_dist': forward_dist,
                     'lateral_dist': lateral_dist
                 })
-    
+
     # Sort by forward distance
     potholes_ahead.sort(key=lambda p: p['forward_dist'])
     return potholes_ahead
 
 
-def can_dodge(vx, vy, vangle, lateral_offset, edge_id, lane_width, target_pothole):
+def can_dodge(grid, vx, vy, vangle, lateral_offset, edge_id, lane_width, target_pothole):
     """
     Check if vehicle can dodge laterally without going off road.
     Returns True if safe to dodge.
-    
+
     Indian driving style: We only check if we'd hit the IMMEDIATE area,
     not every pothole in existence (too strict).
     """
     # Check road boundaries
     max_offset = (lane_width / 2) - ROAD_WIDTH_BUFFER
-    
+
     if abs(lateral_offset) > max_offset:
-        # print(f"    DEBUG: Can't dodge - offset {lateral_offset:.1f}m exceeds max {max_offset:.1f}m (lane width {lane_width}m)")
         return False
-    
+
     # Calculate dodge position (simplified - just check lateral displacement)
     # Convert angle to radians
     angle_rad = math.radians(vangle)
-    
+    cos_a = math.cos(angle_rad)
+    sin_a = math.sin(angle_rad)
+
     # Check only potholes in the IMMEDIATE dodge area (next 40m forward)
     # This is more realistic - we're dodging ONE pothole, not avoiding all of them
-    blocking_potholes = 0
-    for pothole in potholes:
+    across = abs(lateral_offset) + MAX_RADIUS + HIT_MARGIN + 0.5
+    for pothole in grid.near(vx + cos_a * 20, vy + sin_a * 20, math.hypot(20, across)):
         # Skip the target pothole itself
         if pothole == target_pothole:
             continue
-            
-        px, py = pothole['x'], pothole['y']
-        
+
+        px, py, radius = pothole[0], pothole[1], pothole[2]
+
         # Check if this pothole is in our dodge path
         # Use simple forward/lateral distance check
         dx = px - vx
         dy = py - vy
-        
-        cos_a = math.cos(angle_rad)
-        sin_a = math.sin(angle_rad)
-        
+
         forward_dist = dx * cos_a + dy * sin_a
         lateral_dist = -dx * sin_a + dy * cos_a
-        
+
         # Only check potholes in the immediate dodge zone (next 40m)
         if 0 < forward_dist < 40:
             # Check if pothole would be hit at dodge offset
-            if abs(lateral_dist - lateral_offset) < HIT_RADIUS + 0.5:
-                blocking_potholes += 1
-                # print(f"    DEBUG: Pothole at forward={forward_dist:.1f}m, lateral={lateral_dist:.1f}m blocks offset {lateral_offset:.1f}m")
+            if abs(lateral_dist - lateral_offset) < radius + HIT_MARGIN + 0.5:
                 return False  # Would hit this pothole while dodging
-    
-    # print(f"    DEBUG: Can dodge at offset {lateral_offset:.1f}m (no blocking potholes in 40m)")
+
     return True
 
 
-def check_pothole_hit(vid, vx, vy):
+def check_pothole_hit(grid, vx, vy, vangle, half_width, prev_xy=None):
     """
-    Check if vehicle has hit a pothole.
-    Returns True if hit detected.
+    Check if vehicle has hit a pothole: its circle must reach the wheels
+    (half the vehicle width to each side), not just the vehicle's centre line.
+    With prev_xy (position one step earlier) the whole path since then is
+    checked, so fast vehicles can't skip over a pothole between two steps.
+    Returns the pothole hit, or None.
     """
-    for pothole in potholes:
-        dist = distance(vx, vy, pothole['x'], pothole['y'])
-        if dist < HIT_RADIUS:
-            return True
-    return False
+    travel = distance(vx, vy, *prev_xy) if prev_xy is not None else None
+    if travel is not None and travel < MAX_SWEEP:
+        x0, y0 = prev_xy
+        for pothole in grid.near(vx, vy, travel + MAX_RADIUS + half_width):
+            px, py, radius = pothole[0], pothole[1], pothole[2]
+            if distance(vx, vy, px, py) >= travel + radius + half_width:
+                continue
+            if segment_distance(px, py, x0, y0, vx, vy) < radius + half_width:
+                return pothole
+        return None
+
+    for pothole in grid.near(vx, vy, math.hypot(MAX_RADIUS + HIT_MARGIN, MAX_RADIUS + half_width)):
+        px, py, radius = pothole[0], pothole[1], pothole[2]
+        if distance(vx, vy, px, py) >= math.hypot(radius + HIT_MARGIN, radius + half_width):
+            continue
+        along, across = vehicle_frame(px - vx, py - vy, vangle)
+        if under_vehicle(along, across, radius, half_width, HIT_MARGIN):
+            return pothole
+    return None
 
 
 # ============================================================================
 # MAIN CONTROL LOGIC
 # ============================================================================
 
-def control_vehicle(vid):
-    """
-    Main control logic for each vehicle - SIMPLE & CLEAN
-    """
-    global vehicle_states, hit_vehicles
-    
-    # Initialize vehicle state
-    if vid not in vehicle_states:
-        vehicle_states[vid] = {
-            'state': NORMAL,
-            'target_pothole': None,
-            'original_speed': None
+class DodgePolicy(Policy):
+    """Slow down, dodge within the lane if there's space, return to center; XY detection only"""
+
+    name = 'simple_pothole_avoidance'
+    uses_lanes = False
+    sumo_options = ["--start"]
+
+    def __init__(self, potholes_by_lane, potholes_xy):
+        super().__init__(potholes_by_lane, potholes_xy)
+        self.lane_widths = {}   # lane_id -> width; lanes never change during a run
+
+    def new_state(self):
+        return {
+            'vehicle_states': {},   # {vid: {'state': NORMAL, 'target_pothole': None, ...}}
+            'hit_vehicles': {},     # {vid: simulated time of the hit}
         }
-    
-    state = vehicle_states[vid]
-    
-    # Get vehicle info
-    try:
-        vx, vy = traci.vehicle.getPosition(vid)
-        vangle = traci.vehicle.getAngle(vid)
-        speed = traci.vehicle.getSpeed(vid)
-        edge_id = traci.vehicle.getRoadID(vid)
-        lane_id = traci.vehicle.getLaneID(vid)
-        lane_index = traci.vehicle.getLaneIndex(vid)
-        
-        # Skip if vehicle not on proper road
-        if edge_id.startswith(':'):
-            return
-        
-        # Get lane width
-        lane_width = traci.lane.getWidth(lane_id)
-        
-    except traci.exceptions.TraciException:
-        return
-    
-    # ========================================================================
-    # PRIORITY 1: Handle recovery after hitting pothole
-    # ========================================================================
-    if vid in hit_vehicles:
-        if hit_vehicles[vid] > 0:
-            traci.vehicle.setSpeed(vid, HIT_SPEED)
-            hit_vehicles[vid] -= 1
-            if hit_vehicles[vid] == 0:
-                print(f"  [{vid}] ✓ RECOVERED from pothole hit")
+
+    def resume(self, state):
+        """Recovering vehicles get their hit speed again on their next step; dodges restart at lane centre"""
+        for vid, vstate in state['vehicle_states'].items():
+            target = vstate.get('target_pothole')
+            if isinstance(target, dict):  # Older checkpoints kept potholes as dicts
+                vstate['target_pothole'] = (target['x'], target['y'], target['radius'], '', target['speed_mult'])
+            if vstate['state'] == SLOWING:
+                try:
+                    traci.vehicle.setSpeed(vid, SLOWDOWN_SPEED)
+                except traci.exceptions.TraCIException:
+                    pass
+
+    def new_scheduler(self, step_length=0.1):
+        """Only evaluate vehicles that could be within DETECTION_RANGE of a pothole"""
+        return WakeupScheduler(step_length, xy_points=[(p[0], p[1]) for p in self.potholes_xy],
+                               xy_range=DETECTION_RANGE)
+
+    def new_zone_subscriptions(self, step_length=0.1):
+        """Only evaluate vehicles SUMO reports within DETECTION_RANGE of a pothole"""
+        return ZoneSubscriptions(points=[(p[0], p[1]) for p in self.potholes_xy], radius=DETECTION_RANGE)
+
+    def busy(self, state):
+        busy = [vid for vid, vstate in state['vehicle_states'].items() if vstate['state'] != NORMAL]
+        return state['hit_vehicles'], busy
+
+    def lane_width(self, lane_id):
+        if lane_id not in self.lane_widths:
+            self.lane_widths[lane_id] = traci.lane.getWidth(lane_id)
+        return self.lane_widths[lane_id]
+
+    def control_vehicle(self, vid, step, now, state, cmd, vehicle, profiler):
+        """Main control logic for each vehicle - SIMPLE & CLEAN"""
+        vehicle_states = state['vehicle_states']
+        hit_vehicles = state['hit_vehicles']
+
+        # Initialize vehicle state
+        if vid not in vehicle_states:
+            vehicle_states[vid] = {
+                'state': NORMAL,
+                'target_pothole': None,
+                'original_speed': None,
+                'half_width': vehicle_width(vid, vehicle) / 2
+            }
+        vstate = vehicle_states[vid]
+
+        # Get vehicle info
+        vx, vy = vehicle.getPosition(vid)
+        vangle = vehicle.getAngle(vid)
+        speed = vehicle.getSpeed(vid)
+        edge_id = vehicle.getRoadID(vid)
+
+        # Skip if vehicle not on proper road (junction, or teleporting)
+        if edge_id and not edge_id.startswith(':'):
+            lane_width = self.lane_width(vehicle.getLaneID(vid))
+            self.avoid(vid, step, now, vstate, hit_vehicles, cmd, vehicle, vx, vy, vangle, speed, edge_id,
+                       lane_width)
+
+        # Idle: sleep until the vehicle could come within DETECTION_RANGE of a pothole
+        if vid not in hit_vehicles and vstate['state'] == NORMAL:
+            return vx, vy, None
+        return None
+
+    def avoid(self, vid, step, now, state, hit_vehicles, cmd, vehicle, vx, vy, vangle, speed, edge_id, lane_width):
+        """Recovery, hit check, return to center and avoidance maneuver of one vehicle on a road"""
+        potholes = self.pothole_grid
+
+        # ========================================================================
+        # PRIORITY 1: Handle recovery after hitting pothole
+        # ========================================================================
+        if vid in hit_vehicles:
+            if now - hit_vehicles[vid] < HIT_RECOVERY_TIME:
+                cmd.setSpeed(vid, state.get('hit_speed', HIT_SPEED))
+            else:
+                self.log.record(step, vid, RECOVER, "✓ RECOVERED from pothole hit")
                 del hit_vehicles[vid]
                 state['state'] = RETURNING
-        return
-    
-    # Check for new pothole hit
-    if check_pothole_hit(vid, vx, vy):
-        if vid not in hit_vehicles:
-            print(f"  [{vid}] ✗ HIT POTHOLE at ({vx:.1f}, {vy:.1f}) - 99% speed loss for 5 seconds!")
-            hit_vehicles[vid] = HIT_RECOVERY_TIME
-            state['state'] = RECOVERING
             return
-    
-    # ========================================================================
-    # PRIORITY 2: Return to center after dodging
-    # ========================================================================
-    if state['state'] == RETURNING:
-        current_lateral = traci.vehicle.getLateralLanePosition(vid)
-        
-        if abs(current_lateral) < 0.3:
-            # Successfully returned to center
-            traci.vehicle.setSpeed(vid, -1)  # Resume normal speed
-            state['state'] = NORMAL
-            state['target_pothole'] = None
-            print(f"  [{vid}] → Returned to center, resuming normal driving")
-        else:
-            # Keep moving toward center
-            traci.vehicle.setLateralLanePosition(vid, 0.0)
-        return
-    
-    # ========================================================================
-    # PRIORITY 3: Find potholes ahead and decide action
-    # ========================================================================
-    potholes_ahead = get_potholes_ahead(vx, vy, vangle, lane_width)
-    
-    if not potholes_ahead:
-        # No potholes ahead - normal driving
-        if state['state'] != NORMAL:
-            traci.vehicle.setSpeed(vid, -1)  # Resume normal speed
-            state['state'] = NORMAL
-            state['target_pothole'] = None
-        return
-    
-    # Get closest pothole
-    closest = potholes_ahead[0]
-    forward_dist = closest['forward_dist']
-    
-    # ========================================================================
-    # PRIORITY 4: Execute avoidance maneuver
-    # ========================================================================
-    
-    if forward_dist < DODGE_DISTANCE and state['state'] != DODGING:
-        # Try to dodge!
-        # Determine dodge direction - dodge AWAY from pothole
-        # If pothole is to the right (lateral_dist > 0), dodge LEFT (negative offset)
-        # If pothole is to the left (lateral_dist < 0), dodge RIGHT (positive offset)
-        lateral_dist = closest['lateral_dist']
-        primary_offset = -DODGE_OFFSET if lateral_dist > 0 else DODGE_OFFSET
-        alternate_offset = -primary_offset
-        
-        # Try primary direction first
-        if can_dodge(vx, vy, vangle, primary_offset, edge_id, lane_width, closest['pothole']):
-            traci.vehicle.setLateralLanePosition(vid, primary_offset)
-            state['state'] = DODGING
-            state['target_pothole'] = closest['pothole']
-            direction = "LEFT" if primary_offset < 0 else "RIGHT"
-            print(f"  [{vid}] ↔ DODGING {direction} (offset: {primary_offset:.1f}m) for pothole {forward_dist:.1f}m ahead")
-        # Try alternate direction
-        elif can_dodge(vx, vy, vangle, alternate_offset, edge_id, lane_width, closest['pothole']):
-            traci.vehicle.setLateralLanePosition(vid, alternate_offset)
-            state['state'] = DODGING
-            state['target_pothole'] = closest['pothole']
-            direction = "LEFT" if alternate_offset < 0 else "RIGHT"
-            print(f"  [{vid}] ↔ DODGING {direction} (offset: {alternate_offset:.1f}m, alternate) for pothole {forward_dist:.1f}m ahead")
-        else:
-            # Can't dodge either way - just slow down
-            traci.vehicle.setSpeed(vid, SLOWDOWN_SPEED)
+
+        # Check for new pothole hit
+        if 'half_width' not in state:  # Resumed from an older checkpoint
+            state['half_width'] = vehicle_width(vid, vehicle) / 2
+        last = state.get('last_xy')
+        prev_xy = last[1:] if step is not None and last and last[0] == step - 1 else None
+        state['last_xy'] = (step, vx, vy)
+        hit = check_pothole_hit(potholes, vx, vy, vangle, state['half_width'], prev_xy)
+        if hit:
+            if vid not in hit_vehicles:
+                self.log.record(step, vid, HIT, f"✗ HIT POTHOLE at ({vx:.1f}, {vy:.1f}) - {1 - hit[4]:.0%} speed loss for {HIT_RECOVERY_TIME:g} seconds!")
+                hit_vehicles[vid] = now
+                state['hit_speed'] = hit_speed(vehicle.getMaxSpeed(vid), hit[4])
+                state['state'] = RECOVERING
+                return
+
+        # ========================================================================
+        # PRIORITY 2: Return to center after dodging
+        # ========================================================================
+        if state['state'] == RETURNING:
+            current_lateral = vehicle.getLateralLanePosition(vid)
+
+            if abs(current_lateral) < 0.3:
+                # Successfully returned to center
+                cmd.setSpeed(vid, -1)  # Resume normal speed
+                state['state'] = NORMAL
+                state['target_pothole'] = None
+                self.log.record(step, vid, RETURN, "→ Returned to center, resuming normal driving")
+            else:
+                # Keep moving toward center
+                cmd.setLateralLanePosition(vid, 0.0)
+            return
+
+        # ========================================================================
+        # PRIORITY 3: Find potholes ahead and decide action
+        # ========================================================================
+        potholes_ahead = get_potholes_ahead(potholes, vx, vy, vangle, lane_width)
+
+        if not potholes_ahead:
+            # No potholes ahead - normal driving
+            if state['state'] != NORMAL:
+                cmd.setSpeed(vid, -1)  # Resume normal speed
+                state['state'] = NORMAL
+                state['target_pothole'] = None
+            return
+
+        # Get closest pothole
+        closest = potholes_ahead[0]
+        forward_dist = closest['forward_dist']
+
+        # ========================================================================
+        # PRIORITY 4: Execute avoidance maneuver
+        # ========================================================================
+
+        if forward_dist < DODGE_DISTANCE and state['state'] != DODGING:
+            # Try to dodge!
+            # Determine dodge direction - dodge AWAY from pothole
+            # If pothole is to the right (lateral_dist > 0), dodge LEFT (negative offset)
+            # If pothole is to the left (lateral_dist < 0), dodge RIGHT (positive offset)
+            lateral_dist = closest['lateral_dist']
+            primary_offset = -DODGE_OFFSET if lateral_dist > 0 else DODGE_OFFSET
+            alternate_offset = -primary_offset
+
+            # Try primary direction first
+            if can_dodge(potholes, vx, vy, vangle, primary_offset, edge_id, lane_width, closest['pothole']):
+                cmd.setLateralLanePosition(vid, primary_offset)
+                state['state'] = DODGING
+                state['target_pothole'] = closest['pothole']
+                direction = "LEFT" if primary_offset < 0 else "RIGHT"
+                self.log.record(step, vid, SWERVE, f"↔ DODGING {direction} (offset: {primary_offset:.1f}m) for pothole {forward_dist:.1f}m ahead")
+            # Try alternate direction
+            elif can_dodge(potholes, vx, vy, vangle, alternate_offset, edge_id, lane_width, closest['pothole']):
+                cmd.setLateralLanePosition(vid, alternate_offset)
+                state['state'] = DODGING
+                state['target_pothole'] = closest['pothole']
+                direction = "LEFT" if alternate_offset < 0 else "RIGHT"
+                self.log.record(step, vid, SWERVE, f"↔ DODGING {direction} (offset: {alternate_offset:.1f}m, alternate) for pothole {forward_dist:.1f}m ahead")
+            else:
+                # Can't dodge either way - just slow down
+                cmd.setSpeed(vid, SLOWDOWN_SPEED)
+                state['state'] = SLOWING
+                self.log.record(step, vid, SLOW, f"↓ SLOWING for pothole {forward_dist:.1f}m ahead (can't dodge either way)")
+
+        elif forward_dist < SLOWDOWN_DISTANCE and state['state'] == NORMAL:
+            # Start slowing down
+            cmd.setSpeed(vid, SLOWDOWN_SPEED)
             state['state'] = SLOWING
-            print(f"  [{vid}] ↓ SLOWING for pothole {forward_dist:.1f}m ahead (can't dodge either way)")
-
-
-
-    
-    elif forward_dist < SLOWDOWN_DISTANCE and state['state'] == NORMAL:
-        # Start slowing down
-        traci.vehicle.setSpeed(vid, SLOWDOWN_SPEED)
-        state['state'] = SLOWING
-        state['target_pothole'] = closest['pothole']
-        if state['original_speed'] is None:
-            state['original_speed'] = speed
-        print(f"  [{vid}] ↓ SLOWING for pothole {forward_dist:.1f}m ahead")
-    
-    elif state['state'] == DODGING:
-        # Check if we've passed the pothole
-        if state['target_pothole']:
-            px, py = state['target_pothole']['x'], state['target_pothole']['y']
-            dist_to_target = distance(vx, vy, px, py)
-            
-            if dist_to_target > DODGE_DISTANCE:
-                # Passed it - start returning to center
-                state['state'] = RETURNING
-                print(f"  [{vid}] ← Passed pothole, returning to center")
+            state['target_pothole'] = closest['pothole']
+            if state['original_speed'] is None:
+                state['original_speed'] = speed
+            self.log.record(step, vid, SLOW, f"↓ SLOWING for pothole {forward_dist:.1f}m ahead")
 
+        elif state['state'] == DODGING:
+            # Check if we've passed the pothole
+            if state['target_pothole']:
+                px, py = state['target_pothole'][0], state['target_pothole'][1]
+                dist_to_target = distance(vx, vy, px, py)
 
-# ============================================================================
-# SIMULATION MAIN LOOP
-# ============================================================================
+                if dist_to_target > DODGE_DISTANCE:
+                    # Passed it - start returning to center
+                    state['state'] = RETURNING
+                    self.log.record(step, vid, PASSED, "← Passed pothole, returning to center")
 
-def run_simulation():
-    """Main simulation loop"""
-    print("\n" + "="*70)
-    print("SIMPLE INDIAN ROAD POTHOLE AVOIDANCE - Starting Simulation")
-    print("="*70 + "\n")
-    
-    # Load potholes
-    load_potholes()
-    
-    if len(potholes) == 0:
-        print("ERROR: No potholes loaded!")
-        return
-    
-    # Start SUMO
-    sumo_binary = "sumo-gui"  # Use GUI for visualization
-    sumo_cmd = [sumo_binary, "-c", "mymap.sumocfg", "--start"]
-    
-    traci.start(sumo_cmd)
-    step = 0
-    
-    print("\n🚗 Simulation running... Watch vehicles dodge potholes!\n")
-    
-    try:
-        while traci.simulation.getMinExpectedNumber() > 0:
-            traci.simulationStep()
-            step += 1
-            
-            # Control all vehicles
-            for vid in traci.vehicle.getIDList():
-                control_vehicle(vid)
-            
-            # Progress indicator every 100 steps
-            if step % 100 == 0:
-                num_vehicles = len(traci.vehicle.getIDList())
-                num_recovering = len(hit_vehicles)
-                print(f"Step {step}: {num_vehicles} vehicles active, {num_recovering} recovering from hits")
-    
-    except KeyboardInterrupt:
-        print("\n\n⚠ Simulation interrupted by user")
-    
-    finally:
-        traci.close()
-        
+    def progress(self, step, state):
+        num_vehicles = len(traci.vehicle.getIDList())
+        num_recovering = len(state['hit_vehicles'])
+        print(f"Step {step}: {num_vehicles} vehicles active, {num_recovering} recovering from hits")
+
+    def summary(self, step, state):
         print("\n" + "="*70)
         print("SIMULATION COMPLETE")
         print("="*70)
         print(f"\nTotal steps: {step}")
-        print(f"Total vehicles: {len(vehicle_states)}")
         print("\n✓ Check the SUMO GUI to see dodging behavior")
         print("✓ Vehicles should slow down, dodge laterally, and return to center")
 
 
+# ============================================================================
+# SIMULATION MAIN LOOP
+# ============================================================================
+
+def print_banner():
+    print("\n" + "="*70)
+    print("SIMPLE INDIAN ROAD POTHOLE AVOIDANCE - Starting Simulation")
+    print("="*70 + "\n")
+
+
+def run_simulation(adaptive=False, subscriptions=False, batch=False, checkpoints=None, resume=None,
+                   obstacles_file=None, step_length=None, profiler=None, rerouting=None, events=None,
+                   sumo_config=SUMO_CONFIG, sumo_cmd=None):
+    """Main simulation loop"""
+    print_banner()
+    return run_policy(DodgePolicy, sumo_config, obstacles_file or default_obstacles(), profiler=profiler,
+                      adaptive=adaptive, subscriptions=subscriptions, batch=batch, checkpoints=checkpoints,
+                      resume=resume, sumo_cmd=sumo_cmd, rerouting=rerouting, events=events,
+                      step_length=step_length)
+
+
 if __name__ == "__main__":
-    run_simulation()
+    import argparse
+    parser = argparse.ArgumentParser()
+    add_controller_arguments(parser)
+    args = parser.parse_args()
+    print_banner()
+    run_from_args(DodgePolicy, args, default_obstacles())
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Warm-Start Snapshot Library
+===========================
+Every experiment used to start from an empty network and spend the first
+half hour filling it through the route flows. A snapshot runs the scenario
+to steady state ONCE (no pothole control) and keeps:
+
+    snapshots/<name>.state.xml.gz      SUMO state at the end of the warm-up
+    snapshots/<name>.controller.pkl    checkpoint header (no controller state yet)
+    snapshots/<name>.obstacles.xml     pothole layout the snapshot was taken with
+    snapshots/<name>.json              config, warm-up time, vehicle count
+
+Snapshots use the checkpoint format (checkpoints.py), so every controller
+can start from one with --snapshot NAME, optionally with a different
+pothole layout (--obstacles FILE).
+
+Steady state: the number of running vehicles changes by less than
+STEADY_TOLERANCE over STEADY_WINDOWS consecutive STEADY_WINDOW second
+windows (or --warmup seconds pass, whichever comes first).
+
+Usage:
+    python3 snapshots.py create rush_hour --warmup 1800
+    python3 snapshots.py list
+    python3 pothole_swerve_controller.py --snapshot rush_hour
+    python3 pothole_controller.py --snapshot rush_hour --obstacles mymap_few_potholes.obstacles.xml
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import pickle
+import shutil
+import argparse
+
+# Add SUMO tools to path
+if 'SUMO_HOME' in os.environ:
+    tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
+    sys.path.append(tools)
+
+import traci
+from checkpoints import STATE_SUFFIX, CONTROLLER_SUFFIX
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SNAPSHOT_DIR = "snapshots"
+WARMUP_TIME = 1800.0        # Stop warming up after 30 simulated minutes at the latest
+STEADY_WINDOW = 60.0        # Compare running vehicle counts once per simulated minute
+STEADY_WINDOWS = 5          # ...for 5 windows in a row
+STEADY_TOLERANCE = 0.05     # ...changing by less than 5% each time
+
+
+# ============================================================================
+# LIBRARY
+# ============================================================================
+
+def snapshot_prefix(name, directory=SNAPSHOT_DIR):
+    """Checkpoint prefix of a snapshot (what --resume would take)"""
+    prefix = os.path.join(directory, name)
+    if not os.path.exists(prefix + STATE_SUFFIX):
+        raise FileNotFoundError(f"No snapshot '{name}' in {directory}/ (python3 snapshots.py list)")
+    return prefix
+
+
+def snapshot_obstacles(name, directory=SNAPSHOT_DIR):
+    """Pothole layout stored with a snapshot"""
+    return os.path.join(directory, f"{name}.obstacles.xml")
+
+
+def warm_up(warmup=WARMUP_TIME, until_steady=True):
+    """Step the running simulation to steady state; returns (simulated time, running vehicles)"""
+    step_length = traci.simulation.getDeltaT()
+    window_steps = max(1, int(round(STEADY_WINDOW / step_length)))
+    counts = []
+    step = 0
+    while traci.simulation.getTime() < warmup and traci.simulation.getMinExpectedNumber() > 0:
+        traci.simulationStep()
+        step += 1
+        if step % window_steps:
+            continue
+
+        running = traci.vehicle.getIDCount()
+        counts.append(running)
+        print(f"t={traci.simulation.getTime():.0f}s: {running} vehicles running")
+        recent = counts[-(STEADY_WINDOWS + 1):]
+        if until_steady and len(recent) == STEADY_WINDOWS + 1 and all(
+                abs(b - a) <= STEADY_TOLERANCE * max(a, 1) for a, b in zip(recent, recent[1:])):
+            print(f"Steady state after {traci.simulation.getTime():.0f}s")
+            break
+    return traci.simulation.getTime(), traci.vehicle.getIDCount()
+
+
+def create_snapshot(name, sumo_config, obstacles_file, warmup=WARMUP_TIME, until_steady=True,
+                    directory=SNAPSHOT_DIR, sumo_binary="sumo"):
+    """Warm the scenario up without pothole control and store it as a named snapshot"""
+    os.makedirs(directory, exist_ok=True)
+    prefix = os.path.join(directory, name)
+
+    started = time.time()
+    traci.start([sumo_binary, "-c", sumo_config, "--no-step-log", "true"])
+    try:
+        sim_time, running = warm_up(warmup, until_steady)
+        traci.simulation.saveState(prefix + STATE_SUFFIX)
+    finally:
+        traci.close()
+
+    # Checkpoint header: controllers start at step 0 with fresh state
+    with open(prefix + CONTROLLER_SUFFIX, 'wb') as f:
+        pickle.dump({'step': 0, 'time': sim_time, 'state': None}, f)
+    shutil.copyfile(obstacles_file, snapshot_obstacles(name, directory))
+    info = {
+        'name': name,
+        'config': os.path.abspath(sumo_config),
+        'obstacles': os.path.abspath(obstacles_file),
+        'time': sim_time,
+        'vehicles': running,
+        'warmup_wall_time': round(time.time() - started, 1),
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    with open(prefix + '.json', 'w') as f:
+        json.dump(info, f, indent=2)
+
+    print(f"Snapshot '{name}': t={sim_time:.0f}s, {running} vehicles, "
+          f"warm-up took {info['warmup_wall_time']}s -> {prefix}{STATE_SUFFIX}")
+    return prefix
+
+
+def list_snapshots(directory=SNAPSHOT_DIR):
+    """Metadata of all snapshots in the library"""
+    snapshots = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+        with open(path) as f:
+            snapshots.append(json.load(f))
+    return snapshots
+
+
+# ============================================================================
+# CONTROLLER OPTIONS
+# ============================================================================
+
+def add_snapshot_arguments(parser):
+    """Register --snapshot / --obstacles on a controller's argparse parser"""
+    parser.add_argument('--snapshot', metavar='NAME', help='Start from a warm-start snapshot (snapshots.py)')
+    parser.add_argument('--snapshot-dir', default=SNAPSHOT_DIR, help='Snapshot library directory')
+    parser.add_argument('--obstacles', help='Pothole layout (default: the snapshot\'s, else the controller\'s)')
+
+
+def snapshot_from_args(args, default_obstacles=None):
+    """(checkpoint prefix or None, obstacles file) for a controller run"""
+    if not args.snapshot:
+        return None, args.obstacles or default_obstacles
+    prefix = snapshot_prefix(args.snapshot, args.snapshot_dir)
+    return prefix, args.obstacles or snapshot_obstacles(args.snapshot, args.snapshot_dir)
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm-start snapshot library")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('create', help='Run a scenario to steady state and store a snapshot')
+    p.add_argument('name')
+    p.add_argument('--config', default='mymap.sumocfg', help='SUMO config file')
+    p.add_argument('--obstacles', default='mymap.obstacles.xml', help='Pothole layout to store with it')
+    p.add_argument('--warmup', type=float, default=WARMUP_TIME, help='Maximum warm-up (simulated seconds)')
+    p.add_argument('--full-warmup', action='store_true', help='Always run the whole warm-up period')
+    p.add_argument('--dir', default=SNAPSHOT_DIR)
+    p.add_argument('--sumo', default='sumo', help='sumo or sumo-gui')
+
+    p = sub.add_parser('list', help='Show stored snapshots')
+    p.add_argument('--dir', default=SNAPSHOT_DIR)
+
+    args = parser.parse_args()
+    if args.command == 'create':
+        create_snapshot(args.name, args.config, args.obstacles, args.warmup, not args.full_warmup,
+                        args.dir, args.sumo)
+    else:
+        snapshots = list_snapshots(args.dir)
+        if not snapshots:
+            print(f"No snapshots in {args.dir}/")
+        for info in snapshots:
+            print(f"{info['name']:<20} t={info['time']:>7.0f}s  {info['vehicles']:>5} vehicles  "
+                  f"{os.path.basename(info['obstacles']):<35} {info['created']}")
+
+
+if __name__ == "__main__":
+    main()
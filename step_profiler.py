@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Per-Step Profiling for the TraCI Controllers
+============================================
+Cheap monotonic timers around each phase of a control step, aggregated into
+log2 histograms (one integer increment per sample, no lists that grow with
+the run). The breakdown can be dumped every N steps and at the end of a run.
+
+An optional cProfile / pyinstrument capture window covers only a step range,
+so step 30,000 of a 2-hour run can be profiled without profiling the rest.
+
+Usage inside a controller loop:
+    profiler = StepProfiler(dump_every=1000, window=(30000, 30100))
+    profiler.begin_step(step)
+    profiler.mark()
+    traci.simulationStep()
+    profiler.lap('simulation_step')
+    ...
+    profiler.end_step()
+    ...
+    profiler.finish()
+"""
+
+import json
+import time
+
+NUM_BUCKETS = 64  # log2 nanosecond buckets, bucket i holds [2^(i-1), 2^i) ns
+
+
+class PhaseHistogram:
+    """Running count/total/max plus a log2 histogram of durations (ns)"""
+
+    __slots__ = ('count', 'total_ns', 'max_ns', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * NUM_BUCKETS
+
+    def add(self, ns):
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        self.buckets[min(ns.bit_length(), NUM_BUCKETS - 1)] += 1
+
+    def percentile(self, q):
+        """Upper bound (ns) of the bucket containing the q-th percentile"""
+        if self.count == 0:
+            return 0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min(1 << i, self.max_ns)
+        return self.max_ns
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total_ns / 1e6,
+            'mean_us': self.total_ns / self.count / 1e3 if self.count else 0.0,
+            'p50_us': self.percentile(0.50) / 1e3,
+            'p90_us': self.percentile(0.90) / 1e3,
+            'p99_us': self.percentile(0.99) / 1e3,
+            'max_us': self.max_ns / 1e3,
+        }
+
+
+class StepProfiler:
+    """Phase timers, step histogram and an optional profiler capture window"""
+
+    def __init__(self, dump_every=0, window=None, profiler='cprofile',
+                 output='step_profile', json_file=None):
+        self.dump_every = dump_every    # Dump breakdown every N steps (0 = only at end)
+        self.window = window            # (first_step, last_step) for cProfile/pyinstrument
+        self.profiler_name = profiler
+        self.output = output            # Capture file prefix
+        self.json_file = json_file      # Optional JSON dump of the final breakdown
+        self.phases = {}
+        self.steps = PhaseHistogram()
+        self.step = 0
+        self._t = 0
+        self._step_start = 0
+        self._capture = None
+        self._captured = False          # The window was captured (once per run)
+
+    # ------------------------------------------------------------------
+    # Timers
+    # ------------------------------------------------------------------
+
+    def begin_step(self, step):
+        self.step = step
+        if self.window:
+            # Ranges, not exact steps: a run resumed inside or past the window starts mid-way
+            first, last = self.window
+            if self._capture is None and not self._captured and first <= step <= last:
+                self._start_capture()
+            elif self._capture is not None and step > last:
+                self._stop_capture()
+        self._step_start = self._t = time.perf_counter_ns()
+
+    def mark(self):
+        """Start timing the next phase"""
+        self._t = time.perf_counter_ns()
+
+    def lap(self, phase):
+        """Record time since the last mark/lap under `phase`"""
+        now = time.perf_counter_ns()
+        hist = self.phases.get(phase)
+        if hist is None:
+            hist = self.phases[phase] = PhaseHistogram()
+        hist.add(now - self._t)
+        self._t = now
+
+    def end_step(self):
+        self.steps.add(time.perf_counter_ns() - self._step_start)
+        if self.dump_every and self.step % self.dump_every == 0:
+            self.dump()
+
+    def finish(self):
+        """Close any open capture window and dump the final breakdown"""
+        self._stop_capture()
+        self.dump(final=True)
+        if self.json_file:
+            with open(self.json_file, 'w') as f:
+                json.dump(self.to_dict(), f, indent=2)
+            print(f"Profile breakdown written to {self.json_file}")
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    def to_dict(self):
+        return {
+            'steps': self.step,
+            'step_time': self.steps.to_dict(),
+            'phases': {name: hist.to_dict() for name, hist in self.phases.items()},
+        }
+
+    def dump(self, final=False):
+        total_ns = sum(h.total_ns for h in self.phases.values()) or 1
+        title = "FINAL" if final else f"Step {self.step}"
+        print(f"\n--- Step timing breakdown ({title}) ---")
+        step = self.steps.to_dict()
+        print(f"{'step':<18} n={step['count']:<8} mean={step['mean_us']:>10.1f}us "
+              f"p90={step['p90_us']:>10.1f}us max={step['max_us']:>10.1f}us")
+        for name, hist in sorted(self.phases.items(), key=lambda kv: -kv[1].total_ns):
+            d = hist.to_dict()
+            share = 100.0 * hist.total_ns / total_ns
+            print(f"{name:<18} n={d['count']:<8} mean={d['mean_us']:>10.1f}us "
+                  f"p90={d['p90_us']:>10.1f}us p99={d['p99_us']:>10.1f}us "
+                  f"total={d['total_ms']:>10.1f}ms ({share:4.1f}%)")
+
+    # ------------------------------------------------------------------
+    # cProfile / pyinstrument capture window
+    # ------------------------------------------------------------------
+
+    def _start_capture(self):
+        if self._capture is not None:
+            return
+        if self.profiler_name == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+                self._capture = ('pyinstrument', Profiler())
+                self._capture[1].start()
+            except ImportError:
+                print("pyinstrument not installed, falling back to cProfile")
+                self.profiler_name = 'cprofile'
+        if self._capture is None:
+            import cProfile
+            self._capture = ('cprofile', cProfile.Profile())
+            self._capture[1].enable()
+        print(f"Step {self.step}: profiler capture started ({self._capture[0]})")
+
+    def _stop_capture(self):
+        if self._capture is None:
+            return
+        kind, prof = self._capture
+        self._capture = None
+        self._captured = True
+        if kind == 'pyinstrument':
+            prof.stop()
+            path = f"{self.output}.html"
+            with open(path, 'w') as f:
+                f.write(prof.output_html())
+        else:
+            prof.disable()
+            path = f"{self.output}.prof"
+            prof.dump_stats(path)
+        print(f"Step {self.step}: profiler capture written to {path}")
+
+
+def parse_window(text):
+    """Parse a 'START:END' step range"""
+    if not text:
+        return None
+    start, end = text.split(':')
+    return int(start), int(end)
+
+
+def add_profiler_arguments(parser):
+    """Register the --profile* command line options on an argparse parser"""
+    parser.add_argument('--profile', action='store_true', help='Time each control phase')
+    parser.add_argument('--profile-dump-every', type=int, default=0,
+                        help='Print timing breakdown every N steps (0 = end only)')
+    parser.add_argument('--profile-window', help='Capture cProfile/pyinstrument for steps START:END')
+    parser.add_argument('--profiler', choices=['cprofile', 'pyinstrument'], default='cprofile')
+    parser.add_argument('--profile-output', default='step_profile', help='Capture file prefix')
+    parser.add_argument('--profile-json', help='Write final breakdown as JSON')
+
+
+def profiler_from_args(args):
+    """Build a StepProfiler from parsed arguments (NullProfiler if profiling is off)"""
+    if not (args.profile or args.profile_window):
+        return NullProfiler()
+    return StepProfiler(dump_every=args.profile_dump_every,
+                        window=parse_window(args.profile_window),
+                        profiler=args.profiler,
+                        output=args.profile_output,
+                        json_file=args.profile_json)
+
+
+class NullProfiler:
+    """Drop-in no-op profiler used when profiling is disabled"""
+
+    def begin_step(self, step):
+        pass
+
+    def mark(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def end_step(self):
+        pass
+
+    def finish(self):
+        pass
@@ -11,8 +11,11 @@ import sys
 import time
 import threading
 import xml.etree.ElementTree as ET
-import random
 import math
+from scenario_seed import scenario_seed, seeded_rng, strip_generation_date
+from parallel_routing import route_trips
+from road_graph import connected_edges
+from pothole_model import pothole_params_xml, DEFAULT_SPEED_MULT
 
 # ============================================================================
 # FUNCTION DEFINITIONS (Must be defined before use)
@@ -22,25 +25,25 @@ def generate_vehicle_types(vtypes_file):
     """Generate vehicle type definitions"""
     with open(vtypes_file, "w") as f:
         f.write("""<routes xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:noNamespaceSchemaLocation="http://sumo.dlr.de/xsd/routes_file.xsd">
-    <vType id="auto" accel="1.8" decel="4.5" sigma="0.7" length="3.0" minGap="1.2" 
+    <vType id="auto" accel="1.8" decel="4.5" sigma="0.7" length="3.0" width="1.4" minGap="1.2" 
            maxSpeed="13.89" color="1,1,0" vClass="passenger" guiShape="delivery" 
            speedFactor="0.95" speedDev="0.25"/>
     
-    <vType id="motorbike" accel="4.0" decel="7.0" sigma="0.8" length="2.0" minGap="0.5" 
+    <vType id="motorbike" accel="4.0" decel="7.0" sigma="0.8" length="2.0" width="0.8" minGap="0.5" 
            maxSpeed="27.78" color="1,0,0" vClass="passenger" guiShape="motorcycle"
            speedFactor="1.3" speedDev="0.4"/>
     
-    <vType id="car" accel="2.6" decel="4.5" sigma="0.5" length="5.0" minGap="2.5" 
+    <vType id="car" accel="2.6" decel="4.5" sigma="0.5" length="5.0" width="1.8" minGap="2.5" 
            maxSpeed="33.33" color="0.9,0.9,0.9" vClass="passenger" guiShape="passenger"
            speedFactor="1.05" speedDev="0.2"/>
     
-    <vType id="bus" accel="1.2" decel="3.5" sigma="0.3" length="12.0" minGap="3.5" 
+    <vType id="bus" accel="1.2" decel="3.5" sigma="0.3" length="12.0" width="2.5" minGap="3.5" 
            maxSpeed="22.22" color="0,0,1" vClass="passenger" guiShape="bus"
            speedFactor="0.9" speedDev="0.1"/>
 </routes>""")
 
 
-def generate_potholes(net_file, obstacles_file, potholes_per_road):
+def generate_potholes(net_file, obstacles_file, potholes_per_road, seed):
     """Generate pothole obstacles"""
     tree = ET.parse(net_file)
     root = tree.getroot()
@@ -58,6 +61,7 @@ def generate_potholes(net_file, obstacles_file, potholes_per_road):
     
     pothole_id = 0
     edge_positions = {}
+    rng = seeded_rng(seed, 'potholes')
     
     with open(obstacles_file, "w") as f:
         f.write('<additional xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:noNamespaceSchemaLocation="http://sumo.dlr.de/xsd/additional_file.xsd">\n')
@@ -84,7 +88,7 @@ def generate_potholes(net_file, obstacles_file, potholes_per_road):
                 pos_ratio = None
                 
                 while attempts < 50:
-                    test_ratio = random.uniform(0.2, 0.8)
+                    test_ratio = rng.uniform(0.2, 0.8)
                     test_pos = length * test_ratio
                     
                     too_close = False
@@ -111,7 +115,7 @@ def generate_potholes(net_file, obstacles_file, potholes_per_road):
                 x, y = map(float, point.split(','))
                 
                 # Create circular pothole
-                size = random.uniform(0.8, 1.5)
+                size = rng.uniform(0.8, 1.5)
                 points = []
                 for angle_step in range(12):
                     angle = angle_step * 360 / 12
@@ -121,7 +125,9 @@ def generate_potholes(net_file, obstacles_file, potholes_per_road):
                     points.append(f"{px:.2f},{py:.2f}")
                 
                 poly_shape = " ".join(points)
-                f.write(f'    <poly id="pothole_{pothole_id}" type="pothole_deep_purple" color="0.5,0,0.5" fill="1" layer="10" shape="{poly_shape}"/>\n')
+                f.write(f'    <poly id="pothole_{pothole_id}" type="pothole_deep_purple" color="0.5,0,0.5" fill="1" layer="10" shape="{poly_shape}">\n')
+                f.write(pothole_params_xml(size, DEFAULT_SPEED_MULT))
+                f.write('    </poly>\n')
                 
                 pos = length * pos_ratio
                 f.write(f'    <!-- Pothole {pothole_id}: type=deep_purple, speed_mult=0.01, pos={pos:.2f} -->\n')
@@ -133,7 +139,7 @@ def generate_potholes(net_file, obstacles_file, potholes_per_road):
     return pothole_id
 
 
-def generate_trips(net_file, trips_file, vehicles_per_class, simulation_time, spawn_interval):
+def generate_trips(net_file, trips_file, vehicles_per_class, simulation_time, spawn_interval, seed):
     """Generate vehicle trips/flows"""
     tree = ET.parse(net_file)
     root = tree.getroot()
@@ -152,35 +158,40 @@ def generate_trips(net_file, trips_file, vehicles_per_class, simulation_time, sp
                         suitable_edges.append(edge_id)
                         break
     
+    # Only endpoints in the largest strongly connected component, so duarouter can route every trip
+    connected = connected_edges(net_file)
+    suitable_edges = [edge_id for edge_id in suitable_edges if edge_id in connected] or sorted(connected)
+    
     with open(trips_file, "w") as f:
         f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
         f.write('<routes xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:noNamespaceSchemaLocation="http://sumo.dlr.de/xsd/routes_file.xsd">\n')
         
         # Add vehicle types
         f.write("""
-    <vType id="auto" accel="1.8" decel="4.5" sigma="0.7" length="3.0" minGap="1.2" 
+    <vType id="auto" accel="1.8" decel="4.5" sigma="0.7" length="3.0" width="1.4" minGap="1.2" 
            maxSpeed="13.89" color="1,1,0" vClass="passenger" guiShape="delivery"/>
-    <vType id="motorbike" accel="3.5" decel="6.0" sigma="0.6" length="2.0" minGap="0.5" 
+    <vType id="motorbike" accel="3.5" decel="6.0" sigma="0.6" length="2.0" width="0.8" minGap="0.5" 
            maxSpeed="27.78" color="1,0,0" vClass="passenger" guiShape="motorcycle"/>
-    <vType id="car" accel="2.6" decel="4.5" sigma="0.5" length="5.0" minGap="2.5" 
+    <vType id="car" accel="2.6" decel="4.5" sigma="0.5" length="5.0" width="1.8" minGap="2.5" 
            maxSpeed="33.33" color="0,0.9,0.9" vClass="passenger" guiShape="passenger"/>
-    <vType id="bus" accel="1.2" decel="3.5" sigma="0.3" length="12.0" minGap="3.5" 
+    <vType id="bus" accel="1.2" decel="3.5" sigma="0.3" length="12.0" width="2.5" minGap="3.5" 
            maxSpeed="22.22" color="0,0,1" vClass="passenger" guiShape="bus"/>
 """)
         
         # Generate individual trips (not flows) for consistent numbering
         vehicle_id = 0
         vehicle_types = ["auto", "motorbike", "car", "bus"]
+        rng = seeded_rng(seed, 'trips')
         
         for vtype in vehicle_types:
             # Calculate spawn times evenly distributed across simulation time
             for veh_num in range(vehicles_per_class):
-                from_edge = random.choice(suitable_edges)
-                to_edge = random.choice(suitable_edges)
+                from_edge = rng.choice(suitable_edges)
+                to_edge = rng.choice(suitable_edges)
                 
                 attempts = 0
                 while to_edge == from_edge and attempts < 10:
-                    to_edge = random.choice(suitable_edges)
+                    to_edge = rng.choice(suitable_edges)
                     attempts += 1
                 
                 # Distribute vehicles evenly across simulation time
@@ -211,7 +222,7 @@ def generate_gui_settings(gui_settings_file):
 
 
 def generate_sumo_config(sumocfg_file, net_file, rou_file, poly_file, 
-                        obstacles_file, gui_settings_file, simulation_time):
+                        obstacles_file, gui_settings_file, simulation_time, seed, step_length=0.1):
     """Generate SUMO configuration file"""
     with open(sumocfg_file, "w") as f:
         f.write(f"""<configuration>
@@ -223,13 +234,16 @@ def generate_sumo_config(sumocfg_file, net_file, rou_file, poly_file,
     <time>
         <begin value="0"/>
         <end value="{simulation_time}"/>
-        <step-length value="0.1"/>
+        <step-length value="{step_length}"/>
     </time>
     <processing>
         <collision.action value="warn"/>
         <time-to-teleport value="-1"/>
         <ignore-route-errors value="true"/>
     </processing>
+    <random_number>
+        <seed value="{seed}"/>
+    </random_number>
     <gui_only>
         <gui-settings-file value="{gui_settings_file}"/>
         <start value="true"/>
@@ -239,7 +253,8 @@ def generate_sumo_config(sumocfg_file, net_file, rou_file, poly_file,
 </configuration>""")
 
 
-def generate_simulation_files(potholes_per_road, vehicles_per_class, simulation_time, spawn_interval):
+def generate_simulation_files(potholes_per_road, vehicles_per_class, simulation_time, spawn_interval, seed,
+                              step_length=0.1):
     """Generate all SUMO simulation files with custom parameters"""
     
     # File paths
@@ -277,6 +292,7 @@ def generate_simulation_files(potholes_per_road, vehicles_per_class, simulation_
             "--default.lanenumber", "2",
             "--default.speed", "13.89"
         ], check=True, capture_output=True)
+        strip_generation_date(net_file)
         
         # 2. Generate polygons
         st.write("🗺️ Generating polygons...")
@@ -287,6 +303,7 @@ def generate_simulation_files(potholes_per_road, vehicles_per_class, simulation_
             "--type-file", os.path.join(SUMO_HOME, "data/typemap/osmPolyconvert.typ.xml"),
             "-o", poly_file
         ], check=True, capture_output=True)
+        strip_generation_date(poly_file)
         
         # 3. Generate vehicle types
         st.write("🚗 Generating vehicle types...")
@@ -294,25 +311,20 @@ def generate_simulation_files(potholes_per_road, vehicles_per_class, simulation_
         
         # 4. Generate potholes
         st.write(f"🕳️ Generating {potholes_per_road} potholes per road...")
-        pothole_count = generate_potholes(net_file, obstacles_file, potholes_per_road)
+        pothole_count = generate_potholes(net_file, obstacles_file, potholes_per_road, seed)
         st.write(f"   Created {pothole_count} potholes")
         
         # 5. Generate trips
         st.write(f"🚦 Generating vehicle flows ({vehicles_per_class} per class)...")
-        generate_trips(net_file, trips_file, vehicles_per_class, simulation_time, spawn_interval)
+        generate_trips(net_file, trips_file, vehicles_per_class, simulation_time, spawn_interval, seed)
         
         # 6. Convert trips to routes
         st.write("🛣️ Converting trips to routes...")
-        subprocess.run([
-            "duarouter",
-            "--net-file", net_file,
-            "--route-files", trips_file,
-            "--output-file", rou_file,
-            "--ignore-errors",
-            "--repair",
-            "--remove-loops",
-            "--no-warnings"
-        ], check=True, capture_output=True)
+        _, routing_errors = route_trips(net_file, trips_file, rou_file,
+                                        ["--ignore-errors", "--repair", "--remove-loops", "--no-warnings"], seed)
+        if routing_errors:
+            st.error(f"❌ duarouter failed: {routing_errors[0]}")
+            return False
         
         # 7. Generate GUI settings
         generate_gui_settings(gui_settings_file)
@@ -320,7 +332,7 @@ def generate_simulation_files(potholes_per_road, vehicles_per_class, simulation_
         # 8. Generate SUMO config
         st.write("⚙️ Writing SUMO configuration...")
         generate_sumo_config(sumocfg_file, net_file, rou_file, poly_file, 
-                           obstacles_file, gui_settings_file, simulation_time)
+                           obstacles_file, gui_settings_file, simulation_time, seed, step_length)
         
         return True
         
@@ -416,13 +428,29 @@ spawn_interval = st.sidebar.slider(
     help="Time between vehicle spawns"
 )
 
+step_length = st.sidebar.select_slider(
+    "Step Length (seconds)",
+    options=[0.1, 0.2, 0.25, 0.5],
+    value=0.1,
+    help="Simulated seconds per step; pothole timers are in seconds, so coarser steps run faster"
+)
+
+seed = st.sidebar.number_input(
+    "Scenario Seed",
+    min_value=0,
+    value=scenario_seed(),
+    step=1,
+    help="Same seed gives identical potholes, trips and routes"
+)
+
 # Display current configuration
 st.sidebar.markdown("---")
 st.sidebar.subheader("Current Configuration")
 st.sidebar.write(f"🕳️ Potholes: {potholes_per_road} per road")
 st.sidebar.write(f"🚗 Vehicles: {vehicles_per_class} per class")
-st.sidebar.write(f"⏱️ Duration: {simulation_time}s ({simulation_time/60:.1f} min)")
+st.sidebar.write(f"⏱️ Duration: {simulation_time}s ({simulation_time/60:.1f} min), {step_length}s steps")
 st.sidebar.write(f"🔄 Spawn: Every {spawn_interval}s")
+st.sidebar.write(f"🎲 Seed: {seed}")
 st.sidebar.write(f"📊 Total vehicles: {vehicles_per_class * 4}")
 
 # Main content area
@@ -440,7 +468,9 @@ with col1:
                     potholes_per_road,
                     vehicles_per_class,
                     simulation_time,
-                    spawn_interval
+                    spawn_interval,
+                    seed,
+                    step_length
                 )
                 
                 if success:
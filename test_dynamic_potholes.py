@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""PotholeRegistry add/remove keeps potholes_by_lane, potholes_xy and the grid in step (mock_traci)"""
+import pytest
+
+import mock_traci
+traci = mock_traci.install()   # Before dynamic_potholes imports traci
+
+from dynamic_potholes import PotholeRegistry
+from pothole_model import PotholeGrid
+
+NET = """<net>
+    <edge id="e0">
+        <lane id="e0_0" index="0" speed="10" length="500" shape="0,-1.6 500,-1.6"/>
+        <lane id="e0_1" index="1" speed="10" length="500" shape="0,1.6 500,1.6"/>
+    </edge>
+    <edge id="e1"><lane id="e1_0" index="0" speed="10" length="500" shape="500,-1.6 1000,-1.6"/></edge>
+</net>
+"""
+
+ROUTES = """<routes>
+    <vehicle id="v0" depart="0"><route edges="e0 e1"/></vehicle>
+</routes>
+"""
+
+# One pothole loaded from the obstacle file, as load_potholes() returns it
+LOADED_XY = (100.0, -1.6, 1.0, 'pothole_loaded', 0.05)
+LOADED_ENTRY = (100.0, 0.05, 'pothole_loaded', 100.0, -1.6, 1.0, 0.0)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    (tmp_path / "road.net.xml").write_text(NET)
+    (tmp_path / "road.rou.xml").write_text(ROUTES)
+    traci.start(["sumo", "-n", str(tmp_path / "road.net.xml"), "-r", str(tmp_path / "road.rou.xml")])
+    potholes_xy = [LOADED_XY]
+    yield PotholeRegistry({'e0_0': [LOADED_ENTRY]}, potholes_xy, grid=PotholeGrid(potholes_xy))
+    traci.close()
+
+
+def check_consistent(registry):
+    """Every index and lookup structure describes the same set of potholes"""
+    assert len(registry.potholes_xy) == len(registry.xy_ids) == len(registry.xy_index) == len(registry.potholes)
+    for i, pothole_id in enumerate(registry.xy_ids):
+        assert registry.xy_index[pothole_id] == i
+        assert registry.potholes[pothole_id]['xy'] == registry.potholes_xy[i]
+
+    lane_entries = sorted((lane_id, entry) for lane_id, entries in registry.potholes_by_lane.items()
+                          for entry in entries)
+    assert lane_entries == sorted((p['lane'], p['entry']) for p in registry.potholes.values() if p['lane'])
+    assert all(registry.potholes_by_lane.values())   # No empty lane lists left behind
+
+    grid_entries = [entry for cell in registry.grid.cells.values() for entry in cell]
+    assert sorted(grid_entries) == sorted(registry.potholes_xy)
+
+
+def test_add_matches_lane_and_grid(registry):
+    assert registry.add('crack_1', 250.0, 1.2, radius=0.8)
+    assert registry.add('crack_2', 700.0, -1.6)
+    assert not registry.add('crack_1', 10.0, 0.0)    # Duplicate ID
+    check_consistent(registry)
+
+    crack_1 = registry.potholes['crack_1']
+    assert crack_1['lane'] == 'e0_1'
+    assert crack_1['entry'][0] == pytest.approx(250.0)
+    assert crack_1['entry'][6] == pytest.approx(-0.4)   # Right of the lane centre
+    assert registry.potholes['crack_2']['lane'] == 'e1_0'
+    assert registry.potholes_xy[2] in registry.grid.near(700.0, -1.6, 1.0)
+    assert 'crack_1' in traci.polygon.getIDList()
+
+
+def test_remove_swaps_last_into_the_hole(registry):
+    for i, x in enumerate((150.0, 200.0, 250.0)):
+        registry.add(f"crack_{i}", x, -1.6)
+    last = registry.potholes_xy[-1]
+
+    assert registry.remove('crack_0')                # Index 1 of 4
+    check_consistent(registry)
+    assert registry.xy_ids == ['pothole_0', 'crack_2', 'crack_1']
+    assert registry.potholes_xy[1] == last
+    assert all(entry[0] != 150.0 for entry in registry.grid.near(150.0, -1.6, 1.0))
+    assert 'crack_0' not in traci.polygon.getIDList()
+
+    assert registry.remove('crack_1')                # The last entry: no swap
+    check_consistent(registry)
+    assert registry.xy_ids == ['pothole_0', 'crack_2']
+    assert not registry.remove('crack_1')            # Already gone
+
+
+def test_remove_loaded_pothole_and_empty_lane(registry):
+    registry.add('crack_1', 300.0, 1.6)
+    assert registry.remove('pothole_0')              # Loaded: no polygon in this mock, error swallowed
+    check_consistent(registry)
+    assert 'e0_0' not in registry.potholes_by_lane
+    assert registry.xy_ids == ['crack_1'] and registry.xy_index == {'crack_1': 0}
+
+    assert registry.remove('crack_1')
+    check_consistent(registry)
+    assert registry.potholes_xy == [] and registry.potholes_by_lane == {} and not registry.grid.cells
+    assert registry.summary() == "Dynamic potholes: 1 added, 2 removed, 0 active"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Swerve success must not count a swerve as successful just because RETURNED came next"""
+import pothole_analytics as pa
+
+LOG = """\
+Step 100: Vehicle car_flow_1.0 SWERVED left to avoid pothole
+Step 130: Vehicle car_flow_1.0 RETURNED to lane center
+Step 145: Vehicle car_flow_1.0 HIT pothole at (10.0, 20.0)
+Step 200: Vehicle bus_flow_2.0 SWERVED right to avoid pothole
+Step 230: Vehicle bus_flow_2.0 RETURNED to lane center
+Step 900: Vehicle bus_flow_2.0 HIT pothole at (30.0, 40.0)
+"""
+
+
+def run_query(tmp_path, horizon=pa.SWERVE_HORIZON):
+    log = tmp_path / "swerve.log"
+    log.write_text(LOG)
+    conn = pa.connect(str(tmp_path / "events.db"))
+    pa.ingest_log(conn, str(log))
+    rows, _ = pa.swerve_success(conn, horizon)
+    return {vtype: (swerves, successful) for vtype, swerves, successful, _ in rows}
+
+
+def test_hit_after_return_fails_the_swerve(tmp_path):
+    results = run_query(tmp_path)
+    assert results['car'] == (1, 0)   # Hit 4.5s after the swerve, RETURNED in between
+    assert results['bus'] == (1, 1)   # Hit 70s later is outside the horizon
+
+
+def test_horizon_is_configurable(tmp_path):
+    results = run_query(tmp_path, horizon=100.0)
+    assert results['bus'] == (1, 0)
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""CommandBuffer: issue order, redundant commands and rejected ones, pipelined or one by one (mock_traci)"""
+import pickle
+import struct
+import threading
+
+import pytest
+
+import mock_traci
+traci = mock_traci.install()   # Before traci_batch imports traci
+tc = traci.constants
+
+import traci_batch
+from traci_batch import CommandBuffer
+
+NET = """<net>
+    <edge id="e0"><lane id="e0_0" index="0" speed="10" length="500" shape="0,0 500,0"/></edge>
+</net>
+"""
+
+ROUTES = """<routes>
+    <vehicle id="v0" depart="0" departSpeed="max"><route edges="e0"/></vehicle>
+    <vehicle id="v1" depart="0" departSpeed="max"><route edges="e0"/></vehicle>
+</routes>
+"""
+
+
+class FakeSumo:
+    """
+    Stands in for a traci Connection: decodes the one message _send_pipelined
+    sends, applies every command to mock_traci and answers each one, as SUMO
+    does (an error for one command does not stop the others).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._socket = self
+        self.messages = 0
+        self.answers = []
+
+    def _pack(self, fmt, *values):
+        return pickle.dumps(values)
+
+    def send(self, data):
+        self.messages += 1
+        offset = 4
+        while offset < len(data):
+            length, cmd_id = struct.unpack_from("!BB", data, offset)
+            header = 2
+            if length == 0:
+                length, cmd_id = struct.unpack_from("!iB", data, offset + 1)
+                header = 6
+            var, id_length = struct.unpack_from("!Bi", data, offset + header)
+            start = offset + header + 5
+            veh_id = data[start:start + id_length].decode("utf8")
+            values = pickle.loads(data[start + id_length:offset + length])
+            self.answers.append(((length, cmd_id, 0), self.apply(veh_id, var, values)))
+            offset += length
+
+    def apply(self, veh_id, var, values):
+        """Error message of the command, '' when applied"""
+        failed = traci_batch._send_one_by_one([(veh_id, var, None, values)])
+        return failed[0][1] if failed else ""
+
+    def _recvExact(self):
+        return self
+
+    def read(self, fmt):
+        (length, cmd_id, _), error = self.answers[0]
+        return length, cmd_id, 0xff if error else 0
+
+    def readString(self):
+        return self.answers.pop(0)[1]
+
+
+@pytest.fixture
+def sim(tmp_path):
+    (tmp_path / "line.net.xml").write_text(NET)
+    (tmp_path / "line.rou.xml").write_text(ROUTES)
+    traci.start(["sumo", "-n", str(tmp_path / "line.net.xml"), "-r", str(tmp_path / "line.rou.xml")])
+    traci.simulationStep()
+    yield
+    traci.close()
+
+
+def record_setters(monkeypatch):
+    """Log every traci.vehicle setter call the buffer makes, in order"""
+    calls = []
+
+    def recorded(name, setter):
+        def call(veh_id, *args):
+            calls.append((name, veh_id))
+            return setter(veh_id, *args)
+        return call
+
+    for name in ('setSpeed', 'setMaxSpeed', 'slowDown', 'setLateralLanePosition'):
+        monkeypatch.setattr(traci.vehicle, name, recorded(name, getattr(traci.vehicle, name)))
+    return calls
+
+
+def queue_step(commands):
+    commands.setSpeed('v0', 5.0)
+    commands.setLateralLanePosition('ghost', 1.0)     # Not in the simulation: rejected
+    commands.slowDown('v1', 3.0, 1.0)
+    commands.setSpeed('v0', 4.0)                      # Overwrites v0's first setSpeed
+
+
+def test_flush_order_dedup_and_rejected(sim, monkeypatch):
+    calls = record_setters(monkeypatch)
+    commands = CommandBuffer()
+    queue_step(commands)
+
+    failed = commands.flush()
+    assert [(veh_id, var) for veh_id, var, error in failed] == [('ghost', tc.VAR_LANEPOSITION_LAT)]
+    # Latest command per vehicle and variable, in the order it was last issued
+    assert calls == [('setLateralLanePosition', 'ghost'), ('slowDown', 'v1'), ('setSpeed', 'v0')]
+    assert mock_traci._current().vehicle('v0').target_speed == 4.0
+    assert (commands.sent, commands.failed, commands.dropped, commands.flushes) == (2, 1, 1, 1)
+
+    # Unchanged persistent speeds are not sent again; nothing queued sends nothing
+    commands.setSpeed('v0', 4.0)
+    assert commands.flush() == []
+    assert commands.dropped == 2 and commands.flushes == 1
+
+
+def test_pipelined_matches_one_by_one(sim, monkeypatch):
+    one_by_one = CommandBuffer()
+    queue_step(one_by_one)
+    expected = one_by_one.flush()
+    target = mock_traci._current().vehicle('v0').target_speed
+
+    mock_traci._current().vehicle('v0').target_speed = -1
+    sumo = FakeSumo()
+    monkeypatch.setattr(traci.vehicle, '_connection', sumo, raising=False)
+    pipelined = CommandBuffer()
+    queue_step(pipelined)
+    assert pipelined.flush() == expected
+    assert sumo.messages == 1                          # The whole step in one message
+    assert mock_traci._current().vehicle('v0').target_speed == target
+    assert (pipelined.sent, pipelined.failed) == (one_by_one.sent, one_by_one.failed)
+
+
+def test_rejected_swerve_falls_back_in_the_same_step(sim):
+    from controller_core import flush_commands, SWERVE_FAILED
+    from pothole_swerve_controller import SwervePolicy
+
+    policy = SwervePolicy({}, [])
+    state = policy.new_state()
+    state['swerve_time']['ghost'] = state['swerve_time']['v1'] = 0.0
+    commands = CommandBuffer()
+    commands.setLateralLanePosition('ghost', 4.0)
+    commands.setLateralLanePosition('v1', 4.0)
+
+    flush_commands(policy, 1, state, commands)
+    assert 'ghost' not in state['swerve_time'] and 'v1' in state['swerve_time']
+    assert policy.log.counts[SWERVE_FAILED] == 1
+    assert commands.flushes == 2 and commands.pending == {}   # The fallback slowDown went out too
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
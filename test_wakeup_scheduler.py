@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""A sleeping vehicle must be due again by the time it reaches a detection zone (mock_traci)"""
+import mock_traci
+traci = mock_traci.install()   # Before wakeup_scheduler imports traci
+
+from wakeup_scheduler import WakeupScheduler
+
+ZONE = 100.0          # Detection range ahead of the pothole
+
+NET = """<net>
+    <edge id="e0"><lane id="e0_0" index="0" speed="10" length="500" shape="0,0 500,0"/></edge>
+    <edge id="e1"><lane id="e1_0" index="0" speed="10" length="500" shape="500,0 1000,0"/></edge>
+</net>
+"""
+
+ROUTES = """<routes>
+    <vType id="car" maxSpeed="10"/>
+    <vehicle id="v0" type="car" depart="0" departSpeed="max"><route edges="e0 e1"/></vehicle>
+</routes>
+"""
+
+
+def start(tmp_path):
+    (tmp_path / "line.net.xml").write_text(NET)
+    (tmp_path / "line.rou.xml").write_text(ROUTES)
+    traci.start(["sumo", "-n", str(tmp_path / "line.net.xml"), "-r", str(tmp_path / "line.rou.xml")])
+
+
+def drive(scheduler, in_zone):
+    """Run v0 to its arrival; returns (steps it was due, steps it was inside the zone)"""
+    due_steps, zone_steps = [], []
+    try:
+        while traci.simulation.getMinExpectedNumber() > 0:
+            traci.simulationStep()
+            due = scheduler.due()
+            if 'v0' not in traci.vehicle.getIDList():
+                continue
+            zone = in_zone(traci.vehicle.getRoadID('v0'), traci.vehicle.getLanePosition('v0'),
+                           traci.vehicle.getPosition('v0'))
+            if zone:
+                zone_steps.append(scheduler.step)
+            if 'v0' in due:
+                due_steps.append(scheduler.step)
+                if zone:
+                    scheduler.keep_awake('v0')   # Busy inside the zone, like a controller
+                else:
+                    scheduler.schedule('v0')
+    finally:
+        traci.close()
+    return due_steps, zone_steps
+
+
+def check_wake_up(due_steps, zone_steps, max_early):
+    """Due on every zone step, woken at most max_early steps before the zone, asleep most of the way there"""
+    assert zone_steps and set(zone_steps) <= set(due_steps)
+    wake = zone_steps[0]
+    while wake - 1 in due_steps:
+        wake -= 1
+    assert zone_steps[0] - wake <= max_early
+    assert len([step for step in due_steps if step < wake]) <= 3   # Sleeps capped at MAX_SLEEP_TIME
+
+
+def test_route_range_wakes_at_zone_entry(tmp_path):
+    start(tmp_path)
+    scheduler = WakeupScheduler(0.1, lane_potholes={'e1_0': [(300.0,)]}, route_range=ZONE)
+    due_steps, zone_steps = drive(scheduler, lambda road, pos, xy: road == 'e1' and 300.0 - ZONE <= pos <= 300.0)
+    check_wake_up(due_steps, zone_steps, max_early=1)   # 1m per step, no margin on the route
+
+
+def test_xy_range_wakes_at_zone_entry(tmp_path):
+    start(tmp_path)
+    scheduler = WakeupScheduler(0.1, xy_points=[(800.0, 0.0)], xy_range=ZONE)
+    due_steps, zone_steps = drive(scheduler, lambda road, pos, xy: abs(xy[0] - 800.0) <= ZONE)
+    check_wake_up(due_steps, zone_steps, max_early=6)   # XY_MARGIN of 5m for sideways jumps
+
+
+def test_arrived_vehicle_is_dropped(tmp_path):
+    start(tmp_path)
+    try:
+        scheduler = WakeupScheduler(0.1, xy_points=[(800.0, 0.0)], xy_range=ZONE)
+        traci.simulationStep()
+        assert scheduler.due() == ['v0']
+        scheduler.schedule('v0')
+        traci.simulationStep()
+        scheduler.due(arrived=['v0'])
+        assert 'v0' not in scheduler.wake_step
+    finally:
+        traci.close()
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
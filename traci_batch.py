@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Batched TraCI Set-Commands
+==========================
+Every setSpeed / slowDown / setLateralLanePosition / setParameter is
+normally its own blocking TraCI round trip. CommandBuffer collects a step's set-commands and
+sends them to SUMO as ONE message just before simulationStep(), so round
+trips per step no longer grow with the number of controlled vehicles.
+
+Redundant commands are dropped:
+- within a step, only the last value per (vehicle, command) is sent
+- setSpeed / setMaxSpeed are persistent in SUMO, so re-sending the value
+  already in effect (e.g. setSpeed(HIT_SPEED) every recovery step) is skipped
+
+CommandBuffer has the same method names as traci.vehicle, so controllers
+can use either:
+    cmd = commands or traci.vehicle
+    cmd.setSpeed(veh_id, 0.5)
+    ...
+    failed = commands.flush()   # right before traci.simulationStep(); [(veh_id, var, error)] rejected
+
+Against libsumo or mock_traci (no socket connection) the buffered commands
+are replayed one by one through traci.vehicle - same semantics, no pipelining.
+"""
+
+import struct
+import traci
+import traci.constants as tc
+
+PERSISTENT = (tc.VAR_SPEED, tc.VAR_MAXSPEED)   # Stay in effect until changed
+
+
+class CommandBuffer:
+    """Per-step vehicle set-commands, flushed in one TraCI message"""
+
+    def __init__(self):
+        self.pending = {}      # (veh_id, var[, param key]) -> (format, values) in issue order
+        self.applied = {}      # (veh_id, var) -> value last sent, persistent commands only
+        self.sent = 0          # Commands applied by SUMO
+        self.failed = 0        # Commands SUMO rejected (skipped one by one)
+        self.dropped = 0       # Redundant commands never sent
+        self.flushes = 0       # Messages sent (one per step with commands)
+
+    # ------------------------------------------------------------------
+    # traci.vehicle compatible setters
+    # ------------------------------------------------------------------
+
+    def setSpeed(self, veh_id, speed):
+        self._queue(veh_id, tc.VAR_SPEED, "d", speed)
+
+    def setMaxSpeed(self, veh_id, speed):
+        self._queue(veh_id, tc.VAR_MAXSPEED, "d", speed)
+
+    def slowDown(self, veh_id, speed, duration):
+        self._queue(veh_id, tc.CMD_SLOWDOWN, "tdd", 2, speed, duration)
+
+    def setLateralLanePosition(self, veh_id, pos_lat):
+        self._queue(veh_id, tc.VAR_LANEPOSITION_LAT, "d", pos_lat)
+
+    def setParameter(self, veh_id, key, value):
+        self._queue(veh_id, tc.VAR_PARAMETER, "tss", 2, key, value)
+
+    def forget(self, veh_id):
+        """Drop cached state of a vehicle that left the simulation"""
+        for var in PERSISTENT:
+            self.applied.pop((veh_id, var), None)
+
+    def _queue(self, veh_id, var, fmt, *values):
+        key = (veh_id, var, values[1]) if var == tc.VAR_PARAMETER else (veh_id, var)
+        if key in self.pending:
+            self.dropped += 1          # Overwritten within the same step
+            del self.pending[key]
+        self.pending[key] = (fmt, values)
+
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+
+    def flush(self):
+        """
+        Send this step's commands (call right before traci.simulationStep()).
+        Returns [(veh_id, var, error)] of the commands SUMO rejected, so the
+        controller can fall back (controller_core.flush_commands).
+        """
+        commands = []
+        for (veh_id, var, *_), (fmt, values) in self.pending.items():
+            if var in PERSISTENT:
+                if self.applied.get((veh_id, var)) == values[0]:
+                    self.dropped += 1
+                    continue
+                self.applied[(veh_id, var)] = values[0]
+            elif var == tc.CMD_SLOWDOWN:
+                # slowDown replaces any setSpeed override in SUMO
+                self.applied.pop((veh_id, tc.VAR_SPEED), None)
+            commands.append((veh_id, var, fmt, values))
+        self.pending = {}
+        if not commands:
+            return []
+
+        connection = getattr(traci.vehicle, '_connection', None)
+        if connection is not None and hasattr(connection, '_recvExact'):
+            failed = _send_pipelined(connection, commands)
+        else:
+            failed = _send_one_by_one(commands)
+        rejected = []
+        for index, error in failed:
+            # Typically a vehicle that vanished; the step's other commands still apply
+            veh_id, var = commands[index][:2]
+            print(f"Batched TraCI command for {veh_id} failed: {error}")
+            self.applied.pop((veh_id, var), None)
+            rejected.append((veh_id, var, error))
+        self.sent += len(commands) - len(failed)
+        self.failed += len(failed)
+        self.flushes += 1
+        return rejected
+
+    def summary(self):
+        return (f"Batched TraCI commands: {self.sent} sent in {self.flushes} messages, "
+                f"{self.dropped} redundant dropped, {self.failed} failed")
+
+
+def _send_pipelined(connection, commands):
+    """
+    Pack all set-commands into one TraCI message (same encoding as Connection._sendCmd).
+    SUMO answers every command separately and keeps going after an error, so
+    the answers are read here rather than by Connection._sendExact, which
+    stops at the first error. Returns [(index, error)] of rejected commands.
+    """
+    cmd_id = tc.CMD_SET_VEHICLE_VARIABLE
+    message = b""
+    for veh_id, var, fmt, values in commands:
+        packed = connection._pack(fmt, *values)
+        obj_id = str(veh_id).encode("utf8")
+        length = 1 + 1 + 1 + 4 + len(obj_id) + len(packed)
+        if length <= 255:
+            message += struct.pack("!BB", length, cmd_id)
+        else:
+            message += struct.pack("!BiB", 0, length + 4, cmd_id)
+        message += struct.pack("!B", var) + struct.pack("!i", len(obj_id)) + obj_id + packed
+
+    with connection._lock:
+        if connection._socket is None:
+            raise traci.exceptions.FatalTraCIError("Connection already closed.")
+        connection._socket.send(struct.pack("!i", len(message) + 4) + message)
+        result = connection._recvExact()
+        if not result:
+            connection._socket.close()
+            connection._socket = None
+            raise traci.exceptions.FatalTraCIError("Connection closed by SUMO.")
+        failed = []
+        for index in range(len(commands)):
+            prefix = result.read("!BBB")
+            error = result.readString()
+            if prefix[1] != cmd_id:
+                raise traci.exceptions.FatalTraCIError(f"Received answer {prefix[1]} for command {cmd_id}.")
+            if prefix[2] or error:
+                failed.append((index, error))
+    return failed
+
+
+def _send_one_by_one(commands):
+    """Replay commands through traci.vehicle; returns [(index, error)] of rejected commands"""
+    setters = {
+        tc.VAR_SPEED: traci.vehicle.setSpeed,
+        tc.VAR_MAXSPEED: traci.vehicle.setMaxSpeed,
+        tc.CMD_SLOWDOWN: lambda veh_id, n, speed, duration: traci.vehicle.slowDown(veh_id, speed, duration),
+        tc.VAR_LANEPOSITION_LAT: traci.vehicle.setLateralLanePosition,
+        tc.VAR_PARAMETER: lambda veh_id, n, key, value: traci.vehicle.setParameter(veh_id, key, value),
+    }
+    failed = []
+    for index, (veh_id, var, fmt, values) in enumerate(commands):
+        try:
+            setters[var](veh_id, *values)
+        except traci.exceptions.TraCIException as e:
+            failed.append((index, str(e)))
+    return failed
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Trip Output Analytics
+=====================
+Travel time and delay impact of potholes per vehicle class, read from the
+SUMO outputs written by mymap.sumocfg (indian_road_simulator.py):
+
+    mymap.tripinfo.xml.gz   one <tripinfo> per trip: duration, timeLoss, waitingCount
+    mymap.fcd.xml.gz        one <timestep> per FCD period with every running vehicle
+                            (only with FCD_OUTPUT = True, or sumo --fcd-output)
+
+On 2-hour runs these files are several GB, so they are never loaded as a
+tree: elements are streamed with iterparse and freed as soon as they have
+been counted. Distributions are kept as fixed-width histograms, so memory
+stays constant in the number of trips (FCD parsing also tracks the vehicles
+of the current timestep).
+
+Per class (vType) it reports:
+- travel time (tripinfo duration)
+- delay (tripinfo timeLoss: time lost against driving at the desired speed)
+- stops per trip (tripinfo waitingCount, or stop events counted from FCD speeds)
+
+Usage:
+    python3 trip_analytics.py tripinfo mymap.tripinfo.xml.gz
+    python3 trip_analytics.py fcd mymap.fcd.xml.gz
+    python3 trip_analytics.py compare potholes.tripinfo.xml.gz baseline.tripinfo.xml.gz
+"""
+
+import sys
+import gzip
+import time
+import argparse
+import xml.etree.ElementTree as ET
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+TIME_BIN = 5.0          # Travel time / delay histogram resolution (seconds)
+SPEED_BIN = 0.5         # FCD speed histogram resolution (m/s)
+STOP_SPEED = 0.1        # Below this a vehicle counts as stopped (SUMO's waiting threshold)
+PERCENTILES = (50, 90, 99)
+ALL = 'all'             # Pseudo class aggregating every vehicle type
+
+
+# ============================================================================
+# STREAMING
+# ============================================================================
+
+class Distribution:
+    """Count, mean, min, max and a fixed-width histogram of a value (constant memory)"""
+
+    def __init__(self, bin_width):
+        self.bin_width = bin_width
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.bins = {}          # bin index -> count
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        index = int(value // self.bin_width)
+        self.bins[index] = self.bins.get(index, 0) + 1
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Upper edge of the bin holding the q-th percentile (exact to one bin width)"""
+        if not self.count:
+            return 0.0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen >= rank:
+                return min((index + 1) * self.bin_width, self.max)
+        return self.max
+
+
+def open_output(path):
+    """SUMO output file, gzipped or not"""
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+def iter_elements(path, tag):
+    """Yield every top-level <tag> element of a SUMO output file, freeing it afterwards"""
+    with open_output(path) as f:
+        context = ET.iterparse(f, events=('start', 'end'))
+        _, root = next(context)
+        for event, elem in context:
+            if event == 'end' and elem.tag == tag:
+                yield elem
+                root.clear()    # Drop the finished element (and its children) from the tree
+
+
+# ============================================================================
+# AGGREGATION
+# ============================================================================
+
+def new_class_stats():
+    return {
+        'trips': 0,
+        'unfinished': 0,                        # Still driving at the end / vaporized
+        'travel_time': Distribution(TIME_BIN),
+        'delay': Distribution(TIME_BIN),
+        'stops': Distribution(1.0),
+    }
+
+
+def vehicle_class(vtype):
+    """vType without the per-vehicle copy suffix TraCI setters create ('car@car_59' -> 'car')"""
+    return vtype.split('@', 1)[0] if vtype else 'unknown'
+
+
+def class_stats(stats, vtype):
+    for name in (vtype, ALL):
+        if name not in stats:
+            stats[name] = new_class_stats()
+        yield stats[name]
+
+
+def read_tripinfo(path):
+    """{vtype: stats} from a tripinfo output"""
+    stats = {}
+    for trip in iter_elements(path, 'tripinfo'):
+        unfinished = float(trip.get('arrival', '-1')) < 0 or trip.get('vaporized')
+        for s in class_stats(stats, vehicle_class(trip.get('vType'))):
+            if unfinished:
+                s['unfinished'] += 1
+                continue
+            s['trips'] += 1
+            s['travel_time'].add(float(trip.get('duration')))
+            s['delay'].add(float(trip.get('timeLoss')))
+            s['stops'].add(int(trip.get('waitingCount', 0)))
+    return stats
+
+
+def read_fcd(path, stop_speed=STOP_SPEED):
+    """
+    {vtype: stats} from an FCD output. Travel time is the time a vehicle was
+    seen, stops are moving -> standing transitions; a vehicle's trip ends in
+    the first timestep it is missing from.
+    """
+    stats = {}
+    active = {}       # veh_id -> [vtype, first seen, stops, stopped]
+    speed = {}        # vtype -> Distribution of sampled speeds
+
+    def finish(veh_id, end_time):
+        vtype, first_seen, stops, _ = active.pop(veh_id)
+        for s in class_stats(stats, vtype):
+            s['trips'] += 1
+            s['travel_time'].add(end_time - first_seen)
+            s['stops'].add(stops)
+
+    for timestep in iter_elements(path, 'timestep'):
+        now = float(timestep.get('time'))
+        seen = set()
+        for vehicle in timestep.iter('vehicle'):
+            veh_id = vehicle.get('id')
+            vtype = vehicle_class(vehicle.get('type'))
+            v = float(vehicle.get('speed'))
+            seen.add(veh_id)
+
+            entry = active.get(veh_id)
+            if entry is None:
+                entry = active[veh_id] = [vtype, now, 0, v < stop_speed]
+            elif v < stop_speed and not entry[3]:
+                entry[2] += 1
+            entry[3] = v < stop_speed
+
+            for name in (vtype, ALL):
+                if name not in speed:
+                    speed[name] = Distribution(SPEED_BIN)
+                speed[name].add(v)
+
+        for veh_id in [veh_id for veh_id in active if veh_id not in seen]:
+            finish(veh_id, now)
+
+    for vtype, _, _, _ in active.values():     # Still driving when the output ended
+        for s in class_stats(stats, vtype):
+            s['unfinished'] += 1
+    for name, s in stats.items():
+        s['speed'] = speed.get(name, Distribution(SPEED_BIN))
+    return stats
+
+
+# ============================================================================
+# REPORTS
+# ============================================================================
+
+def class_order(*stats):
+    names = sorted({name for s in stats for name in s if name != ALL})
+    return names + [ALL]
+
+
+def delay_columns(delay):
+    if not delay.count:          # FCD carries no timeLoss
+        return f" {'-':>8} " + " ".join(f"{'-':>7}" for q in PERCENTILES)
+    return f" {delay.mean():>8.1f} " + " ".join(f"{delay.percentile(q):>7.0f}" for q in PERCENTILES)
+
+
+def print_stats(title, stats):
+    print(f"\n=== {title} ===")
+    print(f"{'class':>10} {'trips':>7} {'unfin.':>7} {'travel s':>9} "
+          + " ".join(f"{'p' + str(q):>7}" for q in PERCENTILES)
+          + f" {'delay s':>8} " + " ".join(f"{'p' + str(q):>7}" for q in PERCENTILES)
+          + f" {'stops':>6}")
+    for name in class_order(stats):
+        if name not in stats:
+            continue
+        s = stats[name]
+        print(f"{name:>10} {s['trips']:>7} {s['unfinished']:>7} {s['travel_time'].mean():>9.1f} "
+              + " ".join(f"{s['travel_time'].percentile(q):>7.0f}" for q in PERCENTILES)
+              + delay_columns(s['delay'])
+              + f" {s['stops'].mean():>6.2f}")
+        if 'speed' in s:
+            print(f"{'':>10} mean speed {s['speed'].mean():.2f} m/s, "
+                  f"p50 {s['speed'].percentile(50):.1f}, p90 {s['speed'].percentile(90):.1f}")
+
+
+def print_comparison(potholes, baseline):
+    """Per class change of travel time, delay and stops against a no-pothole run"""
+    print("\n=== Pothole impact (potholes vs baseline) ===")
+    print(f"{'class':>10} {'trips':>13} {'travel s':>19} {'delay s':>19} "
+          f"{'p90 delay':>15} {'stops':>13} {'extra':>8}")
+    for name in class_order(potholes, baseline):
+        p = potholes.get(name, new_class_stats())
+        b = baseline.get(name, new_class_stats())
+        extra = p['travel_time'].mean() - b['travel_time'].mean()
+        print(f"{name:>10} {p['trips']:>6}/{b['trips']:<6} "
+              f"{p['travel_time'].mean():>9.1f}/{b['travel_time'].mean():<9.1f} "
+              f"{p['delay'].mean():>9.1f}/{b['delay'].mean():<9.1f} "
+              f"{p['delay'].percentile(90):>7.0f}/{b['delay'].percentile(90):<7.0f} "
+              f"{p['stops'].mean():>6.2f}/{b['stops'].mean():<6.2f} "
+              f"{extra:>+7.1f}s")
+
+
+def timed(reader, path, *args):
+    start = time.perf_counter()
+    stats = reader(path, *args)
+    trips = stats.get(ALL, new_class_stats())
+    print(f"✓ {path}: {trips['trips'] + trips['unfinished']} trips in {time.perf_counter() - start:.1f}s")
+    return stats
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streaming travel time / delay analytics over SUMO outputs")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('tripinfo', help='Per-class travel time, delay and stops from a tripinfo output')
+    p.add_argument('file')
+
+    p = sub.add_parser('fcd', help='Per-class travel time, stops and speeds from an FCD output')
+    p.add_argument('file')
+    p.add_argument('--stop-speed', type=float, default=STOP_SPEED, help='Stopped below this speed (m/s)')
+
+    p = sub.add_parser('compare', help='Pothole run vs pothole-free baseline (tripinfo outputs)')
+    p.add_argument('potholes', help='tripinfo output of the run with potholes')
+    p.add_argument('baseline', help='tripinfo output of the run without potholes')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'tripinfo':
+        print_stats(args.file, timed(read_tripinfo, args.file))
+    elif args.command == 'fcd':
+        print_stats(args.file, timed(read_fcd, args.file, args.stop_speed))
+    else:
+        potholes = timed(read_tripinfo, args.potholes)
+        baseline = timed(read_tripinfo, args.baseline)
+        print_stats(f"With potholes: {args.potholes}", potholes)
+        print_stats(f"Baseline: {args.baseline}", baseline)
+        print_comparison(potholes, baseline)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Pothole-Free Baseline Twin Run
+==============================
+Attributes delay to potholes by simulating the same demand twice, side by
+side:
+
+    potholes   the swerve controller, driving around / through the potholes
+    baseline   a no-op TraCI client that only steps (the pothole polygons have no effect)
+
+Both runs load the same config, so the same routes (mymap.rou.xml), and
+get the same --seed. The obstacles and network are parsed ONCE in the
+parent; both processes are forked from it, so the controller inherits the
+parsed potholes. The baseline is stepped through TraCI as well because SUMO
+keeps running past <end> while a client is connected: both runs stop once
+every vehicle has arrived.
+
+Each run writes its own outputs into the twin directory:
+
+    twin/potholes.tripinfo.xml.gz   twin/baseline.tripinfo.xml.gz
+    twin/potholes.fcd.xml.gz        twin/baseline.fcd.xml.gz
+    twin/delay.csv                  per-vehicle delay attributable to potholes
+
+The attributable delay of a vehicle is its travel time with potholes minus
+its travel time in the baseline (vehicles that finished in both runs).
+
+Usage:
+    python3 twin_run.py --config mymap.sumocfg --seed 42
+    python3 twin_run.py --report-only        # re-read the outputs of the last twin run
+"""
+
+import os
+import sys
+import csv
+import time
+import multiprocessing
+
+# Add SUMO tools to path
+if 'SUMO_HOME' in os.environ:
+    tools = os.path.join(os.environ['SUMO_HOME'], 'tools')
+    sys.path.append(tools)
+
+import traci
+import pothole_swerve_controller as swerve
+from scenario_seed import scenario_seed
+from trip_analytics import ALL, Distribution, iter_elements, read_tripinfo, print_comparison, vehicle_class
+from sim_clock import add_step_length_arguments, step_length_options
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+TWIN_DIR = "twin"
+SEED = scenario_seed()        # Same as the generated sumocfg's <seed>
+SUMO_BINARY = "sumo"          # Headless: the twins are batch runs
+DELAY_BIN = 1.0               # Attributable delay histogram resolution (seconds)
+
+
+def run_outputs(directory, run):
+    """(tripinfo, fcd) output files of one twin"""
+    return (os.path.join(directory, f"{run}.tripinfo.xml.gz"),
+            os.path.join(directory, f"{run}.fcd.xml.gz"))
+
+
+def sumo_command(sumo_binary, sumo_config, seed, directory, run, step_length=None):
+    """Same config, seed and step length for both twins, outputs redirected into the twin directory"""
+    tripinfo, fcd = run_outputs(directory, run)
+    return [sumo_binary, "-c", sumo_config, "--seed", str(seed),
+            "--tripinfo-output", tripinfo, "--tripinfo-output.write-unfinished", "true",
+            "--fcd-output", fcd, "--no-step-log", "true"] + step_length_options(step_length)
+
+
+# ============================================================================
+# TWIN RUN
+# ============================================================================
+
+def run_controller(sumo_cmd, potholes, batch):
+    """Forked worker: swerve controller on the pre-parsed potholes"""
+    swerve.run_simulation(sumo_cmd[2], batch=batch, potholes=potholes, sumo_cmd=sumo_cmd)
+
+
+def run_baseline(sumo_cmd):
+    """Forked worker: same simulation, nobody touches the vehicles"""
+    traci.start(sumo_cmd, label='baseline')
+    steps = 0
+    try:
+        while traci.simulation.getMinExpectedNumber() > 0:
+            traci.simulationStep()
+            steps += 1
+    finally:
+        traci.close()
+    print(f"[baseline] {steps} steps")
+
+
+def run_twin(sumo_config, seed=SEED, obstacles_file=None, batch=False, sumo_binary=SUMO_BINARY,
+             directory=TWIN_DIR, step_length=None):
+    """Run controller and baseline concurrently; returns the twin directory"""
+    os.makedirs(directory, exist_ok=True)
+    obstacles_file = obstacles_file or sumo_config.replace('.sumocfg', '.obstacles.xml')
+    net_file = sumo_config.replace('.sumocfg', '.net.xml')
+    potholes = swerve.load_potholes(obstacles_file, net_file)
+
+    # fork: the workers inherit the parsed potholes instead of re-reading the network
+    context = multiprocessing.get_context('fork')
+    workers = [
+        context.Process(target=run_controller, name='potholes',
+                        args=(sumo_command(sumo_binary, sumo_config, seed, directory, 'potholes', step_length),
+                              potholes, batch)),
+        context.Process(target=run_baseline, name='baseline',
+                        args=(sumo_command(sumo_binary, sumo_config, seed, directory, 'baseline', step_length),)),
+    ]
+    print(f"Twin run (seed {seed}): controller and baseline in two processes")
+    started = time.time()
+    try:
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        print("\nTwin run interrupted by user")
+        for worker in workers:
+            worker.terminate()
+        raise
+    print(f"Twin run finished in {time.time() - started:.1f}s")
+    return directory
+
+
+# ============================================================================
+# DELAY ATTRIBUTION
+# ============================================================================
+
+def read_travel_times(path):
+    """{veh_id: (vType, duration)} of the trips that finished"""
+    trips = {}
+    for trip in iter_elements(path, 'tripinfo'):
+        if float(trip.get('arrival', '-1')) >= 0 and not trip.get('vaporized'):
+            trips[trip.get('id')] = (vehicle_class(trip.get('vType')), float(trip.get('duration')))
+    return trips
+
+
+def attribute_delay(directory=TWIN_DIR, csv_file=None):
+    """Per-vehicle delay attributable to potholes; writes delay.csv, returns {vtype: Distribution}"""
+    potholes_file, _ = run_outputs(directory, 'potholes')
+    baseline_file, _ = run_outputs(directory, 'baseline')
+    baseline = read_travel_times(baseline_file)
+
+    delay = {}
+    missing = 0
+    csv_file = csv_file or os.path.join(directory, 'delay.csv')
+    with open(csv_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['vehicle', 'vtype', 'travel_time_potholes', 'travel_time_baseline', 'pothole_delay'])
+        for trip in iter_elements(potholes_file, 'tripinfo'):
+            veh_id = trip.get('id')
+            if float(trip.get('arrival', '-1')) < 0 or trip.get('vaporized') or veh_id not in baseline:
+                missing += 1
+                continue
+            vtype, baseline_time = baseline[veh_id]
+            travel_time = float(trip.get('duration'))
+            writer.writerow([veh_id, vtype, travel_time, baseline_time, round(travel_time - baseline_time, 2)])
+            for name in (vtype, ALL):
+                if name not in delay:
+                    delay[name] = Distribution(DELAY_BIN)
+                delay[name].add(travel_time - baseline_time)
+
+    print(f"✓ {csv_file}: {delay[ALL].count if ALL in delay else 0} vehicles paired, "
+          f"{missing} unfinished in one of the runs")
+    return delay
+
+
+def report(directory=TWIN_DIR):
+    """Aggregate comparison plus per-class pothole delay"""
+    potholes_file, _ = run_outputs(directory, 'potholes')
+    baseline_file, _ = run_outputs(directory, 'baseline')
+    print_comparison(read_tripinfo(potholes_file), read_tripinfo(baseline_file))
+
+    delay = attribute_delay(directory)
+    print("\n=== Delay attributable to potholes (per vehicle, seconds) ===")
+    print(f"{'class':>10} {'vehicles':>9} {'total':>10} {'mean':>8} {'p50':>7} {'p90':>7} "
+          f"{'p99':>7} {'max':>7} {'delayed':>8}")
+    for name in sorted(n for n in delay if n != ALL) + ([ALL] if ALL in delay else []):
+        d = delay[name]
+        delayed = sum(count for index, count in d.bins.items() if index >= 1)   # >= 1s slower
+        print(f"{name:>10} {d.count:>9} {d.total:>10.1f} {d.mean():>8.2f} {d.percentile(50):>7.0f} "
+              f"{d.percentile(90):>7.0f} {d.percentile(99):>7.0f} {d.max:>7.1f} {delayed:>8}")
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Controller run and pothole-free baseline, side by side")
+    parser.add_argument('--config', default='mymap.sumocfg', help='SUMO config file')
+    parser.add_argument('--seed', type=int, default=SEED, help='Random seed used by both runs')
+    parser.add_argument('--obstacles', help='Pothole layout for the controller run')
+    parser.add_argument('--batch-commands', action='store_true', help='Batch the controller\'s TraCI set-commands')
+    parser.add_argument('--dir', default=TWIN_DIR, help='Output directory of the twin run')
+    parser.add_argument('--sumo', default=SUMO_BINARY, help='sumo or sumo-gui (both runs)')
+    parser.add_argument('--report-only', action='store_true', help='Only report on existing twin outputs')
+    add_step_length_arguments(parser)
+    args = parser.parse_args()
+
+    if not args.report_only:
+        run_twin(args.config, args.seed, args.obstacles, args.batch_commands, args.sumo, args.dir, args.step_length)
+    report(args.dir)
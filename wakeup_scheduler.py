@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Adaptive Control Frequency
+==========================
+Vehicles far from any pothole do not need to be evaluated every step.
+WakeupScheduler puts each idle vehicle into a wake-up bucket: the earliest
+step at which it could possibly enter a controller's detection zone, given
+its distance to the next pothole and its maximum speed. Only vehicles that
+are due (or busy - recovering, swerving, ...) are handed to the controller.
+
+Two conservative distance bounds are supported:
+- route range : distance along the vehicle's route to the next pothole
+                (for lane-position based lookahead / zones). The controllers
+                only look at the lane they are on, so a pothole on a later
+                edge counts from the moment the vehicle enters that edge.
+- XY range    : straight-line distance to the nearest pothole centre
+                (for XY based hit detection and lookahead)
+
+Both under-estimate the true travel distance and the maximum speed
+over-estimates progress, so a vehicle is never woken too late. The XY
+bound keeps an extra margin for sideways jumps (instant lane changes).
+
+Usage inside a controller step:
+    for veh_id in scheduler.due():
+        ...control the vehicle...
+        if busy:
+            scheduler.keep_awake(veh_id)
+        else:
+            scheduler.schedule(veh_id)
+"""
+
+import math
+import bisect
+import traci
+from collections import defaultdict
+from sim_clock import steps_for
+
+XY_CELL_SIZE = 100.0       # Grid cell size for nearest-pothole lookups (m)
+XY_SEARCH_CELLS = 5        # Search +-5 cells; anything further is >= 400m away
+XY_MARGIN = 5.0            # Lane changes and junction corners move vehicles sideways (m)
+MAX_SLEEP_TIME = 30.0      # Re-check at least every 30 simulated seconds (reroutes, speed changes)
+
+
+class WakeupScheduler:
+    """Wake-up buckets keyed by simulation step"""
+
+    def __init__(self, step_length=0.1, xy_points=None, xy_range=None,
+                 lane_potholes=None, route_range=None, route_behind=0.0, max_sleep=MAX_SLEEP_TIME):
+        self.step_length = step_length
+        self.xy_range = xy_range
+        self.route_range = route_range
+        self.route_behind = route_behind   # Zones also reach this far behind a pothole (lane changes into them)
+        self.max_sleep_steps = steps_for(max_sleep, step_length)
+        self.step = 0
+        self.buckets = defaultdict(list)   # step -> [veh_id]
+        self.wake_step = {}                # veh_id -> step it is due
+        self.edge_lengths = {}             # edge_id -> length cache
+        self.skipped = 0                   # Vehicle evaluations saved so far
+        self.wake_all = False              # A pothole appeared: every sleep estimate is stale
+
+        # Pothole centres bucketed on a grid for straight-line distance bounds
+        self.grid = defaultdict(list)
+        if xy_range is not None:
+            for x, y in xy_points or ():
+                self.grid[(int(x // XY_CELL_SIZE), int(y // XY_CELL_SIZE))].append((x, y))
+
+        # Sorted pothole positions per edge (any lane) for route distance bounds
+        self.edge_potholes = {}
+        if route_range is not None:
+            for lane_id, entries in (lane_potholes or {}).items():
+                edge_id = lane_id.rsplit('_', 1)[0]
+                positions = self.edge_potholes.setdefault(edge_id, [])
+                positions.extend(entry[0] for entry in entries)
+            for positions in self.edge_potholes.values():
+                positions.sort()
+
+    # ------------------------------------------------------------------
+    # Per-step API
+    # ------------------------------------------------------------------
+
+    def due(self, arrived=None):
+        """
+        Advance one step and return the vehicles to control this step.
+        arrived: this step's getArrivedIDList() when the caller already fetched it
+        """
+        self.step += 1
+        step = self.step
+
+        if arrived is None:
+            arrived = traci.simulation.getArrivedIDList()
+        for veh_id in arrived:
+            self.wake_step.pop(veh_id, None)
+
+        due = []
+        for veh_id in self.buckets.pop(step, ()):
+            if self.wake_step.get(veh_id) == step:
+                due.append(veh_id)
+        if self.wake_all:
+            self.wake_all = False
+            for veh_id, wake in self.wake_step.items():
+                if wake != step:
+                    self.wake_step[veh_id] = step
+                    due.append(veh_id)
+        # New vehicles are due immediately (on the first call: everything already running),
+        # and so are vehicles back on the road after a teleport
+        if step > 1:
+            departed = traci.simulation.getDepartedIDList() + traci.simulation.getEndingTeleportIDList()
+        else:
+            departed = traci.vehicle.getIDList()
+        for veh_id in departed:
+            if self.wake_step.get(veh_id) != step:   # A teleported vehicle may be due already
+                self.wake_step[veh_id] = step
+                due.append(veh_id)
+
+        self.skipped += len(self.wake_step) - len(due)
+        return due
+
+    def keep_awake(self, veh_id):
+        """Evaluate the vehicle again next step"""
+        self._set_wake(veh_id, self.step + 1)
+
+    def schedule(self, veh_id, x=None, y=None, max_speed=None, road_id=None, lane_pos=None):
+        """
+        Put an idle vehicle to sleep until it could first reach a detection zone.
+        Values the controller already read this step (position, road, lane
+        position) are passed in so they are not fetched again.
+        """
+        if max_speed is None:
+            max_speed = traci.vehicle.getMaxSpeed(veh_id)
+        max_travel = max(max_speed, 0.1) * self.step_length  # metres per step
+
+        slack = self.max_sleep_steps * max_travel
+        if self.xy_range is not None:
+            if x is None:
+                x, y = traci.vehicle.getPosition(veh_id)
+            reach = self.xy_range + XY_MARGIN
+            slack = min(slack, self.nearest_pothole_distance(x, y, slack + reach) - reach)
+        if self.route_range is not None and slack > 0:
+            distance = self.route_pothole_distance(veh_id, slack + self.route_range, road_id, lane_pos)
+            slack = min(slack, distance - self.route_range)
+
+        sleep_steps = int(slack / max_travel) if slack > 0 else 1
+        self._set_wake(veh_id, self.step + max(1, min(sleep_steps, self.max_sleep_steps)))
+
+    def forget(self, veh_id):
+        self.wake_step.pop(veh_id, None)
+
+    def _set_wake(self, veh_id, step):
+        if self.wake_step.get(veh_id) != step:
+            self.wake_step[veh_id] = step
+            self.buckets[step].append(veh_id)
+
+    # ------------------------------------------------------------------
+    # Pothole changes (dynamic_potholes.py)
+    # ------------------------------------------------------------------
+
+    def add_pothole(self, x, y, edge_id, pos):
+        """Index a new pothole; sleeping vehicles are all re-evaluated next step"""
+        if self.xy_range is not None:
+            self.grid[(int(x // XY_CELL_SIZE), int(y // XY_CELL_SIZE))].append((x, y))
+        if self.route_range is not None and edge_id is not None:
+            bisect.insort(self.edge_potholes.setdefault(edge_id, []), pos)
+        self.wake_all = True
+
+    def remove_pothole(self, x, y, edge_id, pos):
+        """Drop a pothole from the index (sleep estimates stay conservative)"""
+        if self.xy_range is not None:
+            cell = self.grid.get((int(x // XY_CELL_SIZE), int(y // XY_CELL_SIZE)))
+            if cell and (x, y) in cell:
+                cell.remove((x, y))
+        positions = self.edge_potholes.get(edge_id)
+        if positions and pos in positions:
+            positions.remove(pos)
+            if not positions:
+                del self.edge_potholes[edge_id]
+
+    # ------------------------------------------------------------------
+    # Distance bounds
+    # ------------------------------------------------------------------
+
+    def nearest_pothole_distance(self, x, y, horizon):
+        """Lower bound on the straight-line distance to the nearest pothole"""
+        cx, cy = int(x // XY_CELL_SIZE), int(y // XY_CELL_SIZE)
+        best = float('inf')
+        for ring in range(XY_SEARCH_CELLS + 1):
+            # Cells in this ring and beyond are at least (ring - 1) cells away
+            unsearched = (ring - 1) * XY_CELL_SIZE
+            if best <= unsearched or unsearched > horizon:
+                return min(best, max(unsearched, 0.0))
+            for gx in range(cx - ring, cx + ring + 1):
+                for gy in range(cy - ring, cy + ring + 1):
+                    if max(abs(gx - cx), abs(gy - cy)) != ring:
+                        continue
+                    for px, py in self.grid.get((gx, gy), ()):
+                        d = math.hypot(px - x, py - y)
+                        if d < best:
+                            best = d
+        return min(best, XY_SEARCH_CELLS * XY_CELL_SIZE)
+
+    def edge_length(self, edge_id):
+        length = self.edge_lengths.get(edge_id)
+        if length is None:
+            length = self.edge_lengths[edge_id] = traci.lane.getLength(f"{edge_id}_0")
+        return length
+
+    def route_pothole_distance(self, veh_id, horizon, road_id=None, lane_pos=None):
+        """
+        Distance along the route to the next pothole, up to `horizon`.
+        A pothole on a later edge is reported no nearer than route_range
+        into that edge: the controller sees it once the vehicle is on the
+        edge, so waking at the edge's start is early enough.
+        Potholes up to route_behind behind the vehicle on its edge count as 0:
+        a lane change can put it into their zone from the side.
+        On a junction or off the road (teleporting) the position is unknown,
+        so 0 is returned and the vehicle is checked again next step.
+        Reroutes are picked up at the next wake-up (MAX_SLEEP_TIME cap).
+        The route is read fresh every time; its index is only fetched when
+        the current edge occurs more than once on it.
+        """
+        if road_id is None:
+            road_id = traci.vehicle.getRoadID(veh_id)
+        if not road_id or road_id.startswith(':'):
+            return 0.0
+        route = traci.vehicle.getRoute(veh_id)
+        index = route.index(road_id) if route.count(road_id) == 1 else traci.vehicle.getRouteIndex(veh_id)
+        if index < 0:
+            return 0.0
+
+        if lane_pos is None:
+            lane_pos = traci.vehicle.getLanePosition(veh_id)
+        for pos in self.edge_potholes.get(road_id, ()):
+            if pos + self.route_behind >= lane_pos:
+                return max(pos - lane_pos, 0.0)
+        distance = self.edge_length(road_id) - lane_pos
+
+        for edge_id in route[index + 1:]:
+            if distance >= horizon:
+                break
+            positions = self.edge_potholes.get(edge_id)
+            if positions:
+                return distance + max(positions[0], self.route_range)
+            distance += self.edge_length(edge_id)
+        return distance
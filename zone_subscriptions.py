@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Pothole Zone Subscriptions
+==========================
+Instead of fetching every vehicle with traci.vehicle.getIDList() each step,
+let SUMO report only the vehicles that are near a pothole:
+
+- lane subscriptions   : LAST_STEP_VEHICLE_ID_LIST on every pothole-bearing
+                         lane (for lane-position based lookahead / zones)
+- context subscriptions: vehicles within a radius of each pothole centre
+                         (for XY based checks). An invisible POI is added at
+                         every centre the controller uses and SUMO reports
+                         the vehicles around it.
+
+Subscription results arrive with the simulationStep() response, so one round
+trip per step replaces the full vehicle scan. Vehicles the controller is still
+busy with (recovering, swerving, ...) are passed in and always included.
+
+Usage:
+    zones = ZoneSubscriptions(lanes=potholes_by_lane, points=[(x, y), ...], radius=POTHOLE_HIT_RADIUS)
+    for veh_id in zones.vehicles(busy=(state['hit_time'], state['swerve_time'])):
+        ...
+"""
+
+import traci
+import traci.constants as tc
+
+ZONE_POI_PREFIX = "pothole_zone_"
+ZONE_POI_TYPE = "pothole_zone"
+
+
+class ZoneSubscriptions:
+    """Vehicles on pothole lanes and/or within a radius of pothole centres"""
+
+    def __init__(self, lanes=(), points=(), radius=0.0):
+        self.lanes = list(lanes)
+        self.pois = []
+        self.radius = radius
+
+        for lane_id in self.lanes:
+            traci.lane.subscribe(lane_id, [tc.LAST_STEP_VEHICLE_ID_LIST])
+
+        if radius > 0:
+            for i, (x, y) in enumerate(points):
+                poi_id = f"{ZONE_POI_PREFIX}{i}"
+                traci.poi.add(poi_id, x, y, (0, 0, 0, 0), ZONE_POI_TYPE, -1)
+                traci.poi.subscribeContext(poi_id, tc.CMD_GET_VEHICLE_VARIABLE, radius, [tc.VAR_ROAD_ID])
+                self.pois.append(poi_id)
+
+        print(f"Subscribed to {len(self.lanes)} pothole lanes and "
+              f"{len(self.pois)} pothole contexts (radius {radius:.1f}m)")
+
+    # ------------------------------------------------------------------
+    # Pothole changes (dynamic_potholes.py)
+    # ------------------------------------------------------------------
+
+    def add_lane(self, lane_id):
+        if lane_id not in self.lanes:
+            traci.lane.subscribe(lane_id, [tc.LAST_STEP_VEHICLE_ID_LIST])
+            self.lanes.append(lane_id)
+
+    def remove_lane(self, lane_id):
+        if lane_id in self.lanes:
+            traci.lane.unsubscribe(lane_id)
+            self.lanes.remove(lane_id)
+
+    def add_point(self, key, x, y):
+        """Context subscription around a new pothole centre (key: pothole ID or index)"""
+        if self.radius <= 0:
+            return
+        poi_id = f"{ZONE_POI_PREFIX}{key}"
+        traci.poi.add(poi_id, x, y, (0, 0, 0, 0), ZONE_POI_TYPE, -1)
+        traci.poi.subscribeContext(poi_id, tc.CMD_GET_VEHICLE_VARIABLE, self.radius, [tc.VAR_ROAD_ID])
+        self.pois.append(poi_id)
+
+    def remove_point(self, key):
+        poi_id = f"{ZONE_POI_PREFIX}{key}"
+        if poi_id in self.pois:
+            traci.poi.unsubscribeContext(poi_id, tc.CMD_GET_VEHICLE_VARIABLE, self.radius)
+            traci.poi.remove(poi_id, -1)
+            self.pois.remove(poi_id)
+
+    def vehicles(self, busy=()):
+        """Vehicle IDs to control this step: busy ones first, then those SUMO reported"""
+        ids = {}
+        for tracked in busy:
+            ids.update(dict.fromkeys(tracked))
+
+        if self.lanes:
+            for results in traci.lane.getAllSubscriptionResults().values():
+                ids.update(dict.fromkeys(results[tc.LAST_STEP_VEHICLE_ID_LIST]))
+        if self.pois:
+            for context in traci.poi.getAllContextSubscriptionResults().values():
+                ids.update(dict.fromkeys(context))
+        return list(ids)